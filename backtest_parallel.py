@@ -0,0 +1,22 @@
+import logging
+import sys
+
+from headquarters.parallel_backtest import ParallelBacktest
+from utils import common
+from utils import global_var as gvar
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    try:
+        log_level, workers, result_db = common.get_parallel_backtest_args()
+        log_config_file = f'log_config_{gvar.ENV_NAME}'
+        common.setup_log_config(log_level, log_config_file)
+        ParallelBacktest(workers, log_level, result_db).start_work()
+    except Exception as e:
+        logger.exception(e)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""基准测试计时和结果记录
+
+measure 重复调用被测函数直到达到最少次数和最短时间，setup 在每次调用前执行且不计入耗时。
+结果以 JSON 保存，compare 对比两次运行的中位数耗时。
+"""
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+Stats = Dict[str, float]
+
+
+def measure(
+    func: Callable[[], object],
+    setup: Optional[Callable[[], object]] = None,
+    min_runs: int = 5,
+    min_time: float = 0.2,
+    max_runs: int = 10000,
+) -> Stats:
+    """返回被测函数每次调用的耗时统计(微秒)"""
+    times: List[float] = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (
+        len(times) < min_runs or time.perf_counter() - started < min_time
+    ):
+        if setup is not None:
+            setup()
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+    return summarize(times)
+
+
+def summarize(times: List[float]) -> Stats:
+    """将耗时(秒)列表汇总为微秒统计"""
+    us = np.asarray(times) * 1e6
+    return {
+        "runs": len(us),
+        "mean_us": round(float(us.mean()), 3),
+        "median_us": round(float(np.median(us)), 3),
+        "p95_us": round(float(np.percentile(us, 95)), 3),
+        "min_us": round(float(us.min()), 3),
+        "max_us": round(float(us.max()), 3),
+    }
+
+
+def metadata(params: dict) -> dict:
+    """运行环境信息，用于判断两次结果是否可以比较"""
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "params": params,
+    }
+
+
+def save(path: str, meta: dict, results: Dict[str, Stats]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2,
+                  ensure_ascii=False)
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(base: dict, current: dict) -> List[str]:
+    """逐项对比两次运行的中位数耗时，比值大于 1 表示变慢"""
+    lines = [f"{'benchmark':<48}{'base(us)':>12}{'current(us)':>14}"
+             f"{'ratio':>8}"]
+    for name, stats in current["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            lines.append(f"{name:<48}{'-':>12}{stats['median_us']:>14.1f}"
+                         f"{'-':>8}")
+            continue
+        ratio = stats["median_us"] / old["median_us"] \
+            if old["median_us"] else float("nan")
+        lines.append(f"{name:<48}{old['median_us']:>12.1f}"
+                     f"{stats['median_us']:>14.1f}{ratio:>8.2f}")
+    return lines
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,51 @@
+"""运行基准测试
+
+用法(在项目根目录):
+    python -m benchmarks.run -n 10 -d 5 -o result.json
+    python -m benchmarks.run -o new.json --compare result.json
+"""
+import argparse
+import logging
+
+from benchmarks import harness
+from benchmarks.suites import SUITES, BenchEnv, DB_NAME
+from dao.storage import connect_storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="交易策略基准测试")
+    parser.add_argument("-n", "--products", type=int, default=5,
+                        help="合成品种数量")
+    parser.add_argument("-d", "--days", type=int, default=3,
+                        help="盯盘循环回放的交易日数量")
+    parser.add_argument("-s", "--suite", action="append",
+                        choices=sorted(SUITES), help="只运行指定项目，可重复")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件路径")
+    parser.add_argument("--compare", help="与之对比的历史结果 JSON 文件路径")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # 策略日志不计入耗时
+    logging.basicConfig(level=logging.WARNING)
+    connect_storage("memory", "", DB_NAME)
+    env = BenchEnv(args.products, args.days, args.seed)
+    results = {}
+    try:
+        for name in args.suite or SUITES:
+            print(f"running {name} ...")
+            results.update(SUITES[name](env))
+    finally:
+        env.close()
+
+    for name, stats in results.items():
+        print(f"{name:<60}{stats['median_us']:>14.1f}us"
+              f"  p95 {stats['p95_us']:.1f}us  runs {stats['runs']}")
+    current = {"meta": harness.metadata(vars(args)), "results": results}
+    if args.output:
+        harness.save(args.output, current["meta"], results)
+    if args.compare:
+        print("\n".join(harness.compare(harness.load(args.compare), current)))
+
+
+if __name__ == "__main__":
+    main()
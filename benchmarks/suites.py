@@ -0,0 +1,206 @@
+"""基准测试项目
+
+indicators: 指标计算(完整计算和增量缓存命中)
+conditions: 各交易策略的开仓条件判断，每次调用前清除该周期K线上缓存的判断结果
+staker: 使用本地回放接口和内存数据库运行完整的盯盘循环
+"""
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from mongoengine.connection import get_db
+from tqsdk2 import BacktestFinished
+
+import dao.config_service as c_service
+import strategies.tools as tools
+from benchmarks.harness import Stats, measure, summarize
+from benchmarks.synthetic import make_klines, write_replay_data
+from exe_departments.stakers import BTStaker
+from replay.api import ReplayApi
+from replay.data_source import ReplayDataSource
+from strategies.entity import StrategyConfig
+from strategies.indicators import indicator_cache
+from strategies.kline_registry import KlineRegistry
+from strategies.order_manager import OrderManager
+from strategies.trade_strategies.bts.bts_long import BottomLongTradeStrategy
+from strategies.trade_strategies.bts.bts_short import BottomShortTradeStrategy
+from strategies.trade_strategies.mts.mts_long import MainLongTradeStrategy
+from strategies.trade_strategies.mts.mts_short import MainShortTradeStrategy
+from utils.config_utils import FutureConfig
+
+# 数据库名称，运行前需要连接内存存储
+DB_NAME = "benchmark"
+# 回放开始后推进的行情次数，使策略处于交易时段内
+WARMUP_UPDATES = 12
+
+_LONG = {"base_scale": 0.03, "stop_loss_scale": 1,
+         "profit_start_scale_1": 3, "promote_scale_1": 6,
+         "promote_target_1": 3, "profit_start_scale_2": 1.5,
+         "promote_scale_2": 3, "promote_target_2": 1}
+_SHORT = {"base_scale": 0.03, "stop_loss_scale": 1, "profit_start_scale": 8,
+          "promote_scale": 3, "promote_target": 1}
+
+# (策略类, 方向, 判断结果缓存列, 各周期条件判断方法及其K线序列属性)
+_CONDITIONS = [
+    (MainLongTradeStrategy, 1, "l_condition",
+     [("_match_dk_condition", "_d_klines"),
+      ("_match_3h_condition", "_3h_klines"),
+      ("_match_30m_condition", "_30m_klines"),
+      ("_match_5m_condition", "_5m_klines")]),
+    (MainShortTradeStrategy, 0, "s_condition",
+     [("_match_dk_condition", "_d_klines"),
+      ("_match_3h_condition", "_3h_klines"),
+      ("_match_30m_condition", "_30m_klines")]),
+    (BottomLongTradeStrategy, 1, "l_matched",
+     [("_match_dk_condition", "_d_klines"),
+      ("_match_3h_condition", "_3h_klines"),
+      ("_match_30m_condition", "_30m_klines")]),
+    (BottomShortTradeStrategy, 0, "s_matched",
+     [("_match_dk_condition", "_d_klines"),
+      ("_match_3h_condition", "_3h_klines"),
+      ("_match_30m_condition", "_30m_klines")]),
+]
+
+
+class BenchEnv:
+    """合成回放数据目录，每个运行项目从这里创建新的回放接口"""
+
+    def __init__(self, products: int, days: int, seed: int = 0):
+        self._dir = tempfile.TemporaryDirectory(prefix="bench-")
+        self.products = products
+        self.days = days
+        self.mj_symbols, self.start, self.end = write_replay_data(
+            self._dir.name, products, days=days, seed=seed)
+        self.source = ReplayDataSource(self._dir.name)
+
+    def create_api(self) -> ReplayApi:
+        return ReplayApi(self.source, self.start, self.end)
+
+    def future_configs(self) -> List[FutureConfig]:
+        return [
+            FutureConfig(0.2, symbol=s, name=s, is_active=1, multiple=10,
+                         switch_days=[20, 45], main_symbols=[1, 5, 9],
+                         long=_LONG, short=_SHORT)
+            for s in self.mj_symbols
+        ]
+
+    def close(self):
+        self._dir.cleanup()
+
+
+def reset_db():
+    get_db().client.drop_database(DB_NAME)
+
+
+def bench_indicators(env: BenchEnv) -> Dict[str, Stats]:
+    results = {}
+    base = make_klines(200, 24 * 60 * 60)
+    frame = [base]
+    fills = [("main", tools.fill_main_indicators),
+             ("bottom", tools.fill_bottom_indicators)]
+    for name, fill in fills:
+        results[f"tools.fill_{name}_indicators"] = measure(
+            lambda: fill(frame[0]),
+            setup=lambda: frame.__setitem__(0, base.copy()))
+        # 缓存命中，K线未变化时不重新计算
+        cached = base.copy()
+        key = ("DCE.aa2309", 24 * 60 * 60)
+        fill(cached, key)
+        results[f"tools.fill_{name}_indicators[cached]"] = measure(
+            lambda: fill(cached, key))
+    indicator_cache.reset()
+    return results
+
+
+def bench_conditions(env: BenchEnv) -> Dict[str, Stats]:
+    reset_db()
+    api = env.create_api()
+    registry = KlineRegistry(api)
+    order_manager = OrderManager(api)
+    f_info = c_service.get_future_configs(env.future_configs()[:1])[0]
+    symbol = env.source.get_underlying(f_info.symbol)[1][0]
+    strategies = []
+    for cls, direction, column, matchers in _CONDITIONS:
+        config = StrategyConfig(api, f_info, direction, True, registry,
+                                order_manager)
+        config.setCustomSymbol(f"{f_info.symbol}_{cls.__name__}")
+        strategies.append((cls(config, symbol), column, matchers))
+    for _ in range(WARMUP_UPDATES):
+        api.wait_update()
+    results = {}
+    for strategy, column, matchers in strategies:
+        strategy.fill_indicators_by_type(1)
+        name = type(strategy).__name__
+        for method, serial in matchers:
+            matcher = getattr(strategy, method)
+            # 较大周期的判断结果先写入K线，较小周期的判断会读取它们
+            matcher()
+            results[f"{name}.{method}"] = measure(
+                matcher, setup=_clear(getattr(strategy, serial), column))
+    main_long, main_short = strategies[0][0], strategies[1][0]
+    results["MainTradeStrategy._match_3hk_c2_distance"] = measure(
+        main_long._match_3hk_c2_distance)  # type: ignore
+    results["MainTradeStrategy.is_within_2days"] = measure(
+        main_short.is_within_2days)  # type: ignore
+    return results
+
+
+def bench_staker(env: BenchEnv, runs: int = 3) -> Dict[str, Stats]:
+    init_times, loop_times, update_times = [], [], []
+    for _ in range(runs):
+        reset_db()
+        indicator_cache.reset()
+        staker, api, elapsed = _create_staker(env)
+        init_times.append(elapsed)
+        updates, elapsed = _run_staker(staker, api)
+        loop_times.append(elapsed)
+        update_times.extend([elapsed / max(updates, 1)] * updates)
+    label = f"[{env.products} products, {env.days} days]"
+    return {
+        f"BTStaker.__init__{label}": summarize(init_times),
+        f"BTStaker.start_work{label}": summarize(loop_times),
+        f"BTStaker.wait_update_cycle{label}": summarize(update_times),
+    }
+
+
+SUITES: Dict[str, Callable[[BenchEnv], Dict[str, Stats]]] = {
+    "indicators": bench_indicators,
+    "conditions": bench_conditions,
+    "staker": bench_staker,
+}
+
+
+def _clear(klines, column: str) -> Callable[[], None]:
+    def setup():
+        if column in klines.columns:
+            klines.drop(columns=column, inplace=True)
+
+    return setup
+
+
+class _CountingApi(ReplayApi):
+    """记录 wait_update 次数的回放接口"""
+
+    updates = 0
+
+    def wait_update(self, deadline=None) -> bool:
+        result = super().wait_update(deadline)
+        self.updates += 1
+        return result
+
+
+def _create_staker(env: BenchEnv) -> Tuple[BTStaker, "_CountingApi", float]:
+    api = env.create_api()
+    api.__class__ = _CountingApi
+    begin = time.perf_counter()
+    staker = BTStaker(api, 2, [1, 2], env.future_configs())
+    return staker, api, time.perf_counter() - begin  # type: ignore
+
+
+def _run_staker(staker: BTStaker, api: "_CountingApi") -> Tuple[int, float]:
+    begin = time.perf_counter()
+    try:
+        staker.start_work()
+    except BacktestFinished:
+        pass
+    return api.updates, time.perf_counter() - begin
@@ -0,0 +1,178 @@
+"""合成K线数据
+
+make_klines 生成与天勤 get_kline_serial 返回结构相同的K线 DataFrame，
+write_replay_data 生成本地回放数据目录(见 ReplayDataSource)，供完整的盯盘循环使用。
+价格为几何随机游走，相同的 seed 生成相同的数据。
+"""
+import itertools
+import json
+import string
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from replay.api import to_ns
+from replay.kline_store import KLINE_COLUMNS, KlineStore
+
+_NS = 1_000_000_000
+# 合成品种的交易时段，只有日盘
+TRADING_TIME = {
+    "day": [["09:00:00", "11:30:00"], ["13:30:00", "15:00:00"]],
+    "night": [],
+}
+DURATIONS = (24 * 60 * 60, 3 * 60 * 60, 30 * 60, 5 * 60)
+_BASE_DURATION = 5 * 60
+
+
+def make_klines(
+    count: int = 200,
+    duration: int = _BASE_DURATION,
+    symbol: str = "DCE.aa2309",
+    start: datetime = datetime(2023, 1, 3, 9),
+    base_price: float = 3000.0,
+    seed: int = 0,
+) -> DataFrame:
+    """生成 count 根连续的K线，字段与天勤K线序列相同"""
+    close = _random_walk(count, base_price, np.random.default_rng(seed))
+    open_p = np.concatenate([[base_price], close[:-1]])
+    spread = np.abs(close - open_p) + close * 0.002
+    klines = DataFrame({
+        "id": np.arange(count, dtype=float),
+        "datetime": (to_ns(start) + np.arange(count) * duration * _NS
+                     ).astype(float),
+        "open": open_p,
+        "high": np.maximum(open_p, close) + spread / 2,
+        "low": np.minimum(open_p, close) - spread / 2,
+        "close": close,
+        "volume": np.full(count, 100.0),
+        "open_oi": np.full(count, 1000.0),
+        "close_oi": np.full(count, 1000.0),
+    })
+    klines["symbol"] = symbol
+    klines["duration"] = duration
+    return klines
+
+
+def product_names(count: int) -> List[str]:
+    """生成 count 个不重复的合成品种代码，如 DCE.aa"""
+    letters = itertools.product(string.ascii_lowercase, repeat=2)
+    return [f"DCE.{a}{b}" for a, b in itertools.islice(letters, count)]
+
+
+def trading_days(start: date, count: int) -> List[date]:
+    """从 start 开始的 count 个工作日"""
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def write_replay_data(
+    path: str,
+    products: int,
+    start: date = date(2023, 3, 1),
+    days: int = 5,
+    history_days: int = 260,
+    seed: int = 0,
+) -> Tuple[List[str], datetime, datetime]:
+    """生成 products 个品种的回放数据，返回 (主连代码列表, 回放开始时间, 回放结束时间)
+
+    每个品种有当前主力合约(9月)和下一主力合约(次年1月)两个合约，回放开始前有
+    history_days 个交易日的历史K线，保证各周期的K线窗口和指标都已就绪
+    """
+    root = Path(path)
+    root.mkdir(parents=True, exist_ok=True)
+    store = KlineStore(path)
+    candidates = trading_days(start - timedelta(days=history_days * 2),
+                              history_days * 2 + days)
+    all_days = [d for d in candidates if d < start][-history_days:] + \
+        [d for d in candidates if d >= start][:days]
+    instruments = {}
+    mj_symbols = []
+    for i, product in enumerate(product_names(products)):
+        current = f"{product}{start.year % 100:02d}09"
+        following = f"{product}{(start.year + 1) % 100:02d}01"
+        instruments[product] = {"trading_time": TRADING_TIME,
+                                "volume_multiple": 10, "price_tick": 1}
+        instruments[current] = {"expire_datetime": f"{start.year}-09-15"}
+        instruments[following] = {"expire_datetime": f"{start.year + 1}-01-15"}
+        mj_symbol = f"KQ.m@{product}"
+        base = _base_klines(all_days, 2000.0 + 100 * i, seed + i)
+        # 主连合约的K线与当前主力合约相同
+        for symbol, scale in ((mj_symbol, 1.0), (current, 1.0),
+                              (following, 1.01)):
+            bars = base.copy()
+            for column in ("open", "high", "low", "close"):
+                bars[column] = bars[column] * scale
+            for duration in DURATIONS:
+                store.append(symbol, duration, _resample(bars, duration))
+        (root / mj_symbol).mkdir(exist_ok=True)
+        pd.DataFrame({
+            "datetime": [to_ns(datetime.combine(all_days[0], time()))],
+            "underlying_symbol": [current],
+        }).to_csv(root / mj_symbol / "underlying.csv", index=False)
+        mj_symbols.append(mj_symbol)
+    (root / "instruments.json").write_text(json.dumps(instruments), "utf-8")
+    begin = datetime.combine(start, time())
+    end = datetime.combine(all_days[-1], time.max)
+    return mj_symbols, begin, end
+
+
+def _random_walk(count: int, base_price: float,
+                 rng: np.random.Generator) -> np.ndarray:
+    returns = rng.normal(0, 0.004, count)
+    return np.round(base_price * np.exp(np.cumsum(returns)), 1)
+
+
+def _session_minutes() -> np.ndarray:
+    """交易时段内每根5分钟K线的开始时间(距零点的分钟数)"""
+    starts = []
+    for begin, end in TRADING_TIME["day"]:
+        b = _to_minutes(begin)
+        starts.extend(range(b, _to_minutes(end), _BASE_DURATION // 60))
+    return np.array(starts)
+
+
+def _to_minutes(value: str) -> int:
+    hour, minute, _ = value.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def _base_klines(days: List[date], base_price: float,
+                 seed: Optional[int]) -> DataFrame:
+    """生成全部交易日的5分钟K线"""
+    minutes = _session_minutes()
+    day_ns = np.array([to_ns(datetime.combine(d, time()))
+                       for d in days], dtype=np.int64)
+    dt = (day_ns[:, None] + minutes[None, :] * 60 * _NS).ravel()
+    klines = make_klines(len(dt), _BASE_DURATION, base_price=base_price,
+                         seed=seed)
+    klines["datetime"] = dt
+    return klines[KLINE_COLUMNS]
+
+
+def _resample(bars: DataFrame, duration: int) -> DataFrame:
+    """将5分钟K线合成为 duration 周期的K线，按东八区时间对齐"""
+    if duration == _BASE_DURATION:
+        return bars.reset_index(drop=True)
+    offset = 8 * 60 * 60 * _NS
+    step = duration * _NS
+    key = (bars["datetime"] + offset) // step * step - offset
+    grouped = bars.groupby(key.to_numpy())
+    return DataFrame({
+        "datetime": grouped["datetime"].first().index.astype(np.int64),
+        "open": grouped["open"].first().to_numpy(),
+        "high": grouped["high"].max().to_numpy(),
+        "low": grouped["low"].min().to_numpy(),
+        "close": grouped["close"].last().to_numpy(),
+        "volume": grouped["volume"].sum().to_numpy(),
+        "open_oi": grouped["open_oi"].first().to_numpy(),
+        "close_oi": grouped["close_oi"].last().to_numpy(),
+    })
@@ -23,6 +23,15 @@ def create_sc_odm(config: SystemConfig) -> TradeConfigInfo:
     bd.start_date = t_config.start_date
     bd.end_date = t_config.end_date
     sc_odm.backtest_days = bd
+    sc_odm.backtest_backend = getattr(t_config, 'backtest_backend', 'tq')
+    sc_odm.replay_data_path = getattr(t_config, 'replay_data_path', None)
+    sc_odm.storage_backend = getattr(t_config, 'storage_backend', 'mongo')
+    sc_odm.storage_dump_path = getattr(t_config, 'storage_dump_path', None)
+    sc_odm.journal_path = getattr(t_config, 'journal_path', None)
+    sc_odm.latency_dump_interval = getattr(
+        t_config, 'latency_dump_interval', 0)
+    sc_odm.latency_dump_path = getattr(t_config, 'latency_dump_path', None)
+    sc_odm.holidays = getattr(t_config, 'holidays', [])
     sc_odm.date_time = get_china_tz_now()
     tq_account = Account()
     tq_account.user_name = tq_config.user  # type: ignore
@@ -53,6 +62,7 @@ def create_fc_odm(configs: list[FutureConfig]) -> list[FutureConfigInfo]:
         fc_odm.name = config.name  # type: ignore
         fc_odm.open_pos_scale = config.open_pos_scale
         fc_odm.switch_days = config.switch_days  # type: ignore
+        fc_odm.roll_horizon = getattr(config, 'roll_horizon', 15)
         fc_odm.main_symbols = config.main_symbols  # type: ignore
         fc_odm.multiple = config.multiple  # type: ignore
         long_config = LongConfig()
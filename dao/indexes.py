@@ -0,0 +1,63 @@
+"""交易数据集合的索引管理
+
+这里声明交易过程中频繁查询所需的复合索引，连接数据库时由 ensure_indexes 创建。
+回测数据库会积累多年的开仓提示和开平仓记录，没有索引的查询会变成全表扫描。
+"""
+import logging
+from typing import Dict, List, Tuple, Type
+
+from mongoengine import Document
+
+from dao.odm.future_trade import (
+    BottomOpenVolume,
+    BottomOpenVolumeTip,
+    BottomTradeStatus,
+    MainJointSymbolStatus,
+    MainOpenVolume,
+    MainTradeStatus,
+    SwitchSymbolTradeRecord,
+)
+
+IndexKeys = List[Tuple[str, int]]
+
+# 集合 -> 需要的索引，字段顺序为 等值查询字段、排序字段、范围查询字段
+TRADE_INDEXES: Dict[Type[Document], List[IndexKeys]] = {
+    # 按合约和方向查询开仓信息
+    MainOpenVolume: [[("symbol", 1), ("direction", 1)]],
+    BottomOpenVolume: [[("symbol", 1), ("direction", 1)]],
+    # 按主连和当前合约查询未完成的换月记录，默认按 quote_time 倒序
+    SwitchSymbolTradeRecord: [
+        [
+            ("custom_symbol", 1),
+            ("current_symbol", 1),
+            ("current_close_status", 1),
+            ("quote_time", -1),
+        ]
+    ],
+    # 查询最近的开仓提示，以及某个合约一段时间内的开仓提示
+    BottomOpenVolumeTip: [
+        [("dkline_time", -1)],
+        [("symbol", 1), ("direction", 1), ("dkline_time", -1)],
+    ],
+    # 按主连查询交易状态，按合约和方向的唯一索引在文档定义中声明
+    MainTradeStatus: [[("custom_symbol", 1)]],
+    BottomTradeStatus: [[("custom_symbol", 1)]],
+}
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_indexes() -> int:
+    """创建文档定义中的索引以及 TRADE_INDEXES 中声明的索引，返回声明的索引数量
+
+    索引已经存在时 MongoDB 不会重复创建
+    """
+    count = 0
+    for cls in (MainJointSymbolStatus, *TRADE_INDEXES):
+        cls.ensure_indexes()  # type: ignore
+        collection = cls._get_collection()  # type: ignore
+        for keys in TRADE_INDEXES.get(cls, []):
+            collection.create_index(keys, background=True)
+            count += 1
+    logger.debug(f"已确认交易数据索引{count}个")
+    return count
@@ -48,6 +48,8 @@ class FutureConfigInfo(Document):
     open_pos_scale: float = FloatField()  # type: ignore
     # 换月时间距离交割日的天数
     switch_days: List[int] = ListField()  # type: ignore
+    # 当前合约剩余天数小于最大换月天数加上该天数时，创建下一合约的交易策略
+    roll_horizon: int = IntField(default=15)  # type: ignore
     # 该品种的主力合约列表
     main_symbols: List[str] = ListField()  # type: ignore
     long_config: LongConfig = EmbeddedDocumentField(
@@ -34,6 +34,22 @@ class TradeConfigInfo(Document):
         IntField(), default=[1, 2])  # type: ignore
     backtest_days: BacktestDays = EmbeddedDocumentField(
         BacktestDays)  # type: ignore
+    # 回测使用的行情来源 tq:天勤回测服务 replay:本地K线回放
+    backtest_backend: str = StringField(default="tq")  # type: ignore
+    # 本地K线回放数据目录，使用天勤回测时已完成的K线也会保存到该目录
+    replay_data_path: str = StringField()  # type: ignore
+    # 交易数据存储 mongo:MongoDB memory:内存数据库，只用于回测
+    storage_backend: str = StringField(default="mongo")  # type: ignore
+    # 使用内存存储时，回测结束后导出交易数据的目录
+    storage_dump_path: str = StringField()  # type: ignore
+    # 实盘交易事件日志目录，用于程序中断后恢复尚未写入数据库的交易状态
+    journal_path: str = StringField()  # type: ignore
+    # 交易循环延迟统计的输出间隔(秒)，0 表示不统计
+    latency_dump_interval: float = FloatField(default=0)  # type: ignore
+    # 延迟统计 JSON 行文件的输出目录，不设置时只输出到日志
+    latency_dump_path: str = StringField()  # type: ignore
+    # 交易所节假日，交易日历据此跳过休市日及节前夜盘
+    holidays: List[datetime] = ListField(DateTimeField())  # type: ignore
     tq_account: Account = EmbeddedDocumentField(Account)  # type: ignore
     rohon_account: RohonAccount = EmbeddedDocumentField(
         RohonAccount)  # type: ignore
@@ -0,0 +1,54 @@
+"""交易数据存储后端
+
+mongo: 使用 MongoDB，回测时每次使用新的数据库
+memory: 回测使用进程内的内存数据库(mongomock)，各 DAO 和文档类不需要修改，
+    不需要 MongoDB 服务，回测结束后可以将全部集合导出为 JSON 文件
+
+mongomock 是运行时依赖，和其他依赖一起安装。
+"""
+import logging
+from pathlib import Path
+
+import mongomock
+from bson import json_util
+from mongoengine import connect
+from mongoengine.connection import get_db
+
+from utils.common_tools import tz_utc_8
+
+STORAGE_BACKENDS = ("mongo", "memory")
+
+logger = logging.getLogger(__name__)
+
+
+def connect_storage(backend: str, url: str, db_name: str):
+    """根据存储后端连接数据库，url 为 MongoDB 服务地址，内存存储不使用"""
+    if backend == "memory":
+        connect(
+            db_name,
+            host="mongodb://localhost",
+            mongo_client_class=mongomock.MongoClient,
+            tz_aware=True,
+            tzinfo=tz_utc_8,
+        )
+    elif backend == "mongo":
+        connect(host=f"{url}{db_name}?authSource=admin", tz_aware=True,
+                tzinfo=tz_utc_8)
+    else:
+        raise ValueError(
+            f"不支持的存储后端:{backend}, 可选值为 {STORAGE_BACKENDS}")
+
+
+def dump_database(path: str) -> int:
+    """将当前数据库的全部集合导出到 path 目录，每个集合一个 JSON 文件，返回导出的记录数量"""
+    db = get_db()
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for name in db.list_collection_names():
+        records = list(db[name].find())
+        (directory / f"{name}.json").write_text(
+            json_util.dumps(records, ensure_ascii=False), "utf-8")
+        count += len(records)
+    logger.info(f"导出{count}条记录到{directory}")
+    return count
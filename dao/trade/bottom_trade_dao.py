@@ -1,12 +1,13 @@
 from datetime import datetime
 import hashlib
-from typing import List
+from typing import Dict, List, Tuple
 from dao.odm.future_trade import (
     BottomCloseVolume, BottomIndicatorValues, BottomOpenCondition,
     BottomOpenVolume, BottomOpenVolumeTip, BottomSoldCondition,
     BottomTradeStatus, MainJointSymbolStatus, TradeStatus
 )
 import dao.trade.trade_dao as dao
+from dao.trade.status_repository import status_repository
 from utils.common_tools import (
     get_china_date_from_dt, get_china_tz_now
 )
@@ -16,10 +17,29 @@ def getBottomOpenVolumeTips() -> List[BottomOpenVolumeTip]:
     return BottomOpenVolumeTip.objects()  # type: ignore
 
 
+def getLatestTips() -> Dict[Tuple[str, int], BottomOpenVolumeTip]:
+    '''一次查询获取最近一批开仓提示，按(合约代码, 交易方向)索引
+
+    每个合约和方向取 dkline_time 最大的提示，再只保留属于最近一批(dkline_time 最大)的提示
+    '''
+    pipeline = [
+        {'$sort': {'dkline_time': -1}},
+        {'$group': {'_id': {'symbol': '$symbol', 'direction': '$direction'},
+                    'tip': {'$first': '$$ROOT'}}},
+    ]
+    tips = [BottomOpenVolumeTip._from_son(r['tip'])  # type: ignore
+            for r in BottomOpenVolumeTip._get_collection().aggregate(pipeline)]
+    if not tips:
+        return {}
+    last_time = max(t.dkline_time for t in tips)
+    return {(t.symbol, t.direction): t
+            for t in tips if t.dkline_time == last_time}
+
+
 def getTradeStatus(symbol: str, direction: int) -> BottomTradeStatus:
     '''根据自定义合约代码获取交易状态信息'''
-    return BottomTradeStatus.objects(  # type: ignore
-        symbol=symbol, direction=direction).first()
+    return status_repository.get_trade_status(  # type: ignore
+        BottomTradeStatus, symbol, direction)
 
 
 def getTradeStatusByCustomSymbol(custom_symbol: str) -> list[BottomTradeStatus]:
@@ -41,7 +61,7 @@ def createTradeStatus(
     ts.open_condition.minute_30_condition = BottomIndicatorValues()
     ts.sold_condition = BottomSoldCondition()
 
-    ts.save()
+    status_repository.add(ts)
     return ts
 
 
@@ -0,0 +1,226 @@
+"""交易事件日志
+
+交易状态采用延迟写入(见 status_writer)，程序中断时尚未写入数据库的修改会丢失。
+日志在修改登记时同步追加一条事件(开仓、平仓、止损调整、换月删除)，记录文档所在集合、
+主键以及发生变化的字段，重启时先用日志把这些修改重放到数据库，再加载交易状态。
+
+日志只是 status_writer 延迟写入的预写日志，只覆盖经 status_writer 登记的交易状态修改。
+开平仓记录、换月记录、委托单以及换月时直接 save 的文档都同步写入数据库，不经过日志。
+恢复时修改写回数据库，交易状态仍由 status_repository 预加载时从数据库读取，
+不从快照和日志重建内存中的状态索引。
+
+日志文件使用内存映射，只在末尾追加，每条记录为:
+    长度(4字节) + CRC32(4字节) + 序号(8字节) + JSON 内容
+打开时从头扫描，遇到长度为 0、校验失败或序号不递增的记录即为日志末尾，
+写入中断产生的不完整记录会被忽略。
+
+日志同时在内存中维护每个文档的最新修改，记录数达到 snapshot_interval 时将其写入快照
+文件并清空日志。快照记录已包含的最大序号，重放时跳过序号不大于它的日志记录。
+
+延迟写入的文档全部写入数据库(或重启时重放完成)后设置检查点：清空内存状态并写入空快照，
+之后重启只需重放检查点之后的修改，也不会用旧的修改覆盖不经过日志保存的字段。
+"""
+import logging
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from bson import json_util
+from mongoengine.connection import get_db
+
+_HEADER = struct.Struct("<IIQ")
+_INITIAL_SIZE = 1 << 20
+DEFAULT_SNAPSHOT_INTERVAL = 1000
+
+# (集合名称, 主键) -> {"set": {...}, "unset": {...}} 或 {"deleted": True}
+JournalState = Dict[Tuple[str, str], dict]
+
+logger = logging.getLogger(__name__)
+
+
+class TradeJournal:
+    """交易事件日志，未打开时不记录任何事件
+
+    Args:
+        snapshot_interval: 两次快照之间的最多日志记录数
+    """
+
+    def __init__(self, snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL):
+        self._snapshot_interval = snapshot_interval
+        self._dir: Optional[Path] = None
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._end = 0
+        self._seq = 0
+        self._count = 0
+        self.state: JournalState = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self._map is not None
+
+    def open(self, path: str):
+        """打开日志目录，读取快照并重放日志到内存状态"""
+        self.close()
+        self._dir = Path(path)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self.state, self._seq = self._load_snapshot()
+        journal = self._dir / "journal.bin"
+        self._file = open(journal, "r+b" if journal.exists() else "w+b")
+        if os.path.getsize(journal) < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._scan()
+        logger.info(f"交易日志已打开，快照后日志{self._count}条，"
+                    f"文档状态{len(self.state)}个")
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()  # type: ignore
+            self._map = None
+            self._file = None
+
+    def record(self, event: str, collection: str, pk, sets: dict,
+               unsets: dict):
+        """记录文档的修改，sets/unsets 为发生变化的字段"""
+        if not self.is_open:
+            return
+        self._append({"event": event, "c": collection, "id": pk,
+                      "set": sets, "unset": unsets})
+
+    def record_delete(self, event: str, collection: str, pk):
+        """记录文档的删除"""
+        if not self.is_open:
+            return
+        self._append({"event": event, "c": collection, "id": pk,
+                      "deleted": True})
+
+    def recover(self) -> int:
+        """将日志中的全部修改重放到当前数据库，返回重放的文档数量
+
+        重放使用 $set/$unset 和删除，重复执行结果相同
+        """
+        db = get_db()
+        for (collection, _), change in self.state.items():
+            pk = change["id"]
+            if change.get("deleted"):
+                db[collection].delete_one({"_id": pk})
+                continue
+            update = {}
+            if change["set"]:
+                update["$set"] = change["set"]
+            if change["unset"]:
+                update["$unset"] = change["unset"]
+            if update:
+                db[collection].update_one({"_id": pk}, update)
+        count = len(self.state)
+        if count:
+            logger.info(f"从交易日志恢复{count}个文档")
+        self.checkpoint()
+        return count
+
+    def checkpoint(self):
+        """日志中的全部修改已写入数据库时调用，清空内存状态和日志"""
+        if not self.is_open or (not self.state and self._count == 0):
+            return
+        self.state = {}
+        self.snapshot()
+
+    def snapshot(self):
+        """将内存状态写入快照文件并清空日志"""
+        snapshot = self._dir / "snapshot.json"  # type: ignore
+        tmp = snapshot.with_suffix(".tmp")
+        data = {"seq": self._seq,
+                "state": [[list(k), v] for k, v in self.state.items()]}
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, snapshot)
+        # 快照完成后日志从头开始写入，旧记录的序号不大于快照序号，不会被重放
+        self._map[:_HEADER.size] = bytes(_HEADER.size)  # type: ignore
+        self._map.flush()  # type: ignore
+        self._end = 0
+        self._count = 0
+
+    def _append(self, event: dict):
+        payload = json_util.dumps(event).encode("utf-8")
+        size = _HEADER.size + len(payload)
+        # 预留下一条记录的头部，保证日志末尾之后总是长度为 0 的记录
+        self._ensure_capacity(self._end + size + _HEADER.size)
+        self._seq += 1
+        start, end = self._end, self._end + size
+        buf = self._map  # type: ignore
+        buf[end:end + _HEADER.size] = bytes(_HEADER.size)
+        buf[start + _HEADER.size:end] = payload
+        # 最后写入头部，写入中断时这条记录不会被读到
+        buf[start:start + _HEADER.size] = _HEADER.pack(
+            len(payload), zlib.crc32(payload), self._seq)
+        self._end += size
+        self._count += 1
+        self._apply(event)
+        if self._count >= self._snapshot_interval:
+            self.snapshot()
+
+    def _apply(self, event: dict):
+        key = (event["c"], str(event["id"]))
+        if event.get("deleted"):
+            self.state[key] = {"id": event["id"], "deleted": True}
+            return
+        change = self.state.get(key)
+        if change is None or change.get("deleted"):
+            change = {"id": event["id"], "set": {}, "unset": {}}
+            self.state[key] = change
+        for field, value in event["set"].items():
+            change["unset"].pop(field, None)
+            change["set"][field] = value
+        for field, value in event["unset"].items():
+            change["set"].pop(field, None)
+            change["unset"][field] = value
+
+    def _scan(self):
+        self._end = 0
+        self._count = 0
+        last_seq = 0
+        buf = self._map  # type: ignore
+        size = len(buf)
+        while self._end + _HEADER.size <= size:
+            length, crc, seq = _HEADER.unpack_from(buf, self._end)
+            start = self._end + _HEADER.size
+            if length == 0 or start + length > size or seq <= last_seq:
+                break
+            payload = buf[start:start + length]
+            if zlib.crc32(payload) != crc:
+                logger.warning(f"交易日志在{self._end}处校验失败，忽略之后的记录")
+                break
+            last_seq = seq
+            if seq > self._seq:
+                self._apply(json_util.loads(payload.decode("utf-8")))
+                self._seq = seq
+            self._end = start + length
+            self._count += 1
+
+    def _load_snapshot(self) -> Tuple[JournalState, int]:
+        snapshot = self._dir / "snapshot.json"  # type: ignore
+        if not snapshot.exists():
+            return {}, 0
+        data = json_util.loads(snapshot.read_text("utf-8"))
+        return {tuple(k): v for k, v in data["state"]}, data["seq"]
+
+    def _ensure_capacity(self, size: int):
+        current = len(self._map)  # type: ignore
+        if size <= current:
+            return
+        while current < size:
+            current *= 2
+        self._map.close()  # type: ignore
+        self._file.truncate(current)  # type: ignore
+        self._map = mmap.mmap(self._file.fileno(), 0)  # type: ignore
+
+
+trade_journal = TradeJournal()
@@ -6,6 +6,7 @@ from dao.odm.future_trade import (
     MainCloseVolume, MainIndicatorValues, MainJointSymbolStatus, MainOpenCondition,
     MainOpenVolume, MainSoldCondition, MainTradeStatus, TradeStatus)
 import dao.trade.trade_dao as dao
+from dao.trade.status_repository import status_repository
 from utils.common_tools import (
     get_china_date_from_dt, get_china_tz_now
 )
@@ -13,7 +14,8 @@ from utils.common_tools import (
 
 def getTradeStatus(symbol: str, direction: int) -> MainTradeStatus:
     '''根据自定义合约代码获取交易状态信息'''
-    return MainTradeStatus.objects(symbol=symbol, direction=direction).first()  # type: ignore
+    return status_repository.get_trade_status(  # type: ignore
+        MainTradeStatus, symbol, direction)
 
 
 def getTradeStatusByCustomSymbol(custom_symbol: str) -> list[MainTradeStatus]:
@@ -35,7 +37,7 @@ def createTradeStatus(
     ts.open_condition.minute_30_condition = MainIndicatorValues()
     ts.open_condition.minute_5_condition = MainIndicatorValues()
     ts.sold_condition = MainSoldCondition()
-    ts.save()
+    status_repository.add(ts)
     return ts
 
 
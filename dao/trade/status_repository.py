@@ -0,0 +1,105 @@
+"""交易状态仓库
+
+启动时每个主连策略和交易策略都要查询一次自己的状态，不存在时再创建，
+品种较多时会产生大量数据库往返。在 preloading 期间，仓库一次性读取全部主连合约状态
+和交易状态并建立内存索引，查询直接使用索引，新创建的状态在结束时按集合一次性批量插入。
+preloading 之外的查询和创建直接访问数据库，避免换月删除状态后索引过期。
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+from mongoengine import Document
+
+from dao.odm.future_trade import (
+    BottomTradeStatus,
+    MainJointSymbolStatus,
+    MainTradeStatus,
+    TradeStatus,
+)
+from utils.common_tools import LoggerGetter
+
+
+class StatusRepository:
+    """主连合约状态和交易状态仓库"""
+
+    logger = LoggerGetter()
+
+    def __init__(self):
+        self.is_preloading = False
+        self._mj_statuses: Dict[str, MainJointSymbolStatus] = {}
+        self._statuses: Dict[Tuple[Type[TradeStatus], str, int],
+                             TradeStatus] = {}
+        self._created: List[Document] = []
+
+    @contextmanager
+    def preloading(self) -> Iterator["StatusRepository"]:
+        """预加载全部状态，结束时批量插入期间新创建的状态"""
+        self._preload()
+        try:
+            yield self
+            self._insert_created()
+        finally:
+            self.is_preloading = False
+            self._mj_statuses.clear()
+            self._statuses.clear()
+            self._created.clear()
+
+    def get_mj_status(
+        self, custom_symbol: str
+    ) -> Optional[MainJointSymbolStatus]:
+        if self.is_preloading:
+            return self._mj_statuses.get(custom_symbol)
+        return MainJointSymbolStatus.objects(  # type: ignore
+            custom_symbol=custom_symbol).first()
+
+    def get_trade_status(
+        self, cls: Type[TradeStatus], symbol: str, direction: int
+    ) -> Optional[TradeStatus]:
+        if self.is_preloading:
+            return self._statuses.get((cls, symbol, direction))
+        return cls.objects(  # type: ignore
+            symbol=symbol, direction=direction).first()
+
+    def add(self, doc: Document):
+        """保存新创建的状态，预加载期间延迟到结束时批量插入"""
+        if not self.is_preloading:
+            doc.save()
+            return
+        if isinstance(doc, MainJointSymbolStatus):
+            self._mj_statuses[doc.custom_symbol] = doc  # type: ignore
+        else:
+            key = (type(doc), doc.symbol, doc.direction)  # type: ignore
+            self._statuses[key] = doc  # type: ignore
+        self._created.append(doc)
+
+    def _preload(self):
+        self._mj_statuses = {
+            s.custom_symbol: s for s in MainJointSymbolStatus.objects()
+        }
+        for cls in (MainTradeStatus, BottomTradeStatus):
+            for ts in cls.objects():  # type: ignore
+                self._statuses[(cls, ts.symbol, ts.direction)] = ts
+        self.is_preloading = True
+        self.logger.debug(
+            f"预加载主连合约状态{len(self._mj_statuses)}个，"
+            f"交易状态{len(self._statuses)}个"
+        )
+
+    def _insert_created(self):
+        for cls in (MainJointSymbolStatus, MainTradeStatus, BottomTradeStatus):
+            # 预加载期间已经单独保存过的文档不再插入
+            docs = [d for d in self._created
+                    if type(d) is cls and d.pk is None]
+            if not docs:
+                continue
+            for doc in docs:
+                doc.validate()
+            cls.objects.insert(docs, load_bulk=False)  # type: ignore
+            for doc in docs:
+                # 插入后作为已保存的文档，之后的保存只更新变化的字段
+                doc._created = False
+                doc._clear_changed_fields()
+            self.logger.debug(f"批量创建{cls.__name__} {len(docs)}个")
+
+
+status_repository = StatusRepository()
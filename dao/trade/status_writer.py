@@ -0,0 +1,106 @@
+"""交易状态延迟写入
+
+止损价提高、止盈阶段变化等交易状态修改不再在交易循环中同步保存到数据库，
+而是登记为待写入文档，由盯盘人定时批量写入，每个文档只更新发生变化的字段($set/$unset)。
+开平仓时强制同步写入全部待写入文档。
+
+写入顺序与文档最后一次登记的顺序相同，开平仓时先登记开仓信息再登记交易状态，
+程序中断时数据库中的交易状态不会引用尚未保存的开平仓信息。
+"""
+import time
+from itertools import groupby
+from typing import Callable, Dict, List
+
+from mongoengine import Document
+from pymongo import UpdateOne
+
+from dao.trade.journal import trade_journal
+from utils.common_tools import LoggerGetter
+
+# 定时写入的间隔时间(秒)
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class StatusWriter:
+    """待写入文档登记处，交易状态等文档修改后登记到这里，定时或在开平仓时批量写入"""
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_FLUSH_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._interval = interval
+        self._clock = clock
+        self._dirty: Dict[int, Document] = {}
+        self._last_flush = clock()
+
+    def mark(self, doc: Document, event: str = "update"):
+        """登记修改过的文档，尚未保存过的文档直接保存
+
+        登记的同时将修改记录到交易事件日志，程序中断后可以恢复尚未写入的修改
+        """
+        if doc.pk is None:
+            doc.save()
+            return
+        sets, unsets = doc._delta()
+        trade_journal.record(event, doc._get_collection_name(), doc.pk,
+                             sets, unsets)
+        # 再次登记的文档移到最后，保证写入顺序与修改顺序一致
+        self._dirty.pop(id(doc), None)
+        self._dirty[id(doc)] = doc
+
+    def pending_count(self) -> int:
+        return len(self._dirty)
+
+    def flush_if_due(self) -> int:
+        """距离上次写入超过间隔时间时写入全部待写入文档"""
+        if self._dirty and self._clock() - self._last_flush >= self._interval:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """同步写入全部待写入文档，返回执行的更新数量"""
+        self._last_flush = self._clock()
+        docs = list(self._dirty.values())
+        self._dirty.clear()
+        count = 0
+        written = 0
+        try:
+            # 相邻的同一集合文档合并为一次批量写入
+            for _, group in groupby(docs, key=lambda d: d._get_collection()):
+                group = list(group)
+                count += self._write(group)
+                written += len(group)
+        except Exception:
+            # 未写入的文档保留在登记处，下次继续写入
+            for doc in docs[written:]:
+                self._dirty.setdefault(id(doc), doc)
+            raise
+        # 登记过的修改已全部写入数据库，日志中不再需要保留
+        trade_journal.checkpoint()
+        if count:
+            self.logger.debug(f"批量写入{count}个文档")
+        return count
+
+    @staticmethod
+    def _write(docs: List[Document]) -> int:
+        requests = []
+        for doc in docs:
+            sets, unsets = doc._delta()
+            update = {}
+            if sets:
+                update["$set"] = sets
+            if unsets:
+                update["$unset"] = unsets
+            if update:
+                requests.append(UpdateOne({"_id": doc.pk}, update))
+        if requests:
+            docs[0]._get_collection().bulk_write(requests, ordered=True)
+        for doc in docs:
+            doc._clear_changed_fields()
+        return len(requests)
+
+
+status_writer = StatusWriter()
@@ -5,6 +5,9 @@ from dao.odm.future_trade import (
 from utils.common_tools import get_custom_symbol
 import dao.trade.main_trade_dao as mdao
 import dao.trade.bottom_trade_dao as bdao
+from dao.trade.journal import trade_journal
+from dao.trade.status_repository import status_repository
+from dao.trade.status_writer import status_writer
 
 def updateSwitchSymbolTradeRecord(sstr: SwitchSymbolTradeRecord):
     '''更新换月交易记录'''
@@ -36,8 +39,8 @@ def getSwitchSymbolTradeRecord(custom_symbol: str, symbol: str
     
 
 def updateTradeStatus(ts: TradeStatus):
-    '''更新交易状态信息到数据库中'''
-    ts.save(cascade=True)
+    '''登记交易状态信息，由延迟写入批量更新到数据库中'''
+    status_writer.mark(ts)
 
 
 def deleteTradeStatus(ts: TradeStatus):
@@ -47,7 +50,7 @@ def deleteTradeStatus(ts: TradeStatus):
 def getMainJointSymbolStatus(custom_symbol: str) -> MainJointSymbolStatus:
     '''根据主连合约获取策略交易状态，如果不存在则在数据库中创建
     '''
-    return MainJointSymbolStatus.objects(custom_symbol=custom_symbol).first()  # type: ignore
+    return status_repository.get_mj_status(custom_symbol)  # type: ignore
 
 
 def createMainJointSymbolStatus(
@@ -62,7 +65,7 @@ def createMainJointSymbolStatus(
     mjss.next_symbol = next_symbol
     mjss.direction = direction
     mjss.last_modified = dt
-    mjss.save()
+    status_repository.add(mjss)
     return mjss
 
 
@@ -86,7 +89,9 @@ def save_close_volume(ts: TradeStatus, cpd: dict, cv: CloseVolume):
         ts.end_time = cv.trade_time
         opi.is_close = True
         opi.last_modified = cv.trade_time
-    ts.save(cascade=True)
+    status_writer.mark(opi, "close")
+    status_writer.mark(ts, "close")
+    status_writer.flush()
 
 
 def save_open_volume(ts: TradeStatus, opd: dict, ov):
@@ -103,7 +108,8 @@ def save_open_volume(ts: TradeStatus, opd: dict, ov):
     ts.carrying_volume = ov.volume
     ts.start_time = ov.trade_time
     ts.open_pos_info = ov
-    ts.save(cascade=True)
+    status_writer.mark(ts, "open")
+    status_writer.flush()
 
 
 def switch_symbol(
@@ -114,12 +120,19 @@ def switch_symbol(
         trade_status_list: [TradeStatus]):
     '''重置期货合约交易状态信息, 用于下一个交易合约使用'''
     mj_status.save()
-    current_status.delete()
+    _delete_status(current_status)
     next_status.save()
     new_status.save()
     for ts in trade_status_list:
         if ts != next_status and ts != new_status:
-            ts.delete()
+            _delete_status(ts)
+
+
+def _delete_status(ts: TradeStatus):
+    '''删除交易状态，并记录到交易事件日志，避免恢复时重新写入'''
+    trade_journal.record_delete(
+        "rollover", ts._get_collection_name(), ts.pk)
+    ts.delete()
 
 
 def closeout(sts: TradeStatus, symbol: str, t_time: datetime
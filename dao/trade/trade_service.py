@@ -1,6 +1,6 @@
 import logging
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
 from mongoengine.queryset.visitor import Q
 from tqsdk2 import Order
@@ -79,6 +79,20 @@ def get_bottom_trade_status(
     return ts
 
 
+def find_main_trade_status(
+    symbol: str, direction: int
+) -> Optional[MainTradeStatus]:
+    """获取合约的交易状态，不存在时返回 None，不在数据库中创建"""
+    return mdao.getTradeStatus(symbol, direction)
+
+
+def find_bottom_trade_status(
+    symbol: str, direction: int
+) -> Optional[BottomTradeStatus]:
+    """获取合约的交易状态，不存在时返回 None，不在数据库中创建"""
+    return bdao.getTradeStatus(symbol, direction)
+
+
 def del_trade_status(ts: TradeStatus):
     dao.deleteTradeStatus(ts)
 
@@ -215,6 +229,7 @@ def store_b_open_volume_tip(
     status: BottomTradeStatus, pos: int
 ) -> BottomOpenVolumeTip:
     """将开仓信息保存至数据库，并更新合约交易状态信息"""
+    _latest_tips.invalidate()
     return bdao.createOpenVolumeTip(status, pos)
 
 
@@ -229,17 +244,36 @@ def get_last_bottom_tips() -> Optional[List[BottomOpenVolumeTip]]:
     return BottomOpenVolumeTip.get_last_tips()  # type: ignore
 
 
+class _LatestTipCache:
+    """最近一批开仓提示的缓存，每个交易日只查询一次，生成新的开仓提示后重新查询"""
+
+    def __init__(self):
+        self._trading_day: Optional[date] = None
+        self._tips: Dict[Tuple[str, int], BottomOpenVolumeTip] = {}
+
+    def get(self, symbol: str, direction: int, trading_day: date
+            ) -> Optional[BottomOpenVolumeTip]:
+        if self._trading_day != trading_day:
+            try:
+                self._tips = bdao.getLatestTips()
+            except Exception as e:
+                logger.warning(f"获取开仓提示失败: {e}")
+                return None
+            self._trading_day = trading_day
+        return self._tips.get((symbol, direction))
+
+    def invalidate(self):
+        self._trading_day = None
+
+
+_latest_tips = _LatestTipCache()
+
+
 def get_last_bottom_tips_by_symbol(
-    symbol: str, direction: int
+    symbol: str, direction: int, trading_day: date
 ) -> Optional[BottomOpenVolumeTip]:
-    queryset = None
-    try:
-        queryset = get_last_bottom_tips()
-    except Exception:
-        pass
-    if queryset is not None:
-        return queryset.filter(Q(symbol=symbol) & Q(direction=direction)).first()  # type: ignore
-    return None
+    """获取最近一批开仓提示中该合约和方向的提示，同一交易日内使用缓存"""
+    return _latest_tips.get(symbol, direction, trading_day)
 
 
 def get_last7d_count(bovt: BottomOpenVolumeTip) -> int:
@@ -0,0 +1,96 @@
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tqsdk2 import TqApi
+
+from utils.common import LoggerGetter
+
+
+class TradeDispatcher:
+    """交易调度员，盯盘人每次 wait_update 之后由它决定唤醒哪些交易人
+
+    每个交易人登记自己关心的行情对象(quote)和K线序列，调度员在数据更新后只检查这些
+    对象一次，并唤醒拥有发生变化对象的交易人。为保证依赖时间的操作(如盘后操作)
+    能够执行，每隔 heartbeat 秒会唤醒全部交易人一次，回测中使用行情时间计时。
+    交易人的交易策略发生变化(创建下一合约策略、换月)时调用 refresh 重新登记该交易人。
+    """
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self,
+        api: TqApi,
+        heartbeat: float = 60,
+        history: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._api = api
+        self._heartbeat = heartbeat
+        self._clock = clock
+        self._quotes: Dict[int, Tuple[object, List[object]]] = {}
+        self._serials: Dict[int, Tuple[object, List[object]]] = {}
+        # 第一次调度时开始计时，回测开始前行情时间尚未确定
+        self._last_wake_all: Optional[float] = None
+        # 每次循环唤醒的交易人数量
+        self.woken_counts: deque = deque(maxlen=history)
+
+    def register(self, traders: Iterable):
+        """根据交易人当前使用的合约重新登记关注对象"""
+        self._quotes.clear()
+        self._serials.clear()
+        for trader in traders:
+            self._add_trader(trader)
+
+    def refresh(self, trader):
+        """交易人的交易策略发生变化时重新登记它关注的对象"""
+        for owners in (self._quotes, self._serials):
+            for key, (_, traders) in list(owners.items()):
+                if trader in traders:
+                    traders.remove(trader)
+                    if not traders:
+                        del owners[key]
+        self._add_trader(trader)
+
+    def _add_trader(self, trader):
+        quotes, serials = trader.get_watched_objects()
+        for quote in quotes:
+            self._add(self._quotes, quote, trader)
+        for serial in serials:
+            self._add(self._serials, serial, trader)
+
+    @staticmethod
+    def _add(owners: Dict[int, Tuple[object, List[object]]], obj, trader):
+        _, traders = owners.setdefault(id(obj), (obj, []))
+        if trader not in traders:
+            traders.append(trader)
+
+    def dispatch(self, traders: List) -> List:
+        """返回需要执行交易的交易人，保持盯盘人中的顺序"""
+        now = self._clock()
+        if self._last_wake_all is None:
+            self._last_wake_all = now
+        if now - self._last_wake_all >= self._heartbeat:
+            self._last_wake_all = now
+            self.woken_counts.append(len(traders))
+            return traders
+        woken = set()
+        for quote, owners in self._quotes.values():
+            if self._api.is_changing(quote):
+                woken.update(id(t) for t in owners)
+        for serial, owners in self._serials.values():
+            if self._api.is_changing(serial.iloc[-1], "datetime"):
+                woken.update(id(t) for t in owners)
+        result = [t for t in traders if id(t) in woken]
+        self.woken_counts.append(len(result))
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        counts = self.woken_counts
+        return {
+            "quotes": len(self._quotes),
+            "serials": len(self._serials),
+            "iterations": len(counts),
+            "avg_woken": round(sum(counts) / len(counts), 2) if counts else 0,
+            "max_woken": max(counts) if counts else 0,
+        }
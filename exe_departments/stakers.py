@@ -1,25 +1,53 @@
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, List, Optional
 from tqsdk2 import TqApi
 from dao.odm.future_config import FutureConfigInfo
+from exe_departments.dispatcher import TradeDispatcher
 from exe_departments.traders import MainStrategyTrader, Trader
+from replay.kline_store import KlineStore
+from strategies.crossovers import cross_index_cache
+from strategies.indicators import indicator_cache
+from strategies.kline_registry import KlineRegistry
+from strategies.order_manager import OrderManager
+from strategies.price_triggers import price_trigger_index
+from strategies.trade_strategies.mts.condition_batch import ConditionBatch
+from strategies.trading_calendar import to_local_seconds
 from utils.common import LoggerGetter
-from utils.config_utils import get_future_configs
+from utils.config_utils import FutureConfig, get_future_configs
+from utils.latency import latency_recorder
 import dao.config_service as c_service
+from dao.trade.status_repository import status_repository
+from dao.trade.status_writer import status_writer
 
 
 class Staker(ABC):
     logger = LoggerGetter()
     """盯盘人，负责加载期货品种配置，并为每个品种生成一个交易人。当盯盘品种价格等参数发生改变时向交易人发送信号"""
 
-    def __init__(self, api: TqApi, direction: int, strategy_ids: List[int]):
+    def __init__(
+        self,
+        api: TqApi,
+        direction: int,
+        strategy_ids: List[int],
+        configs: Optional[List[FutureConfig]] = None,
+        kline_store: Optional[KlineStore] = None,
+    ):
         self._api = api
+        # 指定时只盯盘这些品种，如并行回测中的某一个分片，否则使用配置文件中的全部品种
+        self._configs = configs
+        self._kline_registry = KlineRegistry(api, store=kline_store)
+        self._order_manager = OrderManager(api, clock=self._get_clock())
+        self._dispatcher = TradeDispatcher(api, clock=self._get_clock())
+        self._condition_batch = ConditionBatch()
         self.direction = direction
         self.strategy_ids = strategy_ids
         self.future_configs: list[
             FutureConfigInfo
         ] = self._init_future_configs()
-        self._init_status()
+        # 创建交易人时一次性加载全部交易状态，不存在的状态最后批量创建
+        with status_repository.preloading():
+            self._init_status()
 
     def start_work(self):
         """执行盯盘操作
@@ -32,7 +60,11 @@ class Staker(ABC):
         logger.info("天勤服务器端已连接成功")
         self._prepare_task()
         logger.info("交易准备工作完成，开始盯盘".center(100, "*"))
-        self._handle_trade()
+        try:
+            self._handle_trade()
+        finally:
+            status_writer.flush()
+            latency_recorder.dump()
 
     def _handle_trade(self):
         """交易相关操作，包括盘前提示，交易，盘后操作
@@ -41,22 +73,47 @@ class Staker(ABC):
         logger = self.logger
         for trader in self.traders:
             trader.execute_before_trade()
+        self._dispatcher.register(self.traders)
         logger.info("盘前提示结束，开始进入交易".center(100, "*"))
         while True:
             traders = filter(lambda t: t.is_active, self.traders)
             # 当所有交易员当日交易结束后，退出循环
             traders = list(traders)
             self._api.wait_update()
-            for trader in traders:
-                trader.execute_trade()
+            latency_recorder.start_tick()
+            # 先处理委托单成交，交易人据此判断持仓状态
+            self._order_manager.advance()
+            woken = self._dispatcher.dispatch(traders)
+            self._prefill_conditions(woken)
+            for trader in woken:
+                with latency_recorder.dispatch(trader.symbol):
+                    trader.execute_trade()
+            status_writer.flush_if_due()
+            latency_recorder.end_tick()
+
+    def _prefill_conditions(self, traders: List[Trader]):
+        """唤醒交易人前跨合约批量判断主策略开仓条件，交易人只需逐级判断可能满足条件的合约"""
+        with latency_recorder.span("batch_condition"):
+            self._condition_batch.prefill(
+                [mjs for t in traders for mjs in t.get_trading_mjs()])
+
+    def _get_clock(self) -> Callable[[], float]:
+        """委托单超时等计时使用的时钟，实盘使用墙上时间"""
+        return time.monotonic
 
     def _init_status(self):
         """初始化盯盘人的状态，使得盯盘人可以进行下一日交易"""
         self.traders: List[Trader] = self._init_traders(
             self.direction, self.strategy_ids
         )
+        # 交易中创建或替换交易策略时重新登记，不必等到下一次盘前
+        for trader in self.traders:
+            trader.on_watch_changed(self._dispatcher.refresh)
 
     def _prepare_task(self):
+        self.logger.info(
+            f"K线订阅数量:{self._kline_registry.subscription_count()}"
+        )
         self.logger.info("当前配置的品种为:")
         for trader in self.traders:
             self.logger.info(f"{trader._config.f_info.symbol}")
@@ -106,29 +163,66 @@ class RealStaker(Staker):
     """实盘交易盯盘人"""
 
     def _init_future_configs(self) -> List[FutureConfigInfo]:
-        return c_service.get_future_configs(get_future_configs())
+        return c_service.get_future_configs(
+            self._configs or get_future_configs()
+        )
 
     def _init_traders(self, d, strategy_ids) -> List[Trader]:
         """加载交易员"""
         traders = []
         for f_config in self.future_configs:
-            traders.append(Trader(self._api, f_config, strategy_ids, d, False))
+            traders.append(
+                Trader(
+                    self._api,
+                    f_config,
+                    strategy_ids,
+                    d,
+                    False,
+                    self._kline_registry,
+                    self._order_manager,
+                )
+            )
         return traders
 
 
 class BTStaker(Staker):
     """回测交易盯盘人"""
 
+    def _get_clock(self) -> Callable[[], float]:
+        """回测使用行情时间计时，结果不受机器速度影响"""
+        return self._quote_time
+
+    def _quote_time(self) -> float:
+        """各交易人行情时间的最大值(东八区本地秒数)，尚未收到行情时为 0"""
+        return max(
+            (
+                to_local_seconds(t._config.quote.datetime)
+                for t in self.traders
+                if t._config.quote.datetime
+            ),
+            default=0.0,
+        )
+
     def _init_future_configs(self) -> List[FutureConfigInfo]:
         return c_service.get_future_configs(
-            get_future_configs(is_backtest=True)
+            self._configs or get_future_configs(is_backtest=True)
         )
 
     def _init_traders(self, d, strategy_ids) -> List[Trader]:
         """加载交易员"""
         traders = []
         for config in self.future_configs:
-            traders.append(Trader(self._api, config, strategy_ids, d, True))
+            traders.append(
+                Trader(
+                    self._api,
+                    config,
+                    strategy_ids,
+                    d,
+                    True,
+                    self._kline_registry,
+                    self._order_manager,
+                )
+            )
         return traders
 
     def _prepare_task(self):
@@ -142,6 +236,7 @@ class BTStaker(Staker):
         logger = self.logger
         for trader in self.traders:
             trader.execute_before_trade()
+        self._dispatcher.register(self.traders)
         logger.info("盘前提示结束，开始进入交易".center(100, "*"))
         while True:
             traders = filter(
@@ -151,10 +246,23 @@ class BTStaker(Staker):
             traders = list(traders)
             if len(traders) == 0:
                 logger.debug("所有交易员当日交易结束，退出交易".center(100, "*"))
+                logger.debug(f"指标缓存统计: {indicator_cache.stats()}")
+                logger.debug(f"交叉索引统计: {cross_index_cache.stats()}")
+                logger.debug(f"交易调度统计: {self._dispatcher.stats()}")
+                logger.debug(f"批量条件判断统计: {self._condition_batch.stats()}")
+                logger.debug(f"价格触发点统计: {price_trigger_index.stats()}")
                 break
             self._api.wait_update()
-            for trader in traders:
-                trader.execute_trade()
+            latency_recorder.start_tick()
+            # 先处理委托单成交，交易人据此判断持仓状态
+            self._order_manager.advance()
+            woken = self._dispatcher.dispatch(traders)
+            self._prefill_conditions(woken)
+            for trader in woken:
+                with latency_recorder.dispatch(trader.symbol):
+                    trader.execute_trade()
+            status_writer.flush_if_due()
+            latency_recorder.end_tick()
 
     def start_work(self):
         """执行盯盘操作
@@ -167,6 +275,20 @@ class BTStaker(Staker):
         logger.info("天勤服务器端已连接成功")
         self._prepare_task()
         logger.info("交易准备工作完成，开始盯盘".center(100, "*"))
-        while True:
-            self._handle_trade()
-            self._init_status()
+        try:
+            while True:
+                self._handle_trade()
+                self._reset_traders()
+        finally:
+            # 回测结束时写入尚未保存的交易状态
+            status_writer.flush()
+            latency_recorder.dump()
+
+    def _reset_traders(self):
+        """交易日结束后重置交易人的当日状态，交易人及K线订阅、指标状态跨交易日复用
+
+        换月导致合约变化时，由主连策略在盘前更新对应的交易策略
+        """
+        self._kline_registry.save_to_store()
+        for trader in self.traders:
+            trader.reset_daily_status()
@@ -1,10 +1,11 @@
 from abc import abstractmethod
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from tqsdk2 import TqApi
 from dao.odm.future_config import FutureConfigInfo
 from strategies.cyclical_strategies import CyclicalStrategy
 from strategies.entity import StrategyConfig
-import strategies.tools as tools
+from strategies.kline_registry import KlineRegistry
+from strategies.order_manager import OrderManager
 from strategies.main_joint_symbol_strategies.smjs_strategies import (
     MJBottomLongStrategy,
     MJBottomShortStrategy,
@@ -24,8 +25,8 @@ class StrategyTrader:
 
     def __init__(self, s_config: StrategyConfig):
         self._config = s_config
-        self.long_mjs: Optional[MJStrategy]
-        self.short_mjs: Optional[MJStrategy]
+        self.long_mjs: Optional[MJStrategy] = None
+        self.short_mjs: Optional[MJStrategy] = None
         self._init_MJ_strategy()
         self.cycle_strategy = CyclicalStrategy(self._config)
 
@@ -83,9 +84,7 @@ class StrategyTrader:
 
     def execute_before_trade(self):
         self._switch_symbol()
-        is_in_trading = tools.is_trading_time(
-            self._config.api, self._config.f_info.symbol
-        )
+        is_in_trading = self._config.is_trading_time()
         if self.long_mjs is not None:
             self.long_mjs.execute_before_trade(is_in_trading)
         if self.short_mjs is not None:
@@ -97,6 +96,22 @@ class StrategyTrader:
         if self.short_mjs is not None:
             self.short_mjs.execute_after_trade()
 
+    def reset_daily_status(self):
+        if self.long_mjs is not None:
+            self.long_mjs.reset_daily_status()
+        if self.short_mjs is not None:
+            self.short_mjs.reset_daily_status()
+
+    def get_watched_objects(self) -> Tuple[List, List]:
+        """返回该策略交易者所有主连策略关注的行情对象和K线序列"""
+        quotes, serials = [], []
+        for mjs in (self.long_mjs, self.short_mjs):
+            if mjs is not None:
+                m_quotes, m_serials = mjs.get_watched_objects()
+                quotes.extend(m_quotes)
+                serials.extend(m_serials)
+        return quotes, serials
+
     def execute_trade(self):
         if self.long_mjs is not None:
             self.long_mjs.execute_trade()
@@ -153,15 +168,21 @@ class Trader:
         strategy_ids: List[int],
         direction: int = 2,
         is_bt: bool = False,
+        kline_registry: Optional[KlineRegistry] = None,
+        order_manager: Optional[OrderManager] = None,
     ):
         self.is_active = future_info.is_active
-        self._config = StrategyConfig(api, future_info, direction, is_bt)
+        self.symbol = future_info.symbol
+        self._config = StrategyConfig(
+            api, future_info, direction, is_bt, kline_registry, order_manager
+        )
         self.strategy_traders: List[StrategyTrader] = self._init_s_traders(
             strategy_ids
         )
         self.is_finished = False
         self._has_run_after_execute = False
-        self._mj_d_klines = api.get_kline_serial(
+        self._trading_day = self._config.get_trading_day()
+        self._mj_d_klines = self._config.get_kline_serial(
             future_info.symbol, self._config.getDailyK_Duration()
         )
 
@@ -174,21 +195,49 @@ class Trader:
             )
         return s_traders
 
+    def get_watched_objects(self) -> Tuple[List, List]:
+        """返回该交易人关注的行情对象和K线序列，盯盘人据此决定是否唤醒交易人"""
+        quotes, serials = [self._config.quote], [self._mj_d_klines]
+        for s_trader in self.strategy_traders:
+            s_quotes, s_serials = s_trader.get_watched_objects()
+            quotes.extend(s_quotes)
+            serials.extend(s_serials)
+        return quotes, serials
+
+    def on_watch_changed(self, callback: Callable[["Trader"], None]):
+        """交易策略变化时调用 callback，盯盘人据此重新登记该交易人关注的对象"""
+        self._config.on_watch_changed = lambda: callback(self)
+
+    def get_trading_mjs(self) -> List[MJStrategy]:
+        """返回本次执行交易时将要执行交易策略的主连策略，盯盘人据此批量判断开仓条件"""
+        if self._is_daily_trade_finished() and not self._has_run_after_execute:
+            return []
+        if not (self.is_active and self._is_trading_time()):
+            return []
+        return [
+            mjs
+            for s_trader in self.strategy_traders
+            for mjs in (s_trader.long_mjs, s_trader.short_mjs)
+            if mjs is not None
+        ]
+
     def _is_daily_trade_finished(self) -> bool:
-        return tools.is_after_execute_time(
-            self._config.api, self._config.f_info.symbol
-        )
+        if self._config.is_backtest:
+            # 回测中行情时间不会停留在收盘之后，进入下一交易日时当日交易结束
+            return self._config.get_trading_day() != self._trading_day
+        return self._config.is_daily_trade_finished()
 
-    def _is_trading_time(self) -> bool:
-        symbol = self._config.f_info.symbol
-        if len(self.strategy_traders):
-            s_trader = self.strategy_traders[0]
-            if self.strategy_traders[0].long_mjs is not None:
-                symbol = s_trader.long_mjs.current_trade_strategy.ts.symbol
-            else:
-                symbol = s_trader.short_mjs.current_trade_strategy.ts.symbol
+    def reset_daily_status(self):
+        """新交易日开始前重置交易人的当日状态，交易人及其策略跨交易日复用"""
+        self.is_finished = False
+        self._has_run_after_execute = False
+        self._trading_day = self._config.get_trading_day()
+        for s_trader in self.strategy_traders:
+            s_trader.reset_daily_status()
 
-        return tools.is_trading_time(self._config.api, symbol)
+    def _is_trading_time(self) -> bool:
+        """根据品种的交易日历判断是否处于交易时段内"""
+        return self._config.is_trading_time()
 
     def execute_trade(self):
         """根据该品种配置和当前交易时间，执行交易操作"""
@@ -199,6 +248,8 @@ class Trader:
             logger.info(log_str.format(quote_time, self._config.f_info.symbol))
             self.execute_after_trade()
             self._has_run_after_execute = True
+            # 回测中盘后操作完成后由盯盘人开始下一个交易日
+            self.is_finished = self._config.is_backtest
         elif self.is_active and self._is_trading_time():
             for s_trader in self.strategy_traders:
                 s_trader.execute_trade()
@@ -239,9 +290,7 @@ class TestTrader(Trader):
         elif (
             self.is_active
             and not self.is_finished
-            and tools.is_trading_time(
-                self._config.api, self._config.get_mj_symbol()
-            )
+            and self._config.is_trading_time()
         ):
             for s_trader in self.strategy_traders:
                 s_trader.execute_trade()
@@ -1,16 +1,28 @@
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from mongoengine import connect
+from pymongo import MongoClient
 from tqsdk2 import TqApi, TqAuth, TqBacktest, TqKq, TqRohon
 
 import dao.config_service as c_service
+import dao.indexes as indexes
+import dao.storage as storage
 import utils.config_utils as c_utils
 from dao.odm.trade_config import TradeConfigInfo
+from dao.trade.journal import trade_journal
 from exe_departments.stakers import BTStaker, RealStaker
-from utils.common_tools import LoggerGetter, sendSystemStartupMsg, tz_utc_8
-from utils.config_utils import SystemConfig
+from replay.api import ReplayApi
+from replay.data_source import ReplayDataSource
+from replay.kline_store import KlineStore
+from strategies.trading_calendar import calendar_registry
+from utils.common_tools import (
+    LoggerGetter,
+    close_outboxes,
+    sendSystemStartupMsg,
+)
+from utils.config_utils import FutureConfig, SystemConfig
+from utils.latency import latency_recorder
 
 # from tqsdk2 import TqApi, TqBacktest, BacktestFinished
 
@@ -24,18 +36,36 @@ class Commander:
         TradeManager：交易主管。负责利用系统提供的资源开展交易工作。
     """
 
-    def __init__(self, is_backtest: bool):
+    def __init__(
+        self,
+        is_backtest: bool,
+        configs: Optional[List[FutureConfig]] = None,
+    ):
         _config = c_utils.get_system_config(is_backtest)
         self._dba = DBA(_config)
-        self._dba.create_db()
+        self.db_name = self._dba.create_db()
         self._account_manager = AccountManager(
             c_service.get_system_config(_config)
         )
-        self.trade_manager = TradeManager(self._account_manager)
+        self.trade_manager = TradeManager(self._account_manager, configs)
 
     def start_work(self):
         """交易的开端"""
-        self.trade_manager.start_work()
+        try:
+            self.trade_manager.start_work()
+        finally:
+            self._close()
+
+    def start_backtest(self):
+        """由盯盘人运行回测，回测结束时天勤抛出 BacktestFinished"""
+        try:
+            self.trade_manager.staker.start_work()
+        finally:
+            self._close()
+
+    def _close(self):
+        self._dba.close()
+        close_outboxes()
 
 
 class DBA:
@@ -52,15 +82,43 @@ class DBA:
             self._url = f"mongodb://{user}:{password}@{host}:{port}/"
         else:
             self._url = f"mongodb://{host}:{port}/"
+        # 内存存储只用于回测
+        self._backend = "mongo"
+        if self._trade_config.is_backtest:  # type: ignore
+            self._backend = getattr(
+                self._trade_config, "storage_backend", "mongo"
+            )
+        self._db_name: Optional[str] = None
 
-    def create_db(self, db_name: Optional[str] = None):
+    def create_db(self, db_name: Optional[str] = None) -> str:
+        """连接数据库并返回数据库名称，回测时每次使用新的数据库"""
         if db_name is None:
             if self._trade_config.is_backtest:  # type: ignore
                 db_name = str(uuid.uuid4())
             else:
                 db_name = "future_trade"
-        db_url = f"{self._url}{db_name}?authSource=admin"
-        connect(host=db_url, tz_aware=True, tzinfo=tz_utc_8)
+        storage.connect_storage(self._backend, self._url, db_name)
+        indexes.ensure_indexes()
+        self._db_name = db_name
+        journal_path = getattr(self._trade_config, "journal_path", None)
+        if journal_path and not self._trade_config.is_backtest:  # type: ignore
+            # 先恢复上次中断时尚未写入数据库的交易状态
+            trade_journal.open(f"{journal_path}/{db_name}")
+            trade_journal.recover()
+        return db_name
+
+    def get_client(self) -> MongoClient:
+        """返回不绑定数据库的 pymongo 客户端，用于跨数据库操作"""
+        if self._backend == "memory":
+            raise ValueError("内存存储不支持跨数据库操作")
+        return MongoClient(f"{self._url}?authSource=admin")
+
+    def close(self):
+        """交易结束时调用，使用内存存储时导出交易数据，关闭交易事件日志"""
+        dump_path = getattr(self._trade_config, "storage_dump_path", None)
+        if self._backend == "memory" and dump_path:
+            storage.dump_database(f"{dump_path}/{self._db_name}")
+        trade_journal.close()
 
 
 class AccountManager:
@@ -97,22 +155,27 @@ class AccountManager:
 class TradeManager:
     logger = LoggerGetter()
 
-    def __init__(self, acc_manager: AccountManager):
+    def __init__(
+        self,
+        acc_manager: AccountManager,
+        configs: Optional[List[FutureConfig]] = None,
+    ):
         trade_config = acc_manager.trade_config
         is_backtest = trade_config.is_backtest
         direction = trade_config.direction
+        latency_recorder.configure(
+            trade_config.latency_dump_interval or 0,
+            trade_config.latency_dump_path,
+        )
+        calendar_registry.set_holidays(trade_config.holidays or [])
         if is_backtest:
-            self.logger.info("使用回测模式")
-            self.tqApi = TqApi(
-                account=acc_manager.trade_account,
-                auth=acc_manager.tq_auth,
-                backtest=TqBacktest(
-                    start_dt=trade_config.backtest_days.start_date,
-                    end_dt=trade_config.backtest_days.end_date,
-                ),
-            )
+            self.tqApi = self._create_backtest_api(acc_manager)
             self.staker = BTStaker(
-                self.tqApi, direction, trade_config.strategy_ids
+                self.tqApi,
+                direction,
+                trade_config.strategy_ids,
+                configs,
+                self._get_kline_store(trade_config),
             )
         else:
             self.logger.info("使用实盘模式")
@@ -122,10 +185,43 @@ class TradeManager:
                 self.logger.info("使用模拟账户进行交易")
             self.tqApi = TqApi(account=acc_manager.trade_account, auth=acc_manager.tq_auth)
             self.staker = RealStaker(
-                self.tqApi, direction, trade_config.strategy_ids
+                self.tqApi, direction, trade_config.strategy_ids, configs
             )
         sendSystemStartupMsg(datetime.now(), trade_config)
 
+    def _get_kline_store(
+        self, trade_config: TradeConfigInfo
+    ) -> Optional[KlineStore]:
+        """使用天勤回测并配置了本地数据目录时，将回测中的K线保存到本地"""
+        if (
+            trade_config.backtest_backend == "replay"
+            or not trade_config.replay_data_path
+        ):
+            return None
+        return KlineStore(trade_config.replay_data_path)
+
+    def _create_backtest_api(self, acc_manager: AccountManager):
+        """根据交易配置使用天勤回测服务或本地K线回放"""
+        trade_config = acc_manager.trade_config
+        backtest_days = trade_config.backtest_days
+        if trade_config.backtest_backend == "replay":
+            self.logger.info("使用本地K线回放模式")
+            return ReplayApi(
+                ReplayDataSource(trade_config.replay_data_path),
+                backtest_days.start_date,
+                backtest_days.end_date,
+                trade_config.account_balance,
+            )
+        self.logger.info("使用回测模式")
+        return TqApi(
+            account=acc_manager.trade_account,
+            auth=acc_manager.tq_auth,
+            backtest=TqBacktest(
+                start_dt=backtest_days.start_date,
+                end_dt=backtest_days.end_date,
+            ),
+        )
+
     def start_work(self):
         logger = self.logger
         logger.info("交易准备开始")
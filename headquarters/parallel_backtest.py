@@ -0,0 +1,128 @@
+"""并行分片回测
+
+将回测品种配置分成若干分片，每个分片在独立的进程中使用独立的天勤回测和数据库运行，
+所有分片结束后将各分片数据库中的开仓/平仓记录合并到一个结果数据库中。
+"""
+import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+from pymongo import MongoClient
+from tqsdk2 import BacktestFinished
+
+import utils.config_utils as c_utils
+from dao.odm.future_trade import (
+    BottomCloseVolume,
+    BottomOpenVolume,
+    MainCloseVolume,
+    MainOpenVolume,
+)
+from headquarters.headquarters import DBA, Commander
+from utils import common
+from utils import global_var as gvar
+from utils.common import LoggerGetter
+from utils.config_utils import FutureConfig
+
+# 需要合并到结果数据库中的回测记录
+RESULT_DOCUMENTS = (
+    MainOpenVolume,
+    MainCloseVolume,
+    BottomOpenVolume,
+    BottomCloseVolume,
+)
+
+
+def split_configs(
+    configs: List[FutureConfig], shards: int
+) -> List[List[FutureConfig]]:
+    """将品种配置分为最多 shards 个分片
+
+    参与交易的品种计算量远大于只观察的品种，故先将参与交易的品种轮流分配到各分片，
+    再分配其他品种，使各分片的计算量接近。
+    """
+    result: List[List[FutureConfig]] = [[] for _ in range(shards)]
+    active = [c for c in configs if c.is_active]  # type: ignore
+    inactive = [c for c in configs if not c.is_active]  # type: ignore
+    for i, config in enumerate(active + inactive):
+        result[i % shards].append(config)
+    return [shard for shard in result if shard]
+
+
+def run_shard(index: int, shards: int, log_level: str) -> str:
+    """在子进程中运行第 index 个分片的回测，返回该分片使用的数据库名称"""
+    common.setup_log_config(log_level, f"log_config_{gvar.ENV_NAME}")
+    logger = logging.getLogger(__name__)
+    configs = split_configs(
+        c_utils.get_future_configs(is_backtest=True), shards
+    )[index]
+    symbols = [c.symbol for c in configs]  # type: ignore
+    commander = Commander(True, configs)
+    logger.info(f"分片{index} 数据库:{commander.db_name} 品种:{symbols}")
+    try:
+        commander.start_backtest()
+    except BacktestFinished:
+        logger.info(f"分片{index} 回测结束")
+    finally:
+        commander.trade_manager.tqApi.close()
+    return commander.db_name
+
+
+def merge_results(
+    client: MongoClient, shard_dbs: List[str], result_db: str
+) -> Dict[str, int]:
+    """将各分片数据库中的回测记录合并到结果数据库，返回各集合的记录数量"""
+    counts = {}
+    for document in RESULT_DOCUMENTS:
+        name = document._get_collection_name()
+        target = client[result_db][name]
+        for db_name in shard_dbs:
+            records = list(client[db_name][name].find())
+            if records:
+                target.insert_many(records)
+        counts[name] = target.count_documents({})
+    return counts
+
+
+class ParallelBacktest:
+    """并行回测指挥，负责分配分片、启动子进程并合并回测结果
+
+    Args:
+        workers: 最大并行进程数量，即分片数量
+        log_level: 子进程的日志等级
+        result_db: 结果数据库名称，为空时使用新的 uuid 名称
+    """
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self, workers: int, log_level: str, result_db: Optional[str] = None
+    ):
+        self._log_level = log_level
+        self._result_db = result_db or str(uuid.uuid4())
+        configs = c_utils.get_future_configs(is_backtest=True)
+        self._shards = len(split_configs(configs, max(workers, 1)))
+
+    def start_work(self) -> str:
+        """运行全部分片并返回结果数据库名称"""
+        logger = self.logger
+        logger.info(f"开始并行回测，分片数量:{self._shards}")
+        # 合并结果需要跨数据库访问，在回测开始前确认存储后端支持
+        client = DBA(c_utils.get_system_config(True)).get_client()
+        # 天勤 api 内部使用线程，子进程使用 spawn 方式启动
+        with ProcessPoolExecutor(
+            max_workers=self._shards, mp_context=get_context("spawn")
+        ) as pool:
+            shard_dbs = list(
+                pool.map(
+                    run_shard,
+                    range(self._shards),
+                    [self._shards] * self._shards,
+                    [self._log_level] * self._shards,
+                )
+            )
+        with client:
+            counts = merge_results(client, shard_dbs, self._result_db)
+        logger.info(f"回测结果已合并到数据库{self._result_db}: {counts}")
+        return self._result_db
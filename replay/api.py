@@ -0,0 +1,413 @@
+"""本地K线回放接口
+
+ReplayApi 实现了交易系统使用的天勤接口(get_quote, get_kline_serial, wait_update,
+is_changing, insert_order, cancel_order, get_account, get_trading_status)，
+数据来自本地K线文件，不需要网络连接和天勤账户。
+
+回放规则与天勤回测相同：每根K线产生开始和结束两个事件，K线开始时以开盘价生成一根
+正在形成的K线，结束时更新为完整的K线。每次 wait_update 推进到下一个事件时间。
+行情报价使用该合约已订阅的最小周期K线生成，主连合约的报价跟随其主力合约，
+获取主连报价或主力合约变化时自动订阅主力合约的报价和本地最小周期K线。
+委托单在下一次 wait_update 时以当时的最新价成交(限价单价格满足时才成交)。
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from pandas import DataFrame, Series
+from tqsdk2 import BacktestFinished
+
+from replay.data_source import ReplayDataSource
+from replay.kline_store import KLINE_COLUMNS
+from replay.objects import (
+    ReplayAccount,
+    ReplayOrder,
+    ReplayQuote,
+    ReplayTrade,
+    ReplayTradingStatus,
+)
+from strategies.trading_calendar import calendar_registry
+from utils.common_tools import LoggerGetter, tz_utc_8
+
+_NS = 1_000_000_000
+_CHINA_OFFSET_NS = 8 * 60 * 60 * _NS
+_EPOCH = datetime(1970, 1, 1)
+_FRAME_COLUMNS = ["id"] + KLINE_COLUMNS
+_CLOSE_FIELDS = {"high", "low", "close", "volume", "close_oi"}
+_OPEN_FIELDS = set(_FRAME_COLUMNS)
+
+
+def to_ns(value: datetime) -> int:
+    """将 datetime 转换为纳秒时间戳，不带时区时视为东八区时间"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz_utc_8)
+    return int(value.timestamp()) * _NS + value.microsecond * 1000
+
+
+def _ns_to_local(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=(ns + _CHINA_OFFSET_NS) // 1000)
+
+
+class _Serial:
+    """回放中的一个K线序列，frame 为提供给策略的固定长度K线窗口"""
+
+    def __init__(self, symbol: str, duration: int,
+                 bars: Dict[str, np.ndarray], length: int):
+        self.symbol = symbol
+        self.duration = duration
+        self.length = length
+        self._dt = np.asarray(bars["datetime"], dtype=np.int64)
+        self._bars = {c: np.asarray(bars[c], dtype=float)
+                      for c in KLINE_COLUMNS[1:]}
+        # 最后一根已经开始的K线的位置，以及该K线是否已经结束
+        self.pos = -1
+        self.closed = True
+        self._window = {c: np.full(length, np.nan) for c in _FRAME_COLUMNS}
+        self.frame = DataFrame(self._window)
+        self.frame["symbol"] = symbol
+        self.frame["duration"] = duration
+
+    def next_event(self) -> Optional[int]:
+        if not self.closed:
+            return self._close_time(self.pos)
+        if self.pos + 1 < len(self._dt):
+            return int(self._dt[self.pos + 1])
+        return None
+
+    def _close_time(self, i: int) -> int:
+        end = int(self._dt[i]) + self.duration * _NS
+        if i + 1 < len(self._dt):
+            end = min(end, int(self._dt[i + 1]))
+        return end
+
+    def seek(self, now: int):
+        """将K线窗口定位到 now 时刻"""
+        self.pos = int(np.searchsorted(self._dt, now, side="right")) - 1
+        self.closed = self.pos < 0 or self._close_time(self.pos) <= now
+        start = max(self.pos - self.length + 1, 0)
+        count = self.pos + 1 - start
+        for column, values in self._window.items():
+            values[:] = np.nan
+            if count > 0:
+                values[-count:] = self._get_values(column, start,
+                                                   self.pos + 1)
+        if not self.closed:
+            self._write_forming()
+        self._flush(_FRAME_COLUMNS)
+
+    def step(self) -> Set[str]:
+        """处理下一个事件，返回发生变化的字段"""
+        if not self.closed:
+            self.closed = True
+            for column in _CLOSE_FIELDS:
+                self._window[column][-1] = self._bars[column][self.pos]
+            self._flush(_CLOSE_FIELDS)
+            return _CLOSE_FIELDS
+        self.pos += 1
+        self.closed = False
+        for column, values in self._window.items():
+            values[:-1] = values[1:]
+            values[-1] = self._get_values(column, self.pos,
+                                          self.pos + 1)[0]
+        self._write_forming()
+        self._flush(_FRAME_COLUMNS)
+        return _OPEN_FIELDS
+
+    def _get_values(self, column: str, start: int, end: int) -> np.ndarray:
+        if column == "id":
+            return np.arange(start, end, dtype=float)
+        if column == "datetime":
+            return self._dt[start:end].astype(float)
+        return self._bars[column][start:end]
+
+    def _write_forming(self):
+        """正在形成的K线只包含开盘价"""
+        open_price = self._bars["open"][self.pos]
+        for column in ("high", "low", "close"):
+            self._window[column][-1] = open_price
+        self._window["volume"][-1] = 0
+        self._window["close_oi"][-1] = self._bars["open_oi"][self.pos]
+
+    def _flush(self, columns):
+        for column in columns:
+            self.frame[column] = self._window[column].copy()
+
+    def last_row_key(self) -> Tuple[float, float]:
+        return (self._window["id"][-1], self._window["datetime"][-1])
+
+    def last_price(self) -> float:
+        return self._window["close"][-1]
+
+    def last_time(self) -> Optional[int]:
+        """最新行情时间，K线结束时为结束前 1 微秒"""
+        if self.pos < 0:
+            return None
+        if self.closed:
+            return self._close_time(self.pos) - 1000
+        return int(self._dt[self.pos])
+
+
+class ReplayApi:
+    """使用本地K线数据回放的交易接口
+
+    Args:
+        source: 本地回放数据
+        start_dt: 回放开始时间
+        end_dt: 回放结束时间
+        init_balance: 初始资金
+        commission: 每手手续费
+        slippage: 成交滑点，单位为最小变动价位
+    """
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self,
+        source: ReplayDataSource,
+        start_dt: datetime,
+        end_dt: datetime,
+        init_balance: float = 1000000.0,
+        commission: float = 0.0,
+        slippage: int = 0,
+    ):
+        self._source = source
+        self._now = to_ns(start_dt)
+        self._end = to_ns(end_dt)
+        self._commission = commission
+        self._slippage = slippage
+        self._serials: Dict[Tuple[str, int], _Serial] = {}
+        self._quotes: Dict[str, ReplayQuote] = {}
+        self._underlyings: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+        self._statuses: Dict[str, ReplayTradingStatus] = {}
+        self._orders: Dict[str, ReplayOrder] = {}
+        self._pending: List[ReplayOrder] = []
+        # 合约 -> 多空方向 -> [持仓手数, 持仓均价]
+        self._positions: Dict[str, Dict[str, List[float]]] = {}
+        self._account = ReplayAccount(init_balance)
+        self._changed: Dict[int, Set[str]] = {}
+        self._changed_rows: Dict[Tuple[float, float], Set[str]] = {}
+        self._finished = False
+
+    def get_quote(self, symbol: str) -> ReplayQuote:
+        if symbol not in self._quotes:
+            quote = ReplayQuote(symbol, self._source.get_instrument(symbol))
+            self._quotes[symbol] = quote
+            underlying = self._source.get_underlying(symbol)
+            if underlying is not None:
+                self._underlyings[symbol] = underlying
+            self._update_quote(quote, force=True)
+        return self._quotes[symbol]
+
+    def get_kline_serial(self, symbol: str, duration_seconds: int,
+                         data_length: int = 200) -> DataFrame:
+        key = (symbol, duration_seconds)
+        serial = self._serials.get(key)
+        if serial is None or serial.length < data_length:
+            bars = self._source.get_columns(symbol, duration_seconds)
+            serial = _Serial(symbol, duration_seconds, bars, data_length)
+            serial.seek(self._now)
+            self._serials[key] = serial
+            if symbol in self._quotes:
+                self._update_quote(self._quotes[symbol], force=True)
+        return serial.frame
+
+    def get_account(self) -> ReplayAccount:
+        return self._account
+
+    def get_trading_status(self, symbol: str) -> ReplayTradingStatus:
+        status = self._statuses.setdefault(symbol,
+                                           ReplayTradingStatus(symbol))
+        calendar = calendar_registry.get_calendar(
+            self.get_quote(symbol).trading_time)
+        in_session = calendar.is_in_session(_ns_to_local(self._now))
+        status.trade_status = "CONTINOUS" if in_session else "NOTRADING"
+        return status
+
+    def insert_order(self, symbol: str, direction: str, offset: str,
+                     volume: int, limit_price: Optional[float] = None,
+                     order_id: Optional[str] = None, **kwargs) -> ReplayOrder:
+        """提交委托单，委托单在下一次 wait_update 时撮合"""
+        order_id = order_id or f"replay-{len(self._orders) + 1}"
+        order = ReplayOrder(order_id, symbol, direction, offset, volume,
+                            limit_price, self._now)
+        self._orders[order_id] = order
+        self._pending.append(order)
+        self._mark(order, {"status"})
+        return order
+
+    def cancel_order(self, order_or_order_id):
+        """撤销未成交的委托单"""
+        order = order_or_order_id
+        if isinstance(order, str):
+            order = self._orders[order]
+        if order in self._pending:
+            self._pending.remove(order)
+            order.status = "FINISHED"
+            order.last_msg = "已撤单"
+            self._mark(order, {"status", "last_msg"})
+
+    def is_changing(self, obj, key=None) -> bool:
+        """判断对象在最近一次 wait_update 中是否发生变化
+
+        obj 可以是报价、委托单、K线序列或K线序列中的一行
+        """
+        if isinstance(obj, Series):
+            fields = self._changed_rows.get((obj.get("id"),
+                                             obj.get("datetime")))
+        else:
+            fields = self._changed.get(id(obj))
+        if not fields:
+            return False
+        if key is None:
+            return True
+        keys = [key] if isinstance(key, str) else key
+        return any(k in fields for k in keys)
+
+    def wait_update(self, deadline=None) -> bool:
+        """推进到下一个事件时间，回放结束时抛出 BacktestFinished"""
+        if self._finished:
+            raise BacktestFinished()
+        self._changed.clear()
+        self._changed_rows.clear()
+        self._match_orders()
+        events = [s.next_event() for s in self._serials.values()]
+        events = [e for e in events if e is not None]
+        if not events or min(events) > self._end:
+            self._finished = True
+            self.logger.info("本地回放结束")
+            raise BacktestFinished()
+        self._now = min(events)
+        for serial in self._serials.values():
+            while serial.next_event() == self._now:
+                fields = serial.step()
+                self._mark(serial.frame, fields)
+                self._changed_rows[serial.last_row_key()] = fields
+        # 主连合约报价跟随主力合约，在其他合约之后更新
+        for quote in sorted(self._quotes.values(),
+                            key=lambda q: q.instrument_id in self._underlyings):
+            self._update_quote(quote)
+        return True
+
+    def close(self):
+        pass
+
+    def _mark(self, obj, fields):
+        self._changed.setdefault(id(obj), set()).update(fields)
+
+    def _get_quote_serial(self, symbol: str) -> Optional[_Serial]:
+        """报价使用该合约已订阅的最小周期K线"""
+        serials = [s for (s_symbol, _), s in self._serials.items()
+                   if s_symbol == symbol]
+        return min(serials, key=lambda s: s.duration) if serials else None
+
+    def _update_quote(self, quote: ReplayQuote, force: bool = False):
+        symbol = quote.instrument_id
+        fields = set()
+        subscribed = False
+        if symbol in self._underlyings:
+            times, symbols = self._underlyings[symbol]
+            idx = int(np.searchsorted(times, self._now, side="right")) - 1
+            underlying = symbols[idx] if idx >= 0 else ""
+            if underlying != quote.underlying_symbol:
+                quote.underlying_symbol = underlying
+                fields.add("underlying_symbol")
+                # 新的主力合约尚未订阅时立即订阅，主连报价随即有行情
+                subscribed = self._subscribe_underlying(underlying)
+        source = self._quotes.get(quote.underlying_symbol)
+        if source is not None and source is not quote:
+            # 主连合约报价跟随主力合约
+            if force or subscribed or self._changed.get(id(source)):
+                fields |= self._set_price(quote, source.last_price,
+                                          source.datetime)
+        else:
+            serial = self._get_quote_serial(symbol)
+            if serial is not None and (force or self._changed.get(
+                    id(serial.frame))):
+                last_time = serial.last_time()
+                if last_time is not None:
+                    fields |= self._set_price(
+                        quote, serial.last_price(),
+                        _ns_to_local(last_time).strftime(
+                            "%Y-%m-%d %H:%M:%S.%f"))
+        expire = self._source.get_instrument(symbol).get("expire_datetime")
+        if expire and "datetime" in fields:
+            quote.expire_rest_days = (
+                date.fromisoformat(expire[:10])
+                - _ns_to_local(self._now).date()).days
+        if fields and not force:
+            self._mark(quote, fields)
+
+    def _subscribe_underlying(self, symbol: str) -> bool:
+        """订阅主力合约的报价及其最小周期K线，返回是否新订阅"""
+        if not symbol or symbol in self._quotes:
+            return False
+        if self._get_quote_serial(symbol) is None:
+            durations = self._source.get_durations(symbol)
+            if durations:
+                self.get_kline_serial(symbol, durations[0])
+        self.get_quote(symbol)
+        return True
+
+    @staticmethod
+    def _set_price(quote: ReplayQuote, price: float, dt: str) -> Set[str]:
+        quote.last_price = quote.ask_price1 = quote.bid_price1 = price
+        quote.datetime = dt
+        return {"last_price", "ask_price1", "bid_price1", "datetime"}
+
+    def _match_orders(self):
+        """以当前最新价撮合未成交的委托单"""
+        pending, self._pending = self._pending, []
+        for order in pending:
+            quote = self.get_quote(order.symbol)
+            price = quote.last_price
+            if np.isnan(price) or not self._can_fill(order, price):
+                self._pending.append(order)
+                continue
+            tick = quote.price_tick * self._slippage
+            price = price + tick if order.direction == "BUY" else price - tick
+            self._fill(order, price, quote.volume_multiple)
+
+    @staticmethod
+    def _can_fill(order: ReplayOrder, price: float) -> bool:
+        if order.price_type != "LIMIT":
+            return True
+        if order.direction == "BUY":
+            return order.limit_price >= price
+        return order.limit_price <= price
+
+    def _fill(self, order: ReplayOrder, price: float, multiple: float):
+        positions = self._positions.setdefault(
+            order.symbol, {"long": [0, 0.0], "short": [0, 0.0]})
+        volume = order.volume_orign
+        if order.offset == "OPEN":
+            side = "long" if order.direction == "BUY" else "short"
+            held, avg = positions[side]
+            positions[side] = [held + volume,
+                               (held * avg + volume * price) / (held + volume)]
+        else:
+            side = "long" if order.direction == "SELL" else "short"
+            held, avg = positions[side]
+            if held < volume:
+                order.status = "FINISHED"
+                order.is_error = True
+                order.last_msg = "平仓手数不足"
+                self._mark(order, {"status", "last_msg"})
+                return
+            positions[side][0] = held - volume
+            sign = 1 if side == "long" else -1
+            profit = sign * (price - avg) * volume * multiple
+            self._account.close_profit += profit
+        self._account.commission += self._commission * volume
+        self._account.balance = (self._account.static_balance
+                                 + self._account.close_profit
+                                 - self._account.commission)
+        self._account.available = self._account.balance
+        trade_id = f"{order.order_id}-1"
+        order.trade_records[trade_id] = ReplayTrade(order, trade_id, price,
+                                                    self._now)
+        order.trade_price = price
+        order.volume_left = 0
+        order.status = "FINISHED"
+        order.last_msg = "全部成交"
+        self._mark(order, {"status", "volume_left", "trade_price"})
+        self._mark(self._account, {"balance"})
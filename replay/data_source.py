@@ -0,0 +1,89 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from replay.kline_store import KLINE_COLUMNS, KlineStore
+
+_PRODUCT_PATTERN = re.compile(r"^(?:KQ\.m@)?([A-Z]+\.[A-Za-z]+)")
+
+
+def get_product(symbol: str) -> str:
+    """返回合约或主连合约对应的品种，如 SHFE.rb2401 和 KQ.m@SHFE.rb 均返回 SHFE.rb"""
+    match = _PRODUCT_PATTERN.match(symbol)
+    return match.group(1) if match else symbol
+
+
+class ReplayDataSource:
+    """本地回放数据
+
+    数据目录结构:
+        instruments.json: 合约信息，键为品种(如 SHFE.rb)或合约代码，值包括 trading_time、
+            volume_multiple、price_tick、expire_datetime 等，合约信息覆盖品种信息
+        {合约代码}/{K线周期}/: 本地列式K线存储(见 KlineStore)，优先使用
+        {合约代码}/{K线周期}.npy|.parquet|.csv: K线数据，字段见 KLINE_COLUMNS
+        {主连代码}/underlying.csv: 主连对应的主力合约，字段为 datetime, underlying_symbol
+    """
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+        self.store = KlineStore(path)
+        instruments = self._path / "instruments.json"
+        self._instruments: Dict[str, dict] = {}
+        if instruments.exists():
+            self._instruments = json.loads(instruments.read_text("utf-8"))
+
+    def get_instrument(self, symbol: str) -> dict:
+        info = dict(self._instruments.get(get_product(symbol), {}))
+        info.update(self._instruments.get(symbol, {}))
+        return info
+
+    def get_columns(self, symbol: str,
+                    duration: int) -> Dict[str, np.ndarray]:
+        """读取某合约某周期的全部K线的各字段，列式存储中的数据不会被复制"""
+        if self.store.has(symbol, duration):
+            return self.store.read(symbol, duration)
+        klines = self.get_klines(symbol, duration)
+        return {c: klines[c].to_numpy() for c in KLINE_COLUMNS}
+
+    def get_klines(self, symbol: str, duration: int) -> DataFrame:
+        """读取某合约某周期的全部K线，按时间排序"""
+        base = self._path / symbol / str(duration)
+        if self.store.has(symbol, duration):
+            return self.store.get_klines(symbol, duration)
+        if base.with_suffix(".npy").exists():
+            data = np.load(base.with_suffix(".npy"), allow_pickle=False)
+            klines = DataFrame({c: data[c] for c in KLINE_COLUMNS})
+        elif base.with_suffix(".parquet").exists():
+            klines = pd.read_parquet(base.with_suffix(".parquet"))
+        elif base.with_suffix(".csv").exists():
+            klines = pd.read_csv(base.with_suffix(".csv"))
+        else:
+            raise FileNotFoundError(f"没有{symbol}周期为{duration}的K线数据")
+        klines = klines[KLINE_COLUMNS].sort_values("datetime")
+        return klines.reset_index(drop=True)
+
+    def get_durations(self, symbol: str) -> List[int]:
+        """本地已有的该合约K线周期，从小到大排序"""
+        base = self._path / symbol
+        if not base.is_dir():
+            return []
+        return sorted({int(p.stem) for p in base.iterdir()
+                       if p.stem.isdigit()})
+
+    def get_underlying(
+        self, symbol: str
+    ) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """读取主连合约的主力合约变化记录，返回 (时间, 主力合约) 序列"""
+        path = self._path / symbol / "underlying.csv"
+        if not path.exists():
+            return None
+        records = pd.read_csv(path).sort_values("datetime")
+        return (
+            records["datetime"].to_numpy(dtype=np.int64),
+            records["underlying_symbol"].tolist(),
+        )
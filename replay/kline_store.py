@@ -0,0 +1,134 @@
+"""本地列式K线存储
+
+每个 (合约代码, K线周期) 对应一个目录，目录中每个字段保存为一个定长二进制文件
+({字段}.bin，datetime 为 int64 纳秒时间戳，其余字段为 float64)。读取时使用内存映射，
+按时间范围切片得到的是映射文件的视图，不会复制数据。写入只允许在末尾追加新的K线。
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+from pandas import DataFrame
+
+from utils.common_tools import tz_utc_8
+
+# K线字段，datetime 为K线起始时间的纳秒时间戳
+KLINE_COLUMNS = [
+    "datetime",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "open_oi",
+    "close_oi",
+]
+
+_DTYPES = {c: np.float64 for c in KLINE_COLUMNS}
+_DTYPES["datetime"] = np.int64
+
+TimeLike = Union[int, datetime, None]
+
+
+def _to_ns(value: TimeLike) -> Optional[int]:
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz_utc_8)
+    return int(value.timestamp()) * 1_000_000_000 + value.microsecond * 1000
+
+
+class KlineStore:
+    """按 (合约代码, K线周期) 保存历史K线的本地列式存储
+
+    Args:
+        path: 存储根目录，与本地回放数据目录相同
+    """
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+
+    def _dir(self, symbol: str, duration: int) -> Path:
+        return self._path / symbol / str(duration)
+
+    def has(self, symbol: str, duration: int) -> bool:
+        return (self._dir(symbol, duration) / "datetime.bin").exists()
+
+    def count(self, symbol: str, duration: int) -> int:
+        """返回已保存的K线数量"""
+        path = self._dir(symbol, duration) / "datetime.bin"
+        if not path.exists():
+            return 0
+        return os.path.getsize(path) // np.dtype(np.int64).itemsize
+
+    def last_datetime(self, symbol: str, duration: int) -> Optional[int]:
+        """返回最后一根K线的时间，没有数据时返回 None"""
+        count = self.count(symbol, duration)
+        if count == 0:
+            return None
+        return int(self._map(symbol, duration, "datetime", count)[-1])
+
+    def append(self, symbol: str, duration: int, klines: DataFrame) -> int:
+        """追加K线，只保存晚于已有数据的K线，返回追加的数量
+
+        datetime 最后写入，读取时以 datetime 的长度为准，写入中断不会读到不完整的K线
+        """
+        klines = klines.dropna(subset=["datetime", "close"])
+        klines = klines.sort_values("datetime")
+        last = self.last_datetime(symbol, duration)
+        if last is not None:
+            klines = klines[klines["datetime"].astype(np.int64) > last]
+        if klines.empty:
+            return 0
+        directory = self._dir(symbol, duration)
+        directory.mkdir(parents=True, exist_ok=True)
+        count = self.count(symbol, duration)
+        for column in KLINE_COLUMNS[1:] + ["datetime"]:
+            path = directory / f"{column}.bin"
+            with open(path, "r+b" if path.exists() else "wb") as f:
+                # 截断上次中断写入时多出的数据
+                f.truncate(count * np.dtype(_DTYPES[column]).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(klines[column].to_numpy(dtype=_DTYPES[column])
+                        .tobytes())
+        return len(klines)
+
+    def read(
+        self,
+        symbol: str,
+        duration: int,
+        start: TimeLike = None,
+        end: TimeLike = None,
+    ) -> Dict[str, np.ndarray]:
+        """读取 [start, end) 时间范围内的K线，返回各字段的内存映射视图"""
+        count = self.count(symbol, duration)
+        if count == 0:
+            return {c: np.empty(0, dtype=_DTYPES[c]) for c in KLINE_COLUMNS}
+        dt = self._map(symbol, duration, "datetime", count)
+        lo, hi = 0, count
+        if start is not None:
+            lo = int(np.searchsorted(dt, _to_ns(start), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(dt, _to_ns(end), side="left"))
+        return {
+            c: self._map(symbol, duration, c, count)[lo:hi]
+            for c in KLINE_COLUMNS
+        }
+
+    def get_klines(
+        self,
+        symbol: str,
+        duration: int,
+        start: TimeLike = None,
+        end: TimeLike = None,
+    ) -> DataFrame:
+        """以 DataFrame 形式读取K线"""
+        return DataFrame(self.read(symbol, duration, start, end))
+
+    def _map(self, symbol: str, duration: int, column: str,
+             count: int) -> np.ndarray:
+        path = self._dir(symbol, duration) / f"{column}.bin"
+        return np.memmap(path, dtype=_DTYPES[column], mode="r",
+                         shape=(count,))
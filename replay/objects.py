@@ -0,0 +1,88 @@
+"""回放接口返回的行情、委托单、成交和账户对象，字段名称与天勤相同"""
+from typing import Dict, Optional
+
+
+class ReplayQuote:
+    """行情报价"""
+
+    def __init__(self, symbol: str, info: dict):
+        self.instrument_id = symbol
+        self.datetime = ""
+        self.last_price = float("nan")
+        self.ask_price1 = float("nan")
+        self.bid_price1 = float("nan")
+        self.underlying_symbol = info.get("underlying_symbol", "")
+        self.expire_rest_days = float("nan")
+        self.volume_multiple = info.get("volume_multiple", 1)
+        self.price_tick = info.get("price_tick", 1)
+        self.trading_time = info.get("trading_time", {"day": [], "night": []})
+
+    def __str__(self):
+        return (f"ReplayQuote({self.instrument_id} {self.datetime} "
+                f"{self.last_price})")
+
+
+class ReplayTrade:
+    """成交记录"""
+
+    def __init__(self, order: "ReplayOrder", trade_id: str, price: float,
+                 trade_date_time: int):
+        self.order_id = order.order_id
+        self.trade_id = trade_id
+        self.exchange_trade_id = trade_id
+        self.exchange_id = order.exchange_id
+        self.instrument_id = order.instrument_id
+        self.direction = order.direction
+        self.offset = order.offset
+        self.price = price
+        self.volume = order.volume_orign
+        self.trade_date_time = trade_date_time
+
+
+class ReplayOrder:
+    """委托单"""
+
+    def __init__(self, order_id: str, symbol: str, direction: str,
+                 offset: str, volume: int, limit_price: Optional[float],
+                 insert_date_time: int):
+        self.order_id = order_id
+        self.exchange_order_id = order_id
+        self.exchange_id, self.instrument_id = symbol.split(".", 1)
+        self.direction = direction
+        self.offset = offset
+        self.volume_orign = volume
+        self.volume_left = volume
+        self.limit_price = limit_price if limit_price is not None else \
+            float("nan")
+        self.price_type = "ANY" if limit_price is None else "LIMIT"
+        self.volume_condition = "ANY"
+        self.time_condition = "IOC" if limit_price is None else "GFD"
+        self.insert_date_time = insert_date_time
+        self.last_msg = "报单成功"
+        self.status = "ALIVE"
+        self.is_error = False
+        self.trade_price = float("nan")
+        self.trade_records: Dict[str, ReplayTrade] = {}
+
+    @property
+    def symbol(self) -> str:
+        return f"{self.exchange_id}.{self.instrument_id}"
+
+
+class ReplayAccount:
+    """账户资金，只计算已实现盈亏和手续费"""
+
+    def __init__(self, balance: float):
+        self.static_balance = balance
+        self.balance = balance
+        self.available = balance
+        self.close_profit = 0.0
+        self.commission = 0.0
+
+
+class ReplayTradingStatus:
+    """合约交易状态"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.trade_status = ""
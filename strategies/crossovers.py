@@ -0,0 +1,86 @@
+"""均线交叉位置索引
+
+判断开仓条件时需要找到最近一次均线(或收盘价与均线)交叉的位置，原来每次都倒序
+iterrows 整个K线窗口。交叉索引把已完成K线上的布尔状态(如 ema9 <= ema60)压缩为
+状态变化的位置和变化后的状态，"某根K线及之前最后一次状态为真的位置"只需一次二分查找。
+
+天勤的指标以窗口第一根K线为初始值计算，窗口滑动时已完成K线的指标值也会变化，
+所以索引按 (合约, K线周期, 状态名称) 缓存，在新K线生成(窗口滑动)时重新建立一次，
+同一根K线期间的每次判断都直接查询。正在生成的最后一根K线不进入索引，每次直接计算。
+"""
+from typing import Callable, Dict, Hashable, Tuple
+
+import numpy as np
+
+# 计算 [lo, hi) 位置上的布尔状态
+StateFunc = Callable[[int, int], np.ndarray]
+
+
+class CrossIndex:
+    """已完成K线上布尔状态的变化位置，第一个位置为 0"""
+
+    __slots__ = ("version", "_positions", "_states")
+
+    def __init__(self, version: Tuple, states: np.ndarray):
+        self.version = version
+        changes = np.flatnonzero(states[1:] != states[:-1]) + 1
+        self._positions = np.concatenate(([0], changes))
+        self._states = states[self._positions]
+
+    def last_true(self, upto: int) -> int:
+        """位置 upto 及之前最后一个状态为真的位置，不存在时返回 -1"""
+        k = int(np.searchsorted(self._positions, upto, "right")) - 1
+        if self._states[k]:
+            return upto
+        # 状态交替变化，上一段为真的最后一个位置紧挨着本段开始位置
+        return int(self._positions[k]) - 1
+
+    def crosses(self) -> int:
+        return len(self._positions) - 1
+
+
+class CrossIndexCache:
+    """进程内共享的交叉索引，同一合约同一周期的K线被多个交易策略共用"""
+
+    def __init__(self):
+        self._entries: Dict[Hashable, CrossIndex] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def last_true(self, key: Hashable, ids: np.ndarray, state: StateFunc,
+                  upto: int) -> int:
+        """返回位置 upto 及之前最后一个状态为真的位置，不存在时返回 -1
+
+        Args:
+            key: (合约代码, K线周期, 状态名称)
+            ids: K线序列的 id 列，用于判断窗口是否滑动
+            state: 状态计算函数
+            upto: 查询的最后位置，可以是正在生成的最后一根K线
+        """
+        n = len(ids)
+        if upto >= n - 1:
+            if n and state(n - 1, n)[0]:
+                return n - 1
+            upto = n - 2
+        if upto < 0:
+            return -1
+        version = (n, ids[0], ids[-2])
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            self.misses += 1
+            entry = self._entries[key] = CrossIndex(version, state(0, n - 1))
+        else:
+            self.hits += 1
+        return entry.last_true(upto)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._entries)}
+
+    def reset(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+cross_index_cache = CrossIndexCache()
@@ -7,12 +7,15 @@ class CyclicalStrategy:
 
     策略交易者所提供的主连合约策略是根据合约配置生成的，可以包括多空任一方向，也可以包括多空双方向。
     当某个方向的主连合约策略到了换月时间时，会调用该主连合约策略的换月方法，进行换月操作。
+    换月临近(当前合约剩余天数小于最大换月天数加上品种配置的 roll_horizon)、主力合约已经切换
+    或下一合约已有持仓时，提前创建下一合约的交易策略。
     '''
 
     def __init__(self, s_config: StrategyConfig):
         self.switch_days = s_config.f_info.switch_days
         self.trade_switch_day = s_config.f_info.switch_days[0]
         self.no_trade_switch_day = s_config.f_info.switch_days[1]
+        self.roll_horizon = s_config.f_info.roll_horizon
 
     def _is_time_to_switch(self, mjstrategy: MJStrategy) -> bool:
         '''判断是否到了切换时间'''
@@ -29,8 +32,25 @@ class CyclicalStrategy:
             result = True
         return result
 
+    def _is_roll_near(self, mjstrategy: MJStrategy) -> bool:
+        '''判断是否临近换月'''
+        c_ts = mjstrategy.current_trade_strategy.ts
+        erd = mjstrategy.current_trade_strategy.quote.expire_rest_days
+        if mjstrategy.config.quote.underlying_symbol != c_ts.symbol:
+            return True
+        return erd < max(self.switch_days) + self.roll_horizon
+
+    def prepare_next_strategy(self, mjs: MJStrategy):
+        '''临近换月或下一合约已有持仓时创建下一合约的交易策略'''
+        if mjs.next_trade_strategy is not None:
+            return
+        if self._is_roll_near(mjs) or mjs.has_next_symbol_position():
+            mjs.ensure_next_trade_strategy()
+
     def switch_symbol(self, mjs: MJStrategy):
         '''切换合约'''
         if mjs is not None:
             if self._is_time_to_switch(mjs):
                 mjs.swith_symbol()
+            else:
+                self.prepare_next_strategy(mjs)
@@ -1,5 +1,18 @@
+from datetime import date, datetime
+from typing import Callable, Optional
 from tqsdk2 import TqApi
 from dao.odm.future_config import FutureConfigInfo
+from strategies.kline_registry import KlineRegistry
+from strategies.order_manager import OrderManager
+from strategies.trading_calendar import (
+    TradingCalendar,
+    calendar_registry,
+    to_local_seconds,
+)
+from utils.common_tools import tz_utc_8
+
+# 实盘中收盘一小时后(16:00)开始执行盘后操作
+AFTER_CLOSE_DELAY = 60 * 60
 
 
 class StrategyConfig:
@@ -11,12 +24,62 @@ class StrategyConfig:
         f_info: FutureConfigInfo,
         direction: int,
         is_backtest: bool = False,
+        kline_registry: Optional[KlineRegistry] = None,
+        order_manager: Optional[OrderManager] = None,
     ):
         self.api: TqApi = api
+        # 所有策略共享的K线订阅登记处
+        self.kline_registry = kline_registry or KlineRegistry(api)
+        # 所有策略共享的委托单管理员，由盯盘人在每次行情更新后推进
+        self.order_manager = order_manager or OrderManager(api)
         self.quote = api.get_quote(f_info.symbol)  # type: ignore
         self.f_info = f_info
         self.direction = direction
         self.is_backtest = is_backtest
+        # 同一交易时段的品种共享交易日历
+        self.calendar: TradingCalendar = calendar_registry.get_calendar(
+            self.quote.trading_time
+        )
+        # 交易策略变化(创建下一合约策略、换月)时调用，由盯盘人设置
+        self.on_watch_changed: Optional[Callable[[], None]] = None
+
+    def watch_changed(self):
+        """通知盯盘人重新登记交易人关注的行情对象和K线序列"""
+        if self.on_watch_changed is not None:
+            self.on_watch_changed()
+
+    def get_current_time(self) -> datetime:
+        """获取当前时间，回测使用行情时间，实盘及尚未收到行情时使用当前时间
+
+        交易日历把数值当作K线中的纳秒时间戳，这里返回 datetime 交给日历转换
+        """
+        if self.is_backtest and self.quote.datetime:
+            return datetime.fromisoformat(self.quote.datetime)
+        return datetime.now(tz_utc_8)
+
+    def is_trading_time(self) -> bool:
+        """判断是否处于交易时段内
+
+        实盘中除当前时间处于交易时段内以外，还要求本时段已经收到行情，
+        避免在交易日历未包含的休市日使用过期行情交易
+        """
+        # 尚未收到行情
+        if not self.quote.datetime:
+            return False
+        if self.is_backtest:
+            return self.calendar.is_in_session(self.quote.datetime)
+        start = self.calendar.session_start(self.get_current_time())
+        return start is not None and to_local_seconds(
+            self.quote.datetime) >= start
+
+    def get_trading_day(self) -> date:
+        """获取当前时间所属的交易日"""
+        return self.calendar.trading_day(self.get_current_time())
+
+    def is_daily_trade_finished(self) -> bool:
+        """判断当日交易是否已经结束，实盘在收盘一小时后开始盘后操作"""
+        delay = 0 if self.is_backtest else AFTER_CLOSE_DELAY
+        return self.calendar.is_session_ended(self.get_current_time(), delay)
 
     def get_mj_symbol(self):
         return self.f_info.symbol
@@ -33,6 +96,12 @@ class StrategyConfig:
     def getMainSymbolList(self):
         return self.f_info.main_symbols
 
+    def get_kline_serial(self, symbol: str, duration: int):
+        """通过K线订阅登记处获取共享的K线序列"""
+        return self.kline_registry.get_kline_serial(
+            symbol, duration, self.getKlineLength()
+        )
+
     def getKlineLength(self):
         return 200
 
@@ -0,0 +1,245 @@
+"""增量指标计算引擎
+
+天勤的 K 线序列是一个固定长度的滑动窗口，`tqsdk2.ta` 的 EMA/MACD 每次都以窗口第一根
+K线作为初始值重新计算整列数据。由于 EMA 是线性递推，窗口向前滑动一根K线时，窗口内每个
+位置的指标值只会改变 `δ * K(T)`，其中 δ 为新旧两根起始K线收盘价之差，K 为该指标对
+起始K线的脉冲响应，T 为该位置与旧起始K线的距离。
+
+引擎按 (合约, K线周期) 保存各指标未取整的结果，新K线生成时只需：
+    1. 用预先计算好的脉冲响应修正窗口滑动带来的变化；
+    2. 递推计算上一根刚完成的K线和正在生成的K线。
+这样得到的结果与全量计算 `round(3)` 后的结果一致。
+
+`IndicatorCache` 在引擎之上为所有交易策略共享同一份计算结果。
+"""
+import weakref
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+from pandas import DataFrame
+from tqsdk2 import tafunc
+
+MACD_SHORT = 12
+MACD_LONG = 24
+MACD_M = 4
+ROUND_DECIMALS = 3
+
+
+def _alpha(span: int) -> float:
+    return 2 / (span + 1)
+
+
+class _SerialState:
+    """某个K线序列的指标计算状态，所有数组均与K线窗口等长"""
+
+    def __init__(self, ids: np.ndarray, closes: np.ndarray,
+                 emas: Dict[int, np.ndarray], dea: np.ndarray):
+        self.ids = ids
+        self.closes = closes
+        self.emas = emas
+        self.dea = dea
+
+    def diff(self) -> np.ndarray:
+        return self.emas[MACD_SHORT] - self.emas[MACD_LONG]
+
+
+class IndicatorEngine:
+    """按 (合约, K线周期) 保存 EMA/MACD 状态的增量指标计算引擎
+
+    Args:
+        ema_spans: 需要填充到K线中的 EMA 周期，如主策略为 (9, 22, 60)
+    """
+
+    def __init__(self, ema_spans: Tuple[int, ...]):
+        self.ema_spans = ema_spans
+        # MACD 需要的 EMA 与需要输出的 EMA 一起计算
+        self._spans = tuple(sorted(set(ema_spans) | {MACD_SHORT, MACD_LONG}))
+        self._states: Dict[Hashable, _SerialState] = {}
+        self._kernels: Dict[int, Tuple[Dict[int, np.ndarray],
+                                       np.ndarray]] = {}
+
+    def fill(self, key: Hashable, klines: DataFrame):
+        """为K线填充指标，key 一般为 (合约代码, K线周期)"""
+        ids = klines["id"].to_numpy(dtype=float)
+        closes = klines["close"].to_numpy(dtype=float)
+        write_columns(klines, self.calc(key, ids, closes))
+
+    def calc(self, key: Hashable, ids: np.ndarray,
+             closes: np.ndarray) -> Dict[str, np.ndarray]:
+        """计算指标，返回需要填充到K线中的各列数据"""
+        return self._to_columns(self._advance(key, ids, closes))
+
+    def reset(self, key: Optional[Hashable] = None):
+        """清除指标状态，key 为空时清除全部状态"""
+        if key is None:
+            self._states.clear()
+        else:
+            self._states.pop(key, None)
+
+    def _advance(self, key: Hashable, ids: np.ndarray,
+                 closes: np.ndarray) -> _SerialState:
+        state = self._states.get(key)
+        if state is not None and self._can_increase(state, ids, closes):
+            self._increase(state, ids, closes)
+        else:
+            state = self._calc_full(ids, closes)
+            if np.isnan(closes).any():
+                # 上市时间短的合约窗口前部没有数据，此时不保存状态，每次全量计算
+                self._states.pop(key, None)
+            else:
+                self._states[key] = state
+        return state
+
+    def _can_increase(self, state: _SerialState, ids: np.ndarray,
+                      closes: np.ndarray) -> bool:
+        """判断新窗口是否是旧窗口向前滑动若干根K线得到的"""
+        n = len(ids)
+        if n != len(state.ids) or n < 3 or np.isnan(closes).any():
+            return False
+        shift = int(ids[-1] - state.ids[-1])
+        if shift < 0 or shift > n - 2 or ids[0] - state.ids[0] != shift:
+            return False
+        # 旧窗口中除最后一根(当时正在生成)外的K线已经完成，不应再变化
+        overlap = n - shift - 1
+        return np.array_equal(ids[:overlap], state.ids[shift:n - 1]) and \
+            np.array_equal(closes[:overlap], state.closes[shift:n - 1])
+
+    def _increase(self, state: _SerialState, ids: np.ndarray,
+                  closes: np.ndarray):
+        n = len(ids)
+        shift = int(ids[-1] - state.ids[-1])
+        ema_kernels, dea_kernel = self._get_kernels(n)
+        old = state.closes
+        for i in range(shift):
+            delta = old[i + 1] - old[i]
+            for span, values in state.emas.items():
+                values[i + 1:] += delta * ema_kernels[span][1:n - i]
+            state.dea[i + 1:] += delta * dea_kernel[1:n - i]
+        start = n - shift - 1
+        for span, values in state.emas.items():
+            state.emas[span] = self._shift(values, shift)
+        state.dea = self._shift(state.dea, shift)
+        state.ids = ids.copy()
+        state.closes = closes.copy()
+        # 递推计算刚完成的K线和新生成的K线
+        a_m = _alpha(MACD_M)
+        for t in range(start, n):
+            for span, values in state.emas.items():
+                a = _alpha(span)
+                values[t] = a * closes[t] + (1 - a) * values[t - 1]
+            diff = state.emas[MACD_SHORT][t] - state.emas[MACD_LONG][t]
+            state.dea[t] = a_m * diff + (1 - a_m) * state.dea[t - 1]
+
+    @staticmethod
+    def _shift(values: np.ndarray, shift: int) -> np.ndarray:
+        if shift == 0:
+            return values
+        return np.concatenate((values[shift:], np.empty(shift)))
+
+    def _calc_full(self, ids: np.ndarray,
+                   closes: np.ndarray) -> _SerialState:
+        """与 tqsdk2.ta 相同的全量计算"""
+        emas = {span: self._ema(closes, span) for span in self._spans}
+        dea = self._ema(emas[MACD_SHORT] - emas[MACD_LONG], MACD_M)
+        return _SerialState(ids.copy(), closes.copy(), emas, dea)
+
+    @staticmethod
+    def _ema(values: np.ndarray, span: int) -> np.ndarray:
+        return tafunc.ema(DataFrame({"v": values})["v"], span).to_numpy(
+            dtype=float, copy=True)
+
+    def _get_kernels(self, n: int):
+        """计算窗口长度为 n 时各指标对起始K线的脉冲响应"""
+        if n not in self._kernels:
+            impulse = np.zeros(n)
+            impulse[0] = 1.0
+            state = self._calc_full(np.zeros(n), impulse)
+            self._kernels[n] = (state.emas, state.dea)
+        return self._kernels[n]
+
+    def _to_columns(self, state: _SerialState) -> Dict[str, np.ndarray]:
+        diff = state.diff()
+        bar = np.round(2 * (diff - state.dea), ROUND_DECIMALS)
+        # 用 K 线图模拟 MACD 指标柱状图
+        columns = {
+            "MACD.open": np.zeros(len(bar)),
+            "MACD.close": bar,
+            "MACD.high": np.where(bar > 0, bar, 0),
+            "MACD.low": np.where(bar < 0, bar, 0),
+            "diff": diff,
+            "dea": state.dea.copy(),
+        }
+        for span in self.ema_spans:
+            columns[f"ema{span}"] = np.round(state.emas[span], ROUND_DECIMALS)
+        return columns
+
+
+def write_columns(klines: DataFrame, columns: Dict[str, np.ndarray]):
+    """将指标写入K线，每个K线序列持有各自的数据拷贝"""
+    for name, values in columns.items():
+        klines[name] = values.copy()
+
+
+class _CacheEntry:
+    def __init__(self, version: tuple, columns: Dict[str, np.ndarray],
+                 klines: DataFrame):
+        self.version = version
+        self.columns = columns
+        self._written: Dict[int, weakref.ref] = {}
+        self.mark_written(klines)
+
+    def has_written(self, klines: DataFrame) -> bool:
+        ref = self._written.get(id(klines))
+        return ref is not None and ref() is klines
+
+    def mark_written(self, klines: DataFrame):
+        self._written[id(klines)] = weakref.ref(klines)
+
+
+class IndicatorCache:
+    """进程内共享的指标缓存
+
+    同一合约同一周期的K线会被多个交易策略(多/空、主策略/摸底策略)订阅，缓存以
+    (合约代码, K线周期, 指标集) 为键，每根K线变化时只计算一次，其他订阅者直接复用结果。
+    """
+
+    def __init__(self):
+        self._engines: Dict[str, IndicatorEngine] = {
+            "main": IndicatorEngine((9, 22, 60)),
+            "bottom": IndicatorEngine((5, 20, 60)),
+        }
+        self._entries: Dict[Tuple[Hashable, str], _CacheEntry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fill(self, indicator_set: str, key: Hashable, klines: DataFrame):
+        """为K线填充指标集 indicator_set, key 为 (合约代码, K线周期)"""
+        ids = klines["id"].to_numpy(dtype=float)
+        closes = klines["close"].to_numpy(dtype=float)
+        version = (len(ids), ids[0], ids[-1], closes[-1])
+        entry = self._entries.get((key, indicator_set))
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            if not entry.has_written(klines):
+                write_columns(klines, entry.columns)
+                entry.mark_written(klines)
+            return
+        self.misses += 1
+        columns = self._engines[indicator_set].calc(key, ids, closes)
+        write_columns(klines, columns)
+        self._entries[(key, indicator_set)] = _CacheEntry(
+            version, columns, klines)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._entries)}
+
+    def reset(self):
+        self._entries.clear()
+        for engine in self._engines.values():
+            engine.reset()
+        self.hits = 0
+        self.misses = 0
+
+
+indicator_cache = IndicatorCache()
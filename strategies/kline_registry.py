@@ -0,0 +1,71 @@
+from typing import Dict, Optional, Tuple
+
+from pandas import DataFrame
+from tqsdk2 import TqApi
+
+from replay.kline_store import KlineStore
+from utils.common_tools import LoggerGetter
+
+DEFAULT_KLINE_LENGTH = 200
+
+
+class KlineRegistry:
+    """K线订阅登记处，所有策略通过它获取K线序列
+
+    同一 (合约代码, K线周期) 只向天勤订阅一次，订阅长度取所有请求中最长的长度，
+    最短不小于 min_length。这样多空、主策略/摸底策略及交易人之间共享同一个K线序列，
+    减少天勤序列数量以及 wait_update 时的数据处理量。
+    """
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self,
+        api: TqApi,
+        min_length: int = DEFAULT_KLINE_LENGTH,
+        store: Optional[KlineStore] = None,
+    ):
+        self._api = api
+        self._min_length = min_length
+        # 配置本地K线存储时，已完成的K线会保存到本地供以后的回测使用
+        self._store = store
+        self._serials: Dict[Tuple[str, int], DataFrame] = {}
+        self._lengths: Dict[Tuple[str, int], int] = {}
+        self.requests = 0
+
+    def get_kline_serial(
+        self, symbol: str, duration: int, length: int = DEFAULT_KLINE_LENGTH
+    ) -> DataFrame:
+        """获取共享的K线序列，返回的序列长度不小于 length"""
+        self.requests += 1
+        key = (symbol, duration)
+        length = max(length, self._min_length)
+        if key not in self._serials or self._lengths[key] < length:
+            # 已经取得较短序列的策略继续使用原序列，新的请求使用更长的序列
+            self._serials[key] = self._api.get_kline_serial(
+                symbol, duration, length
+            )
+            self._lengths[key] = length
+            self.logger.debug(f"订阅K线 {symbol} 周期:{duration} 长度:{length}")
+        return self._serials[key]
+
+    def save_to_store(self) -> int:
+        """将所有订阅中已完成的K线追加到本地K线存储，返回追加的K线数量"""
+        if self._store is None:
+            return 0
+        count = 0
+        for (symbol, duration), serial in self._serials.items():
+            # 最后一根K线可能尚未完成
+            count += self._store.append(symbol, duration, serial.iloc[:-1])
+        self.logger.debug(f"保存{count}根K线到本地K线存储")
+        return count
+
+    def subscription_count(self) -> int:
+        """返回当前唯一的K线订阅数量"""
+        return len(self._serials)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscriptions": self.subscription_count(),
+            "requests": self.requests,
+        }
@@ -1,10 +1,12 @@
 from abc import abstractmethod
+from typing import Dict, List, Optional, Tuple
 import dao.trade.trade_service as service
-from dao.odm.future_trade import MainJointSymbolStatus
+from dao.odm.future_trade import MainJointSymbolStatus, TradeStatus
 from strategies.entity import StrategyConfig
 from strategies.trade_strategies.trade_strategies import (Strategy,
                                                           TradeStrategy)
 from utils.common_tools import get_next_symbol
+from utils.latency import latency_recorder
 from utils.tqsdk_tools import get_date_str
 
 
@@ -12,6 +14,9 @@ class MJStrategy(Strategy):
     '''主连合约策略基类
 
     该类的子类包括两类：主连主策略和主连摸底策略
+
+    下一合约的交易策略在换月临近或下一合约已有持仓时才创建(见 CyclicalStrategy)，
+    在此之前不订阅下一合约的K线。
     '''
 
     def __init__(self, config: StrategyConfig):
@@ -21,16 +26,56 @@ class MJStrategy(Strategy):
         self.current_trade_strategy: TradeStrategy =\
             self._create_trade_strategy(
                 self.mjs_status.current_symbol)  # type: ignore
-        self.next_trade_strategy: TradeStrategy =\
-            self._create_trade_strategy(
-                self.mjs_status.next_symbol)  # type: ignore
-    
+        self.next_trade_strategy: Optional[TradeStrategy] = None
+
     def _update_trade_strategy(self):
-        '''更新策略的合约状态表'''
-        self.current_trade_strategy = self._create_trade_strategy(
-            self.mjs_status.current_symbol)  # type: ignore
-        self.next_trade_strategy = self._create_trade_strategy(
+        '''更新策略的合约状态表
+
+        只有换月后合约发生变化时才创建新的交易策略，否则沿用已有的交易策略。
+        下一合约的交易策略不在这里创建，换月后由 ensure_next_trade_strategy 创建。
+        '''
+        before = self._trade_strategies()
+        strategies = {s.symbol: s for s in before}
+        self.current_trade_strategy = self._get_trade_strategy(
+            strategies, self.mjs_status.current_symbol)  # type: ignore
+        self.next_trade_strategy = strategies.get(
             self.mjs_status.next_symbol)  # type: ignore
+        if [id(s) for s in self._trade_strategies()] != \
+                [id(s) for s in before]:
+            self.config.watch_changed()
+
+    def _trade_strategies(self) -> List[TradeStrategy]:
+        '''当前合约和已创建的下一合约交易策略'''
+        if self.next_trade_strategy is None:
+            return [self.current_trade_strategy]
+        return [self.current_trade_strategy, self.next_trade_strategy]
+
+    def ensure_next_trade_strategy(self) -> TradeStrategy:
+        '''创建下一合约的交易策略，已创建时直接返回'''
+        if self.next_trade_strategy is None:
+            self.logger.info(f'{self.mjs_status.custom_symbol} 创建下一合约'
+                             f'{self.mjs_status.next_symbol}交易策略')
+            self.next_trade_strategy = self._create_trade_strategy(
+                self.mjs_status.next_symbol)  # type: ignore
+            self.config.watch_changed()
+        return self.next_trade_strategy
+
+    def has_next_symbol_position(self) -> bool:
+        '''下一合约是否已有持仓，下一合约交易策略未创建时从数据库读取，不创建交易状态'''
+        if self.next_trade_strategy is not None:
+            return self.next_trade_strategy.is_trading()
+        ts = self._find_trade_status(self.mjs_status.next_symbol)  # type: ignore
+        return ts is not None and ts.trade_status == 1
+
+    def _get_trade_strategy(self, strategies: Dict[str, TradeStrategy],
+                            symbol: str) -> TradeStrategy:
+        if symbol in strategies:
+            return strategies[symbol]
+        return self._create_trade_strategy(symbol)
+
+    def reset_daily_status(self):
+        for strategy in self._trade_strategies():
+            strategy.reset_daily_status()
 
     def swith_symbol(self):
         '''盘前换月
@@ -44,10 +89,11 @@ class MJStrategy(Strategy):
         next_symbol = get_next_symbol(
             self.config.quote.underlying_symbol,
             self.config.f_info.main_symbols)  # type: ignore
+        # 在更新合约状态表之前创建下一合约交易策略，保证创建的是即将换入的合约
+        current_status = self.current_trade_strategy.ts
+        next_status = self.ensure_next_trade_strategy().ts
         self.mjs_status.current_symbol = current_symbol
         self.mjs_status.next_symbol = next_symbol
-        current_status = self.current_trade_strategy.ts
-        next_status = self.next_trade_strategy.ts
         self.logger.info(f'主连合约{self.mjs_status.main_joint_symbol}换月：'
                          f'上一主力合约：{current_status.symbol} '
                          f'下一主力合约：{next_status.symbol}'
@@ -55,7 +101,8 @@ class MJStrategy(Strategy):
                          f'即将成为主力的合约：{self.mjs_status.next_symbol}')
         service.switch_symbol(self.mjs_status, current_status, next_status,
                               self.config.quote.datetime)
-        # self.next_trade_strategy = self._create_trade_strategy(status.symbol)
+        # 主策略盘前不执行 execute_before_trade，换月后立即更新交易策略
+        self._update_trade_strategy()
 
     def _get_MJSymbol_status(self) -> MainJointSymbolStatus:
         return service.get_MJStatus(
@@ -67,36 +114,57 @@ class MJStrategy(Strategy):
 
     def execute_before_trade(self, is_in_trading: bool):
         self._update_trade_strategy()
-        self.current_trade_strategy.execute_before_trade(is_in_trading)
-        self.next_trade_strategy.execute_before_trade(is_in_trading)
+        for strategy in self._trade_strategies():
+            strategy.execute_before_trade(is_in_trading)
 
     def execute_trade(self):
         '''当K线发生变化时，先为K线填充数据，然后执行交易策略'''
         if self._is_changing(1):
             self.execute_after_trade()
-        if self._is_changing(2):
-            self.fill_indicators_by_type(2)
-        if self._is_changing(3):
-            self.fill_indicators_by_type(3)
-        if self._is_changing(4):
-            self.fill_indicators_by_type(4)
-        if self._is_changing(5):
-            self.fill_indicators_by_type(5)
+        self._fill_changed_indicators()
         if self.config.api.is_changing(self.config.quote, 'datetime'):
-            self.current_trade_strategy.execute_trade()
-            self.next_trade_strategy.execute_trade()
+            for strategy in self._trade_strategies():
+                strategy.execute_trade()
+
+    def _fill_changed_indicators(self):
+        with latency_recorder.span("indicators"):
+            for k_type in (2, 3, 4, 5):
+                if self._is_changing(k_type):
+                    self.fill_indicators_by_type(k_type)
+
+    def prepare_open_candidates(self) -> List[TradeStrategy]:
+        '''返回本次行情更新中将要判断开仓条件的交易策略，供盯盘人批量判断
+
+        与 execute_trade 相同，先为发生变化的K线填充指标，指标缓存保证重复填充时不再计算。
+        交易日结束时不返回，由 execute_trade 先执行收盘后操作。
+        '''
+        if self._is_changing(1) or not self.config.api.is_changing(
+                self.config.quote, 'datetime'):
+            return []
+        self._fill_changed_indicators()
+        return [s for s in self._trade_strategies()
+                if not s.has_pending_order() and not s.is_trading()]
 
     def execute_after_trade(self):
         logger = self.logger
         log_str = '{} {} 交易时间结束，开始执行收盘后操作'
-        self.current_trade_strategy.execute_after_trade()
-        self.next_trade_strategy.execute_after_trade()
+        for strategy in self._trade_strategies():
+            strategy.execute_after_trade()
         logger.info(log_str.format(
             get_date_str(self.config.quote.datetime), self.config.f_info.symbol))
 
+    def get_watched_objects(self) -> Tuple[List, List]:
+        """返回主连合约及其交易合约关注的行情对象和K线序列"""
+        quotes, serials = [self.config.quote], []
+        for strategy in self._trade_strategies():
+            s_quotes, s_serials = strategy.get_watched_objects()
+            quotes.extend(s_quotes)
+            serials.extend(s_serials)
+        return quotes, serials
+
     def fill_indicators_by_type(self, indicator_type: int):
-        self.current_trade_strategy.fill_indicators_by_type(indicator_type)
-        self.next_trade_strategy.fill_indicators_by_type(indicator_type)
+        for strategy in self._trade_strategies():
+            strategy.fill_indicators_by_type(indicator_type)
 
     def _is_changing(self, k_type: int) -> bool:
         '''k_type: 1: 交易日结束 2: 日线, 3: 3小时线, 4: 30分钟线, 5: 5分钟线'''
@@ -106,6 +174,10 @@ class MJStrategy(Strategy):
     def _create_trade_strategy(self, symbol: str) -> TradeStrategy:
         pass
 
+    @abstractmethod
+    def _find_trade_status(self, symbol: str) -> Optional[TradeStatus]:
+        '''从数据库读取合约的交易状态，不存在时返回 None'''
+
     @abstractmethod
     def _get_name(self) -> str:
         pass
@@ -1,3 +1,7 @@
+from typing import Optional
+
+import dao.trade.trade_service as service
+from dao.odm.future_trade import TradeStatus
 from strategies.main_joint_symbol_strategies.mjs_strategy import MJStrategy
 from strategies.trade_strategies.bts.bts_long import BottomLongTradeStrategy
 from strategies.trade_strategies.bts.bts_short import BottomShortTradeStrategy
@@ -15,6 +19,10 @@ class MJMainStrategy(MJStrategy):
     def _get_name(self) -> str:
         return 'main'
 
+    def _find_trade_status(self, symbol: str) -> Optional[TradeStatus]:
+        return service.find_main_trade_status(
+            symbol, int(self._get_direction()))
+
     def execute_before_trade(self, is_in_trading: bool):
         pass
 
@@ -28,6 +36,10 @@ class MJBottomStrategy(MJStrategy):
     def _get_name(self) -> str:
         return 'bottom'
 
+    def _find_trade_status(self, symbol: str) -> Optional[TradeStatus]:
+        return service.find_bottom_trade_status(
+            symbol, int(self._get_direction()))
+
 
 class MJMainLongStrategy(MJMainStrategy):
 
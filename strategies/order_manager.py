@@ -0,0 +1,196 @@
+"""委托单跟踪
+
+策略下单后不再阻塞等待成交，委托单交由 OrderManager 跟踪。盯盘人在每次 wait_update
+之后调用 advance 推进所有未完成的委托单：全部成交后调用下单时提供的回调完成开平仓记录；
+超时未成交时撤单，并以最新价对剩余手数重新下单，重新下单次数达到上限后放弃。
+"""
+import time
+from typing import Callable, List, Optional
+
+from tqsdk2 import Order, TqApi
+
+import dao.trade.trade_service as service
+from utils.common_tools import LoggerGetter
+from utils.latency import latency_recorder
+
+# 委托单超时时间(秒)，超时未成交则撤单并以最新价重新下单
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_REPRICES = 3
+
+
+class PendingOrder:
+    """一次开平仓操作，可能包括撤单后重新下单的多个委托单
+
+    提供与天勤委托单相同的 order_id、insert_date_time、volume_orign、trade_price 字段，
+    开平仓记录可以像使用委托单一样使用它。完成后 volume_orign 为实际成交手数，
+    trade_price 为成交均价。
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        direction: str,
+        offset: str,
+        volume: int,
+        on_finished: Optional[Callable[["PendingOrder"], None]],
+    ):
+        self.symbol = symbol
+        self.direction = direction
+        self.offset = offset
+        self.volume = volume
+        self.orders: List[Order] = []
+        # ALIVE: 未完成, FINISHED: 全部成交, FAILED: 重新下单次数达到上限
+        self.status = "ALIVE"
+        self.reprices = 0
+        self.deadline = 0.0
+        self.is_cancelling = False
+        self.close_volume = None
+        self.on_finished = on_finished
+
+    @property
+    def order(self) -> Order:
+        """当前的委托单"""
+        return self.orders[-1]
+
+    @property
+    def order_id(self) -> str:
+        return self.orders[0].order_id
+
+    @property
+    def insert_date_time(self) -> int:
+        return self.orders[0].insert_date_time
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status != "ALIVE"
+
+    @property
+    def filled_volume(self) -> int:
+        return sum(o.volume_orign - o.volume_left for o in self.orders)
+
+    @property
+    def volume_orign(self) -> int:
+        """完成前为下单手数，完成后为实际成交手数"""
+        return self.filled_volume if self.is_finished else self.volume
+
+    @property
+    def trade_price(self) -> float:
+        """所有委托单的成交均价"""
+        filled = self.filled_volume
+        if filled == 0:
+            return float("nan")
+        amount = sum(
+            o.trade_price * (o.volume_orign - o.volume_left)
+            for o in self.orders
+            if o.volume_orign > o.volume_left
+        )
+        return amount / filled
+
+
+class OrderManager:
+    """委托单管理员，跟踪所有策略的未完成委托单，同一个盯盘人的策略共享
+
+    Args:
+        api: 天勤接口
+        timeout: 委托单超时时间(秒)
+        max_reprices: 最多重新下单次数
+        clock: 计时函数，默认使用 time.monotonic
+    """
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self,
+        api: TqApi,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_reprices: int = DEFAULT_MAX_REPRICES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._api = api
+        self._timeout = timeout
+        self._max_reprices = max_reprices
+        self._clock = clock
+        self._pending: List[PendingOrder] = []
+
+    def submit(
+        self,
+        symbol: str,
+        direction: str,
+        offset: str,
+        volume: int,
+        on_finished: Optional[Callable[[PendingOrder], None]] = None,
+    ) -> PendingOrder:
+        """下单并跟踪，不等待成交
+
+        先尝试市价下单，如果不支持则将当前价格作为限价下单。
+        全部成交(或放弃时已部分成交)后调用 on_finished
+        """
+        pending = PendingOrder(symbol, direction, offset, volume, on_finished)
+        try:
+            self._insert(pending, volume)
+        except Exception:
+            self._insert(pending, volume, self._get_price(symbol))
+        self._pending.append(pending)
+        return pending
+
+    def advance(self):
+        """推进所有未完成的委托单，每次 wait_update 之后调用"""
+        for pending in list(self._pending):
+            self._advance(pending)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _advance(self, pending: PendingOrder):
+        order = pending.order
+        if order.status != "FINISHED":
+            if not pending.is_cancelling and self._clock() >= pending.deadline:
+                self.logger.info(
+                    f"{pending.symbol} 委托单{order.order_id}超时未成交，撤单"
+                )
+                self._api.cancel_order(order)
+                pending.is_cancelling = True
+            return
+        service.store_tq_order(order)
+        left = pending.volume - pending.filled_volume
+        if left <= 0:
+            self._finish(pending, "FINISHED")
+        elif pending.reprices >= self._max_reprices:
+            self.logger.error(
+                f"{pending.symbol} {pending.direction} {pending.offset} "
+                f"重新下单{pending.reprices}次仍未全部成交，"
+                f"剩余{left}手放弃成交：{order.last_msg}"
+            )
+            self._finish(pending, "FAILED")
+        else:
+            pending.reprices += 1
+            self._insert(pending, left, self._get_price(pending.symbol))
+
+    def _insert(
+        self,
+        pending: PendingOrder,
+        volume: int,
+        limit_price: Optional[float] = None,
+    ):
+        kwargs = {} if limit_price is None else {"limit_price": limit_price}
+        with latency_recorder.span("insert_order", pending.symbol):
+            order = self._api.insert_order(
+                symbol=pending.symbol,
+                direction=pending.direction,
+                offset=pending.offset,
+                volume=volume,
+                **kwargs,
+            )
+        latency_recorder.order_inserted(pending.symbol)
+        pending.orders.append(order)
+        pending.deadline = self._clock() + self._timeout
+        pending.is_cancelling = False
+
+    def _finish(self, pending: PendingOrder, status: str):
+        pending.status = status
+        self._pending.remove(pending)
+        if pending.filled_volume > 0 and pending.on_finished is not None:
+            pending.on_finished(pending)
+
+    def _get_price(self, symbol: str) -> float:
+        return self._api.get_quote(symbol).last_price
@@ -0,0 +1,93 @@
+"""止损止盈价格触发点索引
+
+持仓期间每次行情更新都会执行止损和止盈判断，而多数时候价格离止损价、止盈起始价等
+都很远，判断不会产生任何操作。交易策略把这些价格(触发点)和价格到达时需要执行的判断
+登记到索引中，行情更新时只需与两侧最近的触发点比较，价格未到达任何触发点时跳过判断。
+
+触发点由平仓条件计算得到，平仓条件只在开仓成交和执行止损止盈判断时改变，此时交易策略
+删除登记的触发点，下一次行情更新时重新登记。
+"""
+from math import inf
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+# 价格小于等于触发价时触发，如做多止损
+LOWER = -1
+# 价格大于等于触发价时触发，如做多止盈起始价
+UPPER = 1
+
+
+class PriceTrigger(NamedTuple):
+    name: str
+    price: float
+    side: int
+    callback: Callable[[], None]
+
+
+class TriggerSet:
+    """某个交易策略的全部触发点，两侧分别按与当前价格的远近排序"""
+
+    __slots__ = ("lower", "upper", "low", "high")
+
+    def __init__(self, triggers: List[PriceTrigger]):
+        self.lower = sorted((t for t in triggers if t.side == LOWER),
+                            key=lambda t: t.price, reverse=True)
+        self.upper = sorted((t for t in triggers if t.side == UPPER),
+                            key=lambda t: t.price)
+        self.low = self.lower[0].price if self.lower else -inf
+        self.high = self.upper[0].price if self.upper else inf
+
+    def fired(self, price: float) -> List[PriceTrigger]:
+        """返回价格到达的触发点"""
+        if self.low < price < self.high:
+            return []
+        return [t for t in self.lower if price <= t.price] \
+            + [t for t in self.upper if price >= t.price]
+
+    def __iter__(self):
+        return iter(self.lower + self.upper)
+
+
+class PriceTriggerIndex:
+    """按合约保存各交易策略登记的触发点，同一合约的做多、做空等策略分别登记"""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, TriggerSet]] = {}
+        self.checks = 0
+        self.skips = 0
+
+    def register(self, symbol: str, owner: str,
+                 triggers: List[PriceTrigger]) -> TriggerSet:
+        entry = TriggerSet(triggers)
+        self._entries.setdefault(symbol, {})[owner] = entry
+        return entry
+
+    def get(self, symbol: str, owner: str) -> Optional[TriggerSet]:
+        return self._entries.get(symbol, {}).get(owner)
+
+    def remove(self, symbol: str, owner: str):
+        self._entries.get(symbol, {}).pop(owner, None)
+
+    def fired(self, entry: TriggerSet, price: float) -> List[PriceTrigger]:
+        """与两侧最近的触发点比较，返回价格到达的触发点并记录统计"""
+        self.checks += 1
+        fired = entry.fired(price)
+        if not fired:
+            self.skips += 1
+        return fired
+
+    def triggers(self, symbol: str) -> Dict[str, List[PriceTrigger]]:
+        """查看某个合约登记的全部触发点"""
+        return {owner: list(entry)
+                for owner, entry in self._entries.get(symbol, {}).items()}
+
+    def stats(self) -> Dict[str, int]:
+        return {"checks": self.checks, "skips": self.skips,
+                "entries": sum(len(e) for e in self._entries.values())}
+
+    def reset(self):
+        self._entries.clear()
+        self.checks = 0
+        self.skips = 0
+
+
+price_trigger_index = PriceTriggerIndex()
@@ -1,8 +1,9 @@
-from datetime import datetime
+from typing import Hashable, Optional
 import numpy as np
 from pandas import Series
 from tqsdk2.ta import EMA, MACD
 from tqsdk2 import tafunc
+from strategies.indicators import indicator_cache
 from utils.common_tools import sendPushDeerMsg
 from utils import global_var as gvar
 
@@ -39,8 +40,14 @@ def fill_macd(klines):
     klines["dea"] = macd["dea"]
 
 
-def fill_bottom_indicators(klines):
-    """为K线填充摸底策略指标"""
+def fill_bottom_indicators(klines, key: Optional[Hashable] = None):
+    """为K线填充摸底策略指标
+
+    提供 key (合约代码, K线周期) 时使用共享的增量指标缓存，只计算新生成的K线
+    """
+    if key is not None:
+        indicator_cache.fill("bottom", key, klines)
+        return
     fill_macd(klines)
     fill_ema5(klines)
     fill_ema20(klines)
@@ -48,7 +55,14 @@ def fill_bottom_indicators(klines):
     # _draw_main_lines(klines)
 
 
-def fill_main_indicators(klines):
+def fill_main_indicators(klines, key: Optional[Hashable] = None):
+    """为K线填充主策略指标
+
+    提供 key (合约代码, K线周期) 时使用共享的增量指标缓存，只计算新生成的K线
+    """
+    if key is not None:
+        indicator_cache.fill("main", key, klines)
+        return
     fill_macd(klines)
     fill_ema9(klines)
     fill_ema22(klines)
@@ -135,30 +149,6 @@ def is_decline_2p(kline, l_kline) -> bool:
     return False
 
 
-def is_trading_time(api, symbol):
-    """判断是否在交易时间内的方法，如果购买专业版，可以使用天勤提供的方法判断
-    否则，使用简单的时间段进行判断
-    """
-    result = False
-    ts = api.get_trading_status(symbol)
-    if ts.trade_status == "CONTINOUS":
-        result = True
-    return result
-
-
-def is_after_execute_time(api, symbol):
-    """判断是否在交易时间内的方法，如果购买专业版，可以使用天勤提供的方法判断
-    否则，使用简单的时间段进行判断
-    """
-    result = False
-    now = datetime.now()
-    dkline = api.get_kline_serial(symbol, 60 * 60 * 24, 1).iloc[0]
-    k_dt = tafunc.time_to_datetime(dkline.datetime)
-    if now.hour >= 16 and now.hour < 21 and now.day == k_dt.day:
-        result = True
-    return result
-
-
 def get_52060_values(kline) -> tuple:
     ema5 = kline.ema5
     ema20 = kline.ema20
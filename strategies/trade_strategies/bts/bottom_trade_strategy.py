@@ -1,14 +1,17 @@
 from abc import abstractmethod
 from datetime import datetime, timedelta
+import numpy as np
 from tqsdk2 import tafunc
-from tqsdk2 import Order
 from dao.odm.future_trade import BottomIndicatorValues, BottomTradeStatus
 from strategies.entity import StrategyConfig
 import strategies.tools as tools
 import dao.trade.trade_service as service
+from strategies.crossovers import cross_index_cache
+from strategies.order_manager import PendingOrder
 from strategies.trade_strategies.trade_strategies import TradeStrategy
 from utils.common_tools import LoggerGetter
 import utils.tqsdk_tools as tq_tools
+from utils.log_utils import Lazy, LazyFormat
 
 
 class BottomTradeStrategy(TradeStrategy):
@@ -17,9 +20,10 @@ class BottomTradeStrategy(TradeStrategy):
     def __init__(self, config: StrategyConfig, symbol: str):
         super().__init__(config, symbol)
         self.tip = None
-        service.get_last_bottom_tips_by_symbol(
-            self.ts.symbol, self._get_direction()
-        )
+
+    def reset_daily_status(self):
+        """摸底提示每天收盘后重新生成，新交易日需要重新读取"""
+        self.tip = None
 
     def fill_indicators_by_type(self, k_type: int):
         """根据K线类型填充指标 1:全部K线 2:日线 3:3小时线 4:30分钟线"""
@@ -28,11 +32,18 @@ class BottomTradeStrategy(TradeStrategy):
             self.fill_indicators_by_type(3)
             self.fill_indicators_by_type(4)
         elif k_type == 2:
-            tools.fill_bottom_indicators(self._d_klines)
+            tools.fill_bottom_indicators(
+                self._d_klines, (self.symbol, self.config.getDailyK_Duration())
+            )
         elif k_type == 3:
-            tools.fill_bottom_indicators(self._3h_klines)
+            tools.fill_bottom_indicators(
+                self._3h_klines, (self.symbol, self.config.get3hK_Duration())
+            )
         elif k_type == 4:
-            tools.fill_bottom_indicators(self._30m_klines)
+            tools.fill_bottom_indicators(
+                self._30m_klines,
+                (self.symbol, self.config.get30mK_Duration()),
+            )
 
     def _can_get_tips(self, is_trading) -> bool:
         """是否符合摸底提示条件
@@ -65,7 +76,9 @@ class BottomTradeStrategy(TradeStrategy):
         """是否有摸底提示"""
         if self.tip is None:
             self.tip = service.get_last_bottom_tips_by_symbol(
-                self.ts.symbol, self._get_direction()
+                self.ts.symbol,
+                self._get_direction(),
+                self.config.get_trading_day(),
             )
         if self.tip is not None:
             return self.tip.need_trade
@@ -74,33 +87,31 @@ class BottomTradeStrategy(TradeStrategy):
     def _is_within_distance(self, last_matched_kline, is_macd_matched) -> bool:
         """30分钟线需要判断与最近符合条件的30分钟线的距离是否在5根以内"""
         logger = self.logger
-        trade_date_str = self._get_trade_date_str()
+        trade_date_str = self._lazy_trade_date_str()
         log_str = (
             "{} {} 前一交易日最后30分钟线时间:{}, 满足条件的30分"
             "钟线时间{}, 满足条件前一根30分钟线ema5:{}, ema60:{}, close:{}."
         )
         m30_klines = self._30m_klines
-        m30_klines = m30_klines[
-            m30_klines.datetime < last_matched_kline.datetime
-        ].iloc[::-1]
-        wanted_kline = m30_klines.iloc[-10]
         distance = 5
         is_match = False
-        for i, t_kline in m30_klines.iterrows():
-            e5, _, e60, _, close, _, _, _ = self._get_indicators(t_kline)
-            if close <= e60 or e5 <= e60:
-                wanted_kline = self._30m_klines.iloc[i + 1]
-                content = log_str.format(
-                    trade_date_str,
-                    self.ts.symbol,
-                    tq_tools.get_date_str(last_matched_kline.datetime),
-                    tq_tools.get_date_str(wanted_kline.datetime),
-                    e5,
-                    e60,
-                    close,
-                )
-                logger.debug(content)
-                break
+        wanted_kline = m30_klines.iloc[9]
+        i = self._get_last_below_e60(last_matched_kline.datetime)
+        if i >= 0:
+            wanted_kline = m30_klines.iloc[i + 1]
+            e5, _, e60, _, close, _, _, _ = self._get_indicators(
+                m30_klines.iloc[i])
+            content = LazyFormat(
+                log_str,
+                trade_date_str,
+                self.ts.symbol,
+                Lazy(tq_tools.get_date_str, last_matched_kline.datetime),
+                Lazy(tq_tools.get_date_str, wanted_kline.datetime),
+                e5,
+                e60,
+                close,
+            )
+            logger.debug(content)
         if is_macd_matched:
             last_date = tafunc.time_to_datetime(last_matched_kline.datetime)
             last_date = datetime(
@@ -128,6 +139,26 @@ class BottomTradeStrategy(TradeStrategy):
                 is_match = True
         return is_match
 
+    def _get_last_below_e60(self, before) -> int:
+        """返回生成时间在 before 之前、最近一根收盘价或 EMA5 <= EMA60 的30分钟线位置
+
+        找不到时返回 -1
+        """
+        klines = self._30m_klines
+        end = int(np.searchsorted(klines["datetime"].to_numpy(), before))
+        if end == 0:
+            return -1
+        close = klines["close"].to_numpy()
+        e5 = klines["ema5"].to_numpy()
+        e60 = klines["ema60"].to_numpy()
+
+        def state(lo: int, hi: int) -> np.ndarray:
+            return (close[lo:hi] <= e60[lo:hi]) | (e5[lo:hi] <= e60[lo:hi])
+
+        key = (self.symbol, self.config.get30mK_Duration(), "below_e60")
+        return cross_index_cache.last_true(
+            key, klines["id"].to_numpy(), state, end - 1)
+
     def _try_stop_loss(self):
         """摸底策略暂时只用作提示，不涉及止损"""
         pass
@@ -191,7 +222,7 @@ class BottomTradeStrategy(TradeStrategy):
             self.logger.info(content)
             service.store_b_open_volume_tip(self.ts, pos)  # type: ignore
 
-    def _store_open_pos_info(self, order: Order):
+    def _store_open_pos_info(self, order: PendingOrder):
         if self.tip is not None:
             service.open_bottom_pos(self.ts, order, self.tip)
 
@@ -201,9 +232,10 @@ class BottomTradeStrategy(TradeStrategy):
         ema60 = kline.ema60
         macd = kline["MACD.close"]
         close = kline.close
-        trade_time = self._get_trade_date()
-        kline_time_str_short = tq_tools.get_date_str_short(kline.datetime)
-        kline_time_str = tq_tools.get_date_str(kline.datetime)
+        # 时间只用于日志，输出时才转换
+        trade_time = Lazy(self._get_trade_date)
+        kline_time_str_short = Lazy(tq_tools.get_date_str_short, kline.datetime)
+        kline_time_str = Lazy(tq_tools.get_date_str, kline.datetime)
         return (
             ema5,
             ema20,
@@ -1,9 +1,8 @@
-from tqsdk2 import Order
-
 import strategies.tools as tools
 from strategies.trade_strategies.bts.bottom_trade_strategy import (
     BottomTradeStrategy,
 )
+from strategies.order_manager import PendingOrder
 from strategies.trade_strategies.trade_strategies import ShortTradeStrategy
 
 
@@ -137,7 +136,7 @@ class BottomShortTradeStrategy(BottomTradeStrategy, ShortTradeStrategy):
             )
         return self._30m_klines.loc[kline.name, "s_matched"]  # type: ignore
 
-    def _set_sold_prices(self, order: Order):
+    def _set_sold_prices(self, order: PendingOrder):
         s_c = self.ts.sold_condition
         s_c.stop_loss_price = self._calc_price(
             order.trade_price,
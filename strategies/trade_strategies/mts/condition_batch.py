@@ -0,0 +1,118 @@
+"""跨合约批量判断主策略开仓条件
+
+盯盘人唤醒交易人之前，把所有待开仓主策略在同一周期上最后一根已完成K线的指标
+(列顺序见 conditions.MATRIX_COLUMNS)组成一个矩阵，按日线、3小时线、30分钟线、
+5分钟线的顺序逐级向量化判断。某一级不满足的合约直接在K线上缓存条件编号 0，
+交易人执行时逐根判断的方法读取缓存后立即返回，只有可能满足条件的合约才会逐级判断、
+输出日志并记录开仓条件。
+
+3小时线的 C2 距离和30分钟线的两日内交叉依赖K线窗口，批量判断时按最宽松的情况计算，
+只有无论它们取何值都不满足的合约才会被排除，所以排除结果与逐根判断完全相同。
+"""
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from strategies.main_joint_symbol_strategies.mjs_strategy import MJStrategy
+from strategies.trade_strategies.mts import conditions
+from strategies.trade_strategies.mts.main_trade_strategy import (
+    MainTradeStrategy,
+)
+from strategies.trade_strategies.mts.mts_long import MainLongTradeStrategy
+from strategies.trade_strategies.mts.mts_short import MainShortTradeStrategy
+
+# (K线属性, 条件判断函数)，判断函数的参数为指标列和上一级的条件编号
+Step = Tuple[str, Callable[[conditions.IndicatorColumns, np.ndarray],
+                           np.ndarray]]
+
+
+def _long_3h(c, upper):
+    return np.maximum(conditions.long_3h_conditions(c, upper, True),
+                      conditions.long_3h_conditions(c, upper, False))
+
+
+# 各方向逐级判断的步骤及缓存条件编号的列，做空5分钟线没有条件
+CASCADES: Dict[type, Tuple[str, List[Step]]] = {
+    MainLongTradeStrategy: ("l_condition", [
+        ("_d_klines", lambda c, _: conditions.long_daily_conditions(c)),
+        ("_3h_klines", _long_3h),
+        ("_30m_klines", lambda c, _: conditions.long_minute_conditions(c)),
+        ("_5m_klines", lambda c, _: conditions.long_minute_conditions(c)),
+    ]),
+    MainShortTradeStrategy: ("s_condition", [
+        ("_d_klines", lambda c, _: conditions.short_daily_conditions(c)),
+        ("_3h_klines", lambda c, _: conditions.short_3h_conditions(c)),
+        ("_30m_klines",
+         lambda c, _: conditions.short_30m_conditions(c, True)),
+    ]),
+}
+
+
+def _cached(klines: DataFrame, column: str) -> float:
+    """判断的K线(倒数第二根)上缓存的条件编号，未判断时为 nan"""
+    if column not in klines.columns:
+        return np.nan
+    return klines[column].iat[-2]
+
+
+def _last_closed(klines: DataFrame) -> np.ndarray:
+    return np.array([klines[c].iat[-2] for c in conditions.MATRIX_COLUMNS],
+                    dtype=float)
+
+
+class ConditionBatch:
+    """盯盘人在唤醒交易人前批量排除不满足开仓条件的主策略"""
+
+    def __init__(self):
+        self.evaluated = 0
+        self.excluded = 0
+
+    def prefill(self, mj_strategies: List[MJStrategy]) -> int:
+        """为即将执行的主连策略批量判断开仓条件，返回本次排除的交易策略数量"""
+        strategies: List[MainTradeStrategy] = []
+        for mjs in mj_strategies:
+            strategies.extend(
+                s for s in mjs.prepare_open_candidates()
+                if type(s) in CASCADES)
+        excluded = 0
+        for cls, (column, steps) in CASCADES.items():
+            group = [s for s in strategies if type(s) is cls]
+            if group:
+                excluded += self._prefill_cascade(group, column, steps)
+        self.excluded += excluded
+        return excluded
+
+    def _prefill_cascade(self, strategies: List[MainTradeStrategy],
+                         column: str, steps: List[Step]) -> int:
+        excluded = 0
+        # 上一级的条件编号，第一级(日线)没有上一级
+        pending = [(s, np.nan) for s in strategies]
+        for attr, rule in steps:
+            uncached, passed = [], []
+            for s, upper in pending:
+                cond = _cached(getattr(s, attr), column)
+                if np.isnan(cond):
+                    uncached.append((s, upper))
+                elif cond:
+                    passed.append((s, cond))
+            if uncached:
+                matrix = np.vstack(
+                    [_last_closed(getattr(s, attr)) for s, _ in uncached])
+                uppers = np.array([upper for _, upper in uncached])
+                results = rule(
+                    conditions.IndicatorColumns.from_matrix(matrix), uppers)
+                self.evaluated += len(uncached)
+                for (s, _), cond in zip(uncached, results):
+                    if cond:
+                        passed.append((s, cond))
+                    else:
+                        s._store_condition(getattr(s, attr), column, 0)
+                        excluded += 1
+            pending = passed
+            if not pending:
+                break
+        return excluded
+
+    def stats(self) -> Dict[str, int]:
+        return {"evaluated": self.evaluated, "excluded": self.excluded}
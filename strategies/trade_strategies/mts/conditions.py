@@ -0,0 +1,157 @@
+"""主策略开仓条件的向量化计算
+
+与 MainLongTradeStrategy / MainShortTradeStrategy 中逐根K线的条件判断规则相同，
+一次计算K线序列中每一根K线的条件编号(0 表示不满足)，用于回测预热和研究时批量标记K线。
+依赖其他周期或当前K线窗口的判断(日线条件、3小时线 C2 距离、30分钟线两日内交叉)
+由调用者传入，可以是标量，也可以是与K线等长的数组。
+
+各函数也接受 IndicatorColumns，如多个合约最后一根已完成K线组成的矩阵，一次判断全部合约。
+"""
+from typing import Union
+
+import numpy as np
+from pandas import DataFrame
+
+ArrayLike = Union[float, bool, np.ndarray]
+# 主策略判断条件使用的K线列，也是 IndicatorColumns.from_matrix 中矩阵的列顺序
+MATRIX_COLUMNS = ("ema9", "ema22", "ema60", "MACD.close", "close", "open")
+
+
+class IndicatorColumns:
+    """主策略判断条件使用的指标列，每一列为一维数组"""
+
+    __slots__ = ("e9", "e22", "e60", "macd", "close", "open")
+
+    def __init__(self, e9, e22, e60, macd, close, open_p):
+        self.e9 = e9
+        self.e22 = e22
+        self.e60 = e60
+        self.macd = macd
+        self.close = close
+        self.open = open_p
+
+    @classmethod
+    def from_klines(cls, klines: DataFrame) -> "IndicatorColumns":
+        return cls(*(klines[c].to_numpy(dtype=float) for c in MATRIX_COLUMNS))
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> "IndicatorColumns":
+        """matrix 的每一行为一根K线，列顺序为 MATRIX_COLUMNS"""
+        return cls(*matrix.T)
+
+
+Source = Union[DataFrame, IndicatorColumns]
+
+
+def _columns(source: Source) -> IndicatorColumns:
+    if isinstance(source, IndicatorColumns):
+        return source
+    return IndicatorColumns.from_klines(source)
+
+
+def diff(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """与 tools.diff_two_value 相同，K线中的数值为 numpy 浮点数，取整方式一致"""
+    return np.round(np.abs(first - second) / second * 100, 3)
+
+
+def _between(value: np.ndarray, low: float, high: float) -> np.ndarray:
+    return (low < value) & (value < high)
+
+
+def long_daily_conditions(klines: Source) -> np.ndarray:
+    """做多日线条件 1-5"""
+    c = _columns(klines)
+    diff9_60, diffc_60, diff22_60 = diff(c.e9, c.e60), diff(c.close, c.e60), \
+        diff(c.e22, c.e60)
+    # 与 min(open, close) 相同，两者相等时取开盘价
+    low = np.where(c.close < c.open, c.close, c.open)
+    below, above = c.e22 < c.e60, c.e22 > c.e60
+    cond1 = below & ((diff9_60 < 1) | (diff22_60 < 1)) & (c.close > c.e60) \
+        & (c.macd > 0) & ((c.e9 > c.e22) | (c.macd > 0))
+    cond2 = above & (diff22_60 < 1) & (c.close > c.e60)
+    cond3 = above & _between(diff9_60, 1, 3) & (c.e9 > c.e22) \
+        & (c.e22 > low) & (low > c.e60)
+    cond4 = above & _between(diff22_60, 1, 3) & (diff9_60 < 2) \
+        & (c.e22 > c.close) & (c.close > c.e60) \
+        & (c.e22 > c.e9) & (c.e9 > c.e60)
+    cond5 = above & (diff22_60 > 3) & (diffc_60 < 3) \
+        & (c.e22 > c.close) & (c.close > c.e60) \
+        & (c.e22 > c.open) & (c.open > c.e60)
+    return np.select([cond1, cond2, cond3, cond4, cond5], [1, 2, 3, 4, 5], 0)
+
+
+def long_3h_conditions(klines: Source, d_condition: ArrayLike,
+                       c2_distance: ArrayLike) -> np.ndarray:
+    """做多3小时线条件 1-6
+
+    Args:
+        d_condition: 所属日线的做多条件编号
+        c2_distance: 3小时线 EMA22/EMA60 与 EMA9/EMA60 交点的距离是否在5根以内
+    """
+    c = _columns(klines)
+    diffc_60, diffo_60 = diff(c.close, c.e60), diff(c.open, c.e60)
+    diff22_60, diff9_60 = diff(c.e22, c.e60), diff(c.e9, c.e60)
+    d_condition = np.broadcast_to(d_condition, c.close.shape)
+    c2_distance = np.broadcast_to(c2_distance, c.close.shape)
+    near = (diffc_60 < 3) | (diffo_60 < 3)
+    d12 = near & np.isin(d_condition, [1, 2])
+    d34 = near & np.isin(d_condition, [3, 4])
+    cond1 = d12 & (c.e22 < c.e60) & (c.e9 < c.e60) & (
+        (diff22_60 < 1)
+        | (_between(diff22_60, 1, 2) & ((c.macd > 0) | (c.close > c.e60)))
+    )
+    rising = d12 & ~cond1 & (c.close > c.e9) & (c.e9 > c.e22) \
+        & (c.e22 > c.e60)
+    cond2 = rising & c2_distance
+    cond5 = rising & ~c2_distance & (diff9_60 < 1) & (diff22_60 < 1) \
+        & (c.macd > 0)
+    cond3 = d34 & (c.close > c.e60) & (c.e60 > c.e22) & (c.macd > 0) \
+        & (diff22_60 < 1) & (c.e9 < c.e60)
+    cond6 = d34 & ~cond3 & (d_condition == 3) & (diff9_60 < 1) \
+        & (diff22_60 < 1)
+    cond4 = near & (d_condition == 5) & (c.e60 > c.e22) & (c.e22 > c.e9)
+    return np.select([cond1, cond2, cond5, cond3, cond6, cond4],
+                     [1, 2, 5, 3, 6, 4], 0)
+
+
+def long_minute_conditions(klines: Source) -> np.ndarray:
+    """做多30分钟线和5分钟线条件"""
+    c = _columns(klines)
+    matched = (c.close > c.e60) & (c.macd > 0) & (diff(c.close, c.e60) < 1.2)
+    return matched.astype(int)
+
+
+def short_daily_conditions(klines: Source) -> np.ndarray:
+    """做空日线条件，排除 EMA9 或 EMA22 与 EMA60 接近且收盘价在 EMA60 之上的K线"""
+    c = _columns(klines)
+    excluded = ((diff(c.e9, c.e60) < 2) | (diff(c.e22, c.e60) < 2)) \
+        & (c.e60 < c.close)
+    matched = (c.e22 > c.e60) & (c.macd < 0) & (c.e22 > c.close) & ~excluded
+    return matched.astype(int)
+
+
+def short_3h_conditions(klines: Source) -> np.ndarray:
+    """做空3小时线条件"""
+    c = _columns(klines)
+    crossed = (c.e22 > c.e9) | (
+        (c.e22 < c.e9) & (c.close < c.e60) & (c.open > c.e60))
+    matched = (c.e22 > c.e60) & crossed & (diff(c.e9, c.e60) < 3) \
+        & (diff(c.e22, c.e60) < 3) & (diff(c.close, c.e60) < 3) \
+        & (c.macd < 0)
+    return matched.astype(int)
+
+
+def short_30m_conditions(klines: Source,
+                         within_2days: ArrayLike) -> np.ndarray:
+    """做空30分钟线条件
+
+    Args:
+        within_2days: 30分钟收盘价与 EMA60 的交叉是否在规定的日线数量之内
+    """
+    c = _columns(klines)
+    ordered = ((c.e60 > c.e22) & (c.e22 > c.e9)) \
+        | ((c.e22 > c.e60) & (c.e60 > c.e9))
+    matched = ordered & (diff(c.e9, c.e60) < 2) & (diff(c.e22, c.e60) < 1) \
+        & (c.macd < 0) & (c.e60 > c.close) \
+        & np.broadcast_to(within_2days, c.close.shape)
+    return matched.astype(int)
@@ -1,13 +1,16 @@
 from abc import abstractmethod
 from datetime import datetime, timedelta
+import numpy as np
 from tqsdk2 import tafunc
-from tqsdk2 import Order
 from dao.odm.future_trade import MainIndicatorValues, MainTradeStatus
 import dao.trade.trade_service as service
+from strategies.crossovers import cross_index_cache
+from strategies.order_manager import PendingOrder
 from strategies.trade_strategies.trade_strategies import TradeStrategy
 from utils.common_tools import LoggerGetter
 import strategies.tools as tools
 import utils.tqsdk_tools as tq_tools
+from utils.log_utils import Lazy, LazyFormat
 
 
 class MainTradeStrategy(TradeStrategy):
@@ -21,13 +24,21 @@ class MainTradeStrategy(TradeStrategy):
             self.fill_indicators_by_type(4)
             self.fill_indicators_by_type(5)
         elif k_type == 2:
-            tools.fill_main_indicators(self._d_klines)
+            tools.fill_main_indicators(
+                self._d_klines, (self.symbol, self.config.getDailyK_Duration())
+            )
         elif k_type == 3:
-            tools.fill_main_indicators(self._3h_klines)
+            tools.fill_main_indicators(
+                self._3h_klines, (self.symbol, self.config.get3hK_Duration())
+            )
         elif k_type == 4:
-            tools.fill_main_indicators(self._30m_klines)
+            tools.fill_main_indicators(
+                self._30m_klines, (self.symbol, self.config.get30mK_Duration())
+            )
         elif k_type == 5:
-            tools.fill_main_indicators(self._5m_klines)
+            tools.fill_main_indicators(
+                self._5m_klines, (self.symbol, self.config.get5mK_Duration())
+            )
 
     def _can_open_pos(self) -> bool:
         """判断是否可以开仓"""
@@ -44,13 +55,12 @@ class MainTradeStrategy(TradeStrategy):
     def _try_stop_loss(self):
         """当满足止损条件时，进行止损操作"""
         logger = self.logger
-        trade_date_str = self._get_trade_date_str()
-        price = self._get_current_price()
         log_str = "{} {} {} {} 现价:{} 止损价:{} 手数:{}"
         if self._has_match_stop_loss():
+            price = self._get_current_price()
             pos = self._get_carry_pos()
             content = log_str.format(
-                trade_date_str,
+                self._get_trade_date_str(),
                 self.ts.symbol,
                 self.ts.custom_symbol,
                 self.ts.sold_condition.sl_reason,
@@ -73,6 +83,16 @@ class MainTradeStrategy(TradeStrategy):
     def _get_last_kline_in_trade(self, klines):
         return klines.iloc[-2]
 
+    def _store_condition(self, klines, column: str, cond_number: int) -> int:
+        """将条件编号缓存到判断的K线(倒数第二根)上，返回条件编号
+
+        按位置直接写入缓存列，避免 loc 按索引写入再读出整行
+        """
+        if column not in klines.columns:
+            klines[column] = np.nan
+        klines.iat[-2, klines.columns.get_loc(column)] = cond_number
+        return cond_number
+
     def _get_indicators(self, kline) -> tuple:
         """获取常用指标"""
         ema9 = kline.ema9
@@ -81,9 +101,10 @@ class MainTradeStrategy(TradeStrategy):
         macd = kline["MACD.close"]
         close = kline.close
         open_price = kline.open
-        trade_time = self._get_trade_date()
-        kline_time_str_short = tq_tools.get_date_str_short(kline.datetime)
-        kline_time_str = tq_tools.get_date_str(kline.datetime)
+        # 时间只用于日志，输出时才转换
+        trade_time = Lazy(self._get_trade_date)
+        kline_time_str_short = Lazy(tq_tools.get_date_str_short, kline.datetime)
+        kline_time_str = Lazy(tq_tools.get_date_str, kline.datetime)
         return (
             ema9,
             ema22,
@@ -102,7 +123,7 @@ class MainTradeStrategy(TradeStrategy):
         上一次满足的条件为：30分钟收盘价 < EMA60 < EAM22
         """
         logger = self.logger
-        trade_time = self._get_trade_date_str()
+        trade_time = self._lazy_trade_date_str()
         log_str = (
             "{} {} <做空> 当前日k线生成时间:{} 最近一次30分钟收盘价与EMA60"
             "交叉时间{} 交叉前一根30分钟K线ema60:{} close:{}"
@@ -110,26 +131,8 @@ class MainTradeStrategy(TradeStrategy):
         daily_klines = self._d_klines
         c_dkline = daily_klines.iloc[-1]
         l_dkline = self._get_last_kline_in_trade(daily_klines)
-        l30m_kline = daily_klines.iloc[-9]
+        l30m_kline, e60, close = self._get_30m_cross_kline()
         c_date = tq_tools._get_datetime_from_ns(c_dkline.datetime)
-        temp_df = self._30m_klines.iloc[::-1]
-        e60, close = 0, 0
-        for i, temp_kline in temp_df.iterrows():
-            _, _, e60, _, close, _, trade_time, _, _ = self._get_indicators(
-                temp_kline
-            )
-            if close >= e60:
-                # 30分钟收盘价和ema60还未交叉，不符合开仓条件
-                if i == 199:
-                    break
-                else:
-                    t30m_kline = self._30m_klines.iloc[i + 1]  # type: ignore
-                    _, et22, et60, _, _, _, _, _, _ = self._get_indicators(
-                        t30m_kline
-                    )
-                    if et22 > et60:
-                        l30m_kline = t30m_kline
-                        break
         temp_date = tq_tools._get_datetime_from_ns(l30m_kline.datetime)
         # 当30分钟线生成时间小于21点，其所在日线为当日，否则为下一日日线
         if temp_date.hour < 21:
@@ -145,8 +148,9 @@ class MainTradeStrategy(TradeStrategy):
         if not l_klines.empty:
             l_kline = l_klines.iloc[-1]
             logger.debug(
-                log_str.format(
-                    trade_time, self.ts.symbol, c_date, temp_date, e60, close
+                LazyFormat(
+                    log_str, trade_time, self.ts.symbol, c_date, temp_date,
+                    e60, close
                 )
             )
             logger.debug(
@@ -169,41 +173,60 @@ class MainTradeStrategy(TradeStrategy):
                 return True
         return False
 
+    def _get_30m_cross_kline(self) -> tuple:
+        """查找最近一根 EMA22 > EMA60 且前一根收盘价 >= EMA60 的30分钟线
+
+        返回 (该K线, 前一根K线的 ema60, 前一根K线的收盘价)，最新的30分钟线收盘价
+        仍 >= EMA60 或找不到时返回倒数第9根日线
+        """
+        klines = self._30m_klines
+        ids = klines["id"].to_numpy()
+        close = klines["close"].to_numpy()
+        e22 = klines["ema22"].to_numpy()
+        e60 = klines["ema60"].to_numpy()
+        default = self._d_klines.iloc[-9]
+        if close[-1] >= e60[-1]:
+            # 30分钟收盘价和ema60还未交叉，不符合开仓条件
+            return default, e60[-1], close[-1]
+
+        def state(lo: int, hi: int) -> np.ndarray:
+            # 位置 j 的状态：前一根收盘价 >= EMA60 且本根 EMA22 > EMA60
+            above = np.zeros(hi - lo, dtype=bool)
+            begin = max(lo, 1)
+            above[begin - lo:] = close[begin - 1:hi - 1] >= e60[begin - 1:hi - 1]
+            return above & (e22[lo:hi] > e60[lo:hi])
+
+        key = (self.symbol, self.config.get30mK_Duration(), "close_above_e60")
+        j = cross_index_cache.last_true(key, ids, state, len(ids) - 1)
+        if j < 1:
+            return default, e60[0], close[0]
+        return klines.iloc[j], e60[j - 1], close[j - 1]
+
     def _match_3hk_c2_distance(self) -> bool:
-        # logger = self.logger
-        klines = self._3h_klines.iloc[::-1]
-        # log_str = 'k2:{},e9:{},e60:{},date:{}/k1:{},e22:{},e60:{},date:{}'
-        k1, k2 = 0, 0
-        is_done_1 = False
-        for _, kline in klines.iterrows():
-            # logger.debug(f'kline:{kline}')
-            e9 = kline.ema9
-            e22 = kline.ema22
-            e60 = kline.ema60
-            if not is_done_1 and e22 <= e60:
-                k1 = kline.id
-                # date1 = get_date_str(kline.datetime)
-                # ema22 = e22
-                # ema60_1 = e60
-                is_done_1 = True
-                # logger.debug(log_debug_1.format(
-                #    k1, e9, e22, e60, date1
-                # ))
-            if e9 <= e60:
-                k2 = kline.id
-                # date2 = get_date_str(kline.datetime)
-                # ema9 = e9
-                # ema60_2 = e60
-                # logger.debug(log_debug_2.format(
-                #    k2, e9, e22, e60, date2
-                # ))
-                break
-        if 0 <= k1 - k2 <= 5:
-            # logger.debug(log_str.format(
-            # k2, ema9, ema60_2, date2, k1, ema22, ema60_1, date1))
-            # logger.debug('两个交点距离小于等于5,符合条件')
-            return True
-        return False
+        k1, k2 = self._get_3hk_cross_ids()
+        return 0 <= k1 - k2 <= 5
+
+    def _get_3hk_cross_ids(self) -> tuple:
+        """返回 (最近一根 EMA22 <= EMA60 的3小时线id, 最近一根 EMA9 <= EMA60 的3小时线id)
+
+        前者只在后者及之后查找，找不到时为 0
+        """
+        klines = self._3h_klines
+        ids = klines["id"].to_numpy()
+        e9 = klines["ema9"].to_numpy()
+        e22 = klines["ema22"].to_numpy()
+        e60 = klines["ema60"].to_numpy()
+        duration = self.config.get3hK_Duration()
+        last = len(ids) - 1
+        p2 = cross_index_cache.last_true(
+            (self.symbol, duration, "e9_below_e60"), ids,
+            lambda lo, hi: e9[lo:hi] <= e60[lo:hi], last)
+        p1 = cross_index_cache.last_true(
+            (self.symbol, duration, "e22_below_e60"), ids,
+            lambda lo, hi: e22[lo:hi] <= e60[lo:hi], last)
+        k2 = ids[p2] if p2 >= 0 else 0
+        k1 = ids[p1] if p1 >= 0 and p1 >= p2 else 0
+        return k1, k2
 
     def _set_open_condition(
         self, kline, cond_num: int, indiatorValues: MainIndicatorValues
@@ -216,7 +239,7 @@ class MainTradeStrategy(TradeStrategy):
             macd,
             close,
             open_p,
-            trade_time,
+            _,
             _,
             _,
         ) = self._get_indicators(kline)
@@ -226,14 +249,14 @@ class MainTradeStrategy(TradeStrategy):
         indiatorValues.macd = macd
         indiatorValues.close = close
         indiatorValues.open = open_p
-        indiatorValues.kline_time = trade_time
+        indiatorValues.kline_time = self._get_trade_date()
         indiatorValues.condition_id = cond_num
 
     def _set_sold_condition(self):
         s_c = self.ts.sold_condition
         s_c.take_profit_stage = 0
 
-    def _store_open_pos_info(self, order: Order):
+    def _store_open_pos_info(self, order: PendingOrder):
         service.open_main_pos(self.ts, order)
 
     @abstractmethod
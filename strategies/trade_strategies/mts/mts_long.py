@@ -1,4 +1,4 @@
-from tqsdk2 import Order
+from typing import Callable, List
 
 import dao.trade.trade_service as service
 import strategies.tools as tools
@@ -6,7 +6,10 @@ import utils.tqsdk_tools as tq_tools
 from strategies.trade_strategies.mts.main_trade_strategy import (
     MainTradeStrategy,
 )
+from strategies.order_manager import PendingOrder
+from strategies.price_triggers import LOWER, UPPER, PriceTrigger
 from strategies.trade_strategies.trade_strategies import LongTradeStrategy
+from utils.log_utils import Lazy, LazyFormat
 
 
 class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
@@ -17,7 +20,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
         sc = self.ts.sold_condition
         log_str = "{} {} <做多> 止赢{} 现价:{} 手数:{} 剩余仓位:{} 止赢起始价:{}"
         sp_log = "止盈条件{}-售出{}"
-        trade_time = tq_tools.get_date_str(kline.datetime)
+        trade_time = Lazy(tq_tools.get_date_str, kline.datetime)
         price = self._get_current_price()
         if self._get_profit_condition() in [1, 2, 3]:
             self._try_improve_stop_loss()
@@ -48,7 +51,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
                     sc.take_profit_cond,
                     price,
                     sold_pos,
-                    self._get_carry_pos(),
+                    carry_pos - sold_pos,
                     sc.tp_started_point,
                 )
                 logger.info(content)
@@ -71,6 +74,8 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
     def _match_dk_condition(self, is_in=True) -> bool:
         logger = self.logger
         kline = self._get_last_kline_in_trade(self._d_klines)
+        if tools.has_set_k_attr(kline, "l_condition"):
+            return kline.l_condition
         (
             e9,
             e22,
@@ -88,8 +93,6 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             "MACD:{}"
         )
         cond_number = 0
-        if tools.has_set_k_attr(kline, "l_condition"):
-            return kline.l_condition
         diff9_60 = tools.diff_two_value(e9, e60)
         diffc_60 = tools.diff_two_value(close, e60)
         diff22_60 = tools.diff_two_value(e22, e60)
@@ -129,9 +132,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
                 and e22 > open_p > e60
             ):
                 cond_number = 5
-        self._set_klines_value(
-            self._d_klines, kline.name, "l_condition", cond_number
-        )
+        self._store_condition(self._d_klines, "l_condition", cond_number)
         if cond_number > 0:
             content = log_str.format(
                 trade_time,
@@ -152,7 +153,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
                 kline, cond_number, self.ts.open_condition.daily_condition
             )  # type: ignore
             self.ts.open_condition.daily_condition.condition_id = cond_number  # type: ignore
-        return self._d_klines.loc[kline.name].l_condition  # type: ignore
+        return cond_number  # type: ignore
 
     def _match_3h_condition(self, is_in=True) -> bool:
         """做多3小时线检测"""
@@ -212,9 +213,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
                     cond_number = 6
             elif dkline.l_condition == 5 and (e60 > e22 > e9):
                 cond_number = 4
-        self._set_klines_value(
-            self._3h_klines, kline.name, "l_condition", cond_number
-        )
+        self._store_condition(self._3h_klines, "l_condition", cond_number)
         if cond_number > 0:
             content = log_str.format(
                 trade_time,
@@ -235,7 +234,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             self._set_open_condition(
                 kline, cond_number, self.ts.open_condition.hourly_condition
             )  # type: ignore
-        return self._3h_klines.loc[kline.name].l_condition  # type: ignore
+        return cond_number  # type: ignore
 
     def _match_30m_condition(self, is_in=True) -> bool:
         """做多30分钟线检测"""
@@ -260,9 +259,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             "ema60:{} 收盘:{} diffc_60:{} MACD:{}"
         )
         if close > e60 and macd > 0 and diffc_60 < 1.2:
-            self._set_klines_value(
-                self._30m_klines, kline.name, "l_condition", 1
-            )
+            self._store_condition(self._30m_klines, "l_condition", 1)
             content = log_str.format(
                 trade_time,
                 self.ts.symbol,
@@ -278,11 +275,8 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             self._set_open_condition(
                 kline, 1, self.ts.open_condition.minute_30_condition
             )  # type: ignore
-        else:
-            self._set_klines_value(
-                self._30m_klines, kline.name, "l_condition", 0
-            )
-        return self._30m_klines.loc[kline.name].l_condition  # type: ignore
+            return True
+        return self._store_condition(self._30m_klines, "l_condition", 0)  # type: ignore
 
     def _match_5m_condition(self, is_in=True) -> bool:
         """做多5分钟线检测"""
@@ -307,9 +301,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             "ema9:{} ema22:{} ema60:{} 收盘:{} diffc_60:{} MACD:{}"
         )
         if close > e60 and macd > 0 and diffc_60 < 1.2:
-            self._set_klines_value(
-                self._5m_klines, kline.name, "l_condition", 1
-            )
+            self._store_condition(self._5m_klines, "l_condition", 1)
             content = log_str.format(
                 trade_time,
                 self.ts.symbol,
@@ -326,11 +318,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
                 kline, 1, self.ts.open_condition.minute_5_condition
             )  # type: ignore
             return True
-        else:
-            self._set_klines_value(
-                self._5m_klines, kline.name, "l_condition", 0
-            )
-        return self._5m_klines.loc[kline.name, "l_condition"]  # type: ignore
+        return self._store_condition(self._5m_klines, "l_condition", 0)  # type: ignore
 
     def _has_match_stop_loss(self) -> bool:
         price = self._get_current_price()
@@ -354,7 +342,7 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
         elif d_c_id in [3, 4] and h_c_id == 3:
             s_c.take_profit_cond = 4
 
-    def _set_sold_prices(self, order: Order):
+    def _set_sold_prices(self, order: PendingOrder):
         s_c = self.ts.sold_condition
         s_c.stop_loss_price = self._calc_price(
             order.trade_price,
@@ -380,13 +368,46 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             f"止盈起始价为:{s_c.tp_started_point}"
         )
 
+    def _get_price_triggers(self) -> List[PriceTrigger]:
+        sc = self.ts.sold_condition
+        triggers = [PriceTrigger(
+            "止损", sc.stop_loss_price, LOWER, self._try_stop_loss)]
+        trade_price = self.ts.open_pos_info.trade_price
+        if not sc.has_enter_tp:
+            triggers.append(PriceTrigger(
+                "止盈起始", sc.tp_started_point, UPPER, self._try_take_profit))
+        elif sc.take_profit_cond in [1, 2, 3]:
+            if not sc.has_increase_slp and sc.take_profit_stage in [1, 2, 3]:
+                promote_price = self._calc_price(
+                    trade_price,
+                    self.config.f_info.long_config.promote_scale_1,
+                    True,
+                )
+                triggers.append(PriceTrigger(
+                    "提高止损", promote_price, UPPER, self._try_take_profit))
+        elif sc.take_profit_cond == 4 and sc.take_profit_stage == 2:
+            triggers.append(PriceTrigger(
+                "止盈剩余全部", self._calc_price(trade_price, 3.0, True),
+                UPPER, self._try_take_profit))
+        return triggers
+
+    def _get_unpriced_close_checks(self) -> List[Callable]:
+        sc = self.ts.sold_condition
+        if not sc.has_enter_tp:
+            return []
+        if sc.take_profit_cond in [1, 2, 3] and self._is_last_5m():
+            return [self._try_take_profit]
+        if sc.take_profit_cond == 4 and sc.take_profit_stage == 1:
+            return [self._try_take_profit]
+        return []
+
     def _try_improve_stop_loss(self) -> None:
         logger = self.logger
         price = self._get_current_price()
         trade_price = self.ts.open_pos_info.trade_price
         trade_config = self.config.f_info.long_config
         sc = self.ts.sold_condition
-        trade_time = tq_tools.get_date_str(self._get_trade_date())
+        trade_time = self._lazy_trade_date_str()
         log_str = "{} {} <做多> 现价{} 达到1:{} 盈亏比,将止损价提高至{}"
         promote_price = self._calc_price(
             trade_price, trade_config.promote_scale_1, True
@@ -401,7 +422,8 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             sc.has_increase_slp = True
             service.update_trade_status(self.ts, self._get_trade_date())
             logger.debug(
-                log_str.format(
+                LazyFormat(
+                    log_str,
                     trade_time,
                     self.symbol,
                     price,
@@ -417,22 +439,24 @@ class MainLongTradeStrategy(MainTradeStrategy, LongTradeStrategy):
             "{} {} <做多> 满足最后5分钟止盈 止盈条件:{} 当前价:{} "
             "日线EMA9:{} 日线EMA22:{} EMA60:{}"
         )
-        e9, e22, e60, _, _, _, trade_time, _, _ = self._get_indicators(kline)
+        e9, e22, e60, _, _, _, _, _, _ = self._get_indicators(kline)
         price = self._get_current_price()
-        trade_time = tq_tools.get_date_str(trade_time)
+        trade_time = self._lazy_trade_date_str()
         sc = self.ts.sold_condition
         if self._is_last_5m():
             if sc.take_profit_cond == 1 and price < e60 and e9 < e22:
                 logger.debug(
-                    log_str.format(
-                        trade_time, self.symbol, 1, price, e9, e22, e60
+                    LazyFormat(
+                        log_str, trade_time, self.symbol, 1, price, e9, e22,
+                        e60
                     )
                 )
                 return True
             elif sc.take_profit_cond in [2, 3] and price < e22 and e9 < e22:
                 logger.debug(
-                    log_str.format(
-                        trade_time, self.symbol, 2, price, e9, e22, e60
+                    LazyFormat(
+                        log_str, trade_time, self.symbol, 2, price, e9, e22,
+                        e60
                     )
                 )
                 return True
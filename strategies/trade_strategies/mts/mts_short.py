@@ -1,4 +1,4 @@
-from tqsdk2 import Order
+from typing import Callable, List
 
 import dao.trade.trade_service as service
 import strategies.tools as tools
@@ -6,11 +6,17 @@ import utils.tqsdk_tools as tq_tools
 from strategies.trade_strategies.mts.main_trade_strategy import (
     MainTradeStrategy,
 )
+from strategies.order_manager import PendingOrder
+from strategies.price_triggers import LOWER, UPPER, PriceTrigger
 from strategies.trade_strategies.trade_strategies import ShortTradeStrategy
+from utils.log_utils import Lazy, LazyFormat
 
 
 class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
-    def _try_take_profit(self) -> None:
+    # 上一次执行止盈判断时的日线 id 和止盈状态
+    _tp_checked_version = None
+
+    def _try_trend_take_profit(self) -> None:
         logger = self.logger
         symbol = self.ts.symbol
         kline = self._get_last_kline_in_trade(self._d_klines)
@@ -41,16 +47,19 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
                 for t_dk in dks:
                     t_macd = t_dk["MACD.close"]
                     if not tools.is_nline(t_dk) and t_macd > 0:
-                        order = self.closeout(1, "趋势止盈")
-                        content = log_str.format(
+                        # 委托单不会阻塞等待成交，日志记录平仓前的持仓手数
+                        pos = self.ts.carrying_volume
+                        self.closeout(1, "趋势止盈")
+                        content = LazyFormat(
+                            log_str,
                             trade_time,
                             symbol,
                             price,
-                            order.volume_orign,
+                            pos,
                             diff22_60,
                             close,
                             macd,
-                            tq_tools.get_date_str_short(t_dk.datetime),
+                            Lazy(tq_tools.get_date_str_short, t_dk.datetime),
                             t_macd,
                             t_dk.close,
                             t_dk.open,
@@ -58,7 +67,7 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
                         logger.debug(content)
                         return
                 self.ts.sold_condition.has_stop_tp = True
-                service.update_trade_status(self.ts, trade_time)  # type: ignore
+                service.update_trade_status(self.ts, self._get_trade_date())
 
     def _match_dk_condition(self, is_in=True) -> bool:
         logger = self.logger
@@ -89,22 +98,13 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             # logger.debug(f'kline column:{kline}')
             is_matched = not self._no_matched_open_cond()
             if is_matched:
-                self._set_klines_value(
-                    self._d_klines, kline.name, "s_condition", 1
-                )
+                self._store_condition(self._d_klines, "s_condition", 1)
                 logger.info(content)
                 self._set_open_condition(
                     kline, 1, self.ts.open_condition.daily_condition
                 )  # type: ignore
-            else:
-                self._set_klines_value(
-                    self._d_klines, kline.name, "s_condition", 0
-                )
-        else:
-            self._set_klines_value(
-                self._d_klines, kline.name, "s_condition", 0
-            )
-        return self._d_klines.loc[kline.name, "s_condition"]  # type: ignore
+                return True
+        return self._store_condition(self._d_klines, "s_condition", 0)  # type: ignore
 
     def _no_matched_open_cond(self) -> bool:
         # logger = self.logger
@@ -167,9 +167,7 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             and diffc_60 < 3
             and macd < 0
         ):
-            self._set_klines_value(
-                self._3h_klines, kline.name, "s_condition", 1
-            )
+            self._store_condition(self._3h_klines, "s_condition", 1)
             content = log_str.format(
                 trade_time,
                 self.ts.symbol,
@@ -188,11 +186,8 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             self._set_open_condition(
                 kline, 1, self.ts.open_condition.hourly_condition
             )  # type: ignore
-        else:
-            self._set_klines_value(
-                self._3h_klines, kline.name, "s_condition", 0
-            )
-        return self._3h_klines.loc[kline.name, "s_condition"]  # type: ignore
+            return True
+        return self._store_condition(self._3h_klines, "s_condition", 0)  # type: ignore
 
     def _match_30m_condition(self, is_in=True) -> bool:
         """做空30分钟线检测"""
@@ -225,9 +220,7 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             and e60 > close
             and self.is_within_2days()
         ):
-            self._set_klines_value(
-                self._30m_klines, kline.name, "s_condition", 1
-            )
+            self._store_condition(self._30m_klines, "s_condition", 1)
             content = log_str.format(
                 trade_time,
                 self.ts.symbol,
@@ -244,11 +237,8 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             self._set_open_condition(
                 kline, 1, self.ts.open_condition.minute_30_condition  # type: ignore
             )
-        else:
-            self._set_klines_value(
-                self._30m_klines, kline.name, "s_condition", 0
-            )
-        return self._30m_klines.loc[kline.name, "s_condition"]  # type: ignore
+            return True
+        return self._store_condition(self._30m_klines, "s_condition", 0)  # type: ignore
 
     def _match_5m_condition(self, is_in=True) -> bool:
         return True
@@ -262,7 +252,7 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
                 matched = True
         return matched
 
-    def _set_sold_prices(self, order: Order):
+    def _set_sold_prices(self, order: PendingOrder):
         s_c = self.ts.sold_condition
         s_c.stop_loss_price = self._calc_price(
             order.trade_price,
@@ -281,13 +271,46 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             f"止盈起始价为:{s_c.tp_started_point}"
         )
 
+    def _get_price_triggers(self) -> List[PriceTrigger]:
+        sc = self.ts.sold_condition
+        triggers = [PriceTrigger(
+            "止损", sc.stop_loss_price, UPPER, self._try_stop_loss)]
+        if not sc.has_increase_slp and sc.take_profit_stage == 0:
+            promote_price = self._calc_price(
+                self.ts.open_pos_info.trade_price,
+                self.config.f_info.short_config.promote_scale,
+                False,
+            )
+            triggers.append(PriceTrigger(
+                "提高止损", promote_price, LOWER, self._try_take_profit))
+        return triggers
+
+    def _get_unpriced_close_checks(self) -> List[Callable]:
+        """趋势止盈只依赖日线，日线或止盈状态变化后才需要重新判断"""
+        if self._get_tp_version() == self._tp_checked_version:
+            return []
+        return [self._try_take_profit]
+
+    def _get_tp_version(self) -> tuple:
+        return (self._d_klines["id"].iat[-2],
+                self.ts.sold_condition.has_stop_tp)
+
+    def _try_take_profit(self) -> None:
+        # 记录判断前的状态，判断改变了止盈状态时下一次行情更新需要再次判断
+        self._tp_checked_version = self._get_tp_version()
+        self._try_trend_take_profit()
+
+    def _set_open_pos_info(self, order: PendingOrder):
+        super()._set_open_pos_info(order)
+        self._tp_checked_version = None
+
     def _try_improve_stop_loss(self) -> None:
         logger = self.logger
         price = self._get_current_price()
         trade_price = self.ts.open_pos_info.trade_price
         trade_config = self.config.f_info.short_config
         sc = self.ts.sold_condition
-        trade_time = tq_tools.get_date_str(self._get_trade_date())
+        trade_time = self._lazy_trade_date_str()
         log_str = "{} {} <做空> 现价{} 达到1:{} 盈亏比,将止损价提高至{}"
         promote_price = self._calc_price(
             trade_price, trade_config.promote_scale, False
@@ -303,7 +326,8 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
             sc.has_increase_slp = True
             service.update_trade_status(self.ts, self._get_trade_date())
             logger.debug(
-                log_str.format(
+                LazyFormat(
+                    log_str,
                     trade_time,
                     self.symbol,
                     price,
@@ -316,14 +340,14 @@ class MainShortTradeStrategy(MainTradeStrategy, ShortTradeStrategy):
         logger = self.logger
         kline = self._get_last_kline_in_trade(self._d_klines)
         log_str = "{} {} <做空> 满足最后5分钟止盈,当前价:{} " "日线EMA9:{} 日线EMA22:{} MACD:{}"
-        e9, e22, _, macd, _, _, trade_time, _, _ = self._get_indicators(kline)
+        e9, e22, _, macd, _, _, _, _, _ = self._get_indicators(kline)
         price = self._get_current_price()
-        trade_time = tq_tools.get_date_str(trade_time)
+        trade_time = self._lazy_trade_date_str()
         if self._is_last_5m():
             if macd > 0 and price > e9:
                 logger.debug(
-                    log_str.format(
-                        trade_time, self.symbol, price, e9, e22, macd
+                    LazyFormat(
+                        log_str, trade_time, self.symbol, price, e9, e22, macd
                     )
                 )
                 return True
@@ -1,16 +1,20 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
 from math import ceil
+from typing import Callable, List, Optional, Tuple
 
 from pandas import DataFrame
-from tqsdk2 import Order, tafunc
 
 import dao.trade.trade_service as service
 import strategies.tools as tools
 import utils.tqsdk_tools as tq_tools
 from dao.odm.future_trade import TradeStatus
 from strategies.entity import StrategyConfig
+from strategies.order_manager import PendingOrder
+from strategies.price_triggers import PriceTrigger, price_trigger_index
 from utils.common_tools import LoggerGetter, get_china_date_from_str  # type: ignore
+from utils.latency import latency_recorder
+from utils.log_utils import Lazy
 
 
 class Strategy(ABC):
@@ -33,6 +37,10 @@ class Strategy(ABC):
     def execute_after_trade(self):
         pass
 
+    def reset_daily_status(self):
+        """新交易日开始前重置当日状态，回测中策略对象会跨交易日复用"""
+        pass
+
 
 class TradeStrategy(Strategy):
     """交易策略基类"""
@@ -43,14 +51,18 @@ class TradeStrategy(Strategy):
         self.symbol = symbol
         self.ts = self._get_trade_status(symbol)
         self.quote = self.api.get_quote(symbol)
+        # 正在进行中的开平仓委托，成交前不再进行新的交易判断
+        self._pending_order: Optional[PendingOrder] = None
+        # 同一合约同一策略之前登记的触发点属于已经替换的策略对象
+        price_trigger_index.remove(symbol, self._get_trigger_owner())
         self._d_klines = self.fetch_daily_klines()
-        self._3h_klines = self.api.get_kline_serial(
+        self._3h_klines = self.config.get_kline_serial(
             symbol, self.config.get3hK_Duration()
         )
-        self._30m_klines = self.api.get_kline_serial(
+        self._30m_klines = self.config.get_kline_serial(
             symbol, self.config.get30mK_Duration()
         )
-        self._5m_klines = config.api.get_kline_serial(
+        self._5m_klines = self.config.get_kline_serial(
             symbol, self.config.get5mK_Duration()
         )
         self.fill_indicators_by_type(1)
@@ -64,6 +76,8 @@ class TradeStrategy(Strategy):
 
     def execute_trade(self):
         """在交易期间，循环执行该方法尝试交易"""
+        if self.has_pending_order():
+            return
         self._trade_switch_symbol()
         if self.is_trading():
             self._try_close_pos()
@@ -75,19 +89,50 @@ class TradeStrategy(Strategy):
 
         当结束交易时，重新获取日线数据
         """
-        # 由于在staker中，每次交易结束后都会重新生成新的交易人，故此处不需要再次获取
+        # 回测中日线为天勤实时更新的序列，交易人跨交易日复用时也不需要再次获取
         # self.fetch_daily_klines()
 
-    def closeout(self, c_type: int, c_message: str) -> Order:
-        """全部平仓, 可以安全调用，不会重复平仓
+    def closeout(self, c_type: int, c_message: str) -> Optional[PendingOrder]:
+        """全部平仓, 可以安全调用，不会重复平仓，未下单时返回 None
 
         c_type: 0: 止损, 1: 止盈, 2: 换月, 3: 人工平仓
         """
         return self.close_pos(self.ts.carrying_volume, c_type, c_message)  # type: ignore
 
-    def open_pos(self, pos: int, o_message="") -> Order:
-        """进行开仓相关操作，并记录开仓信息，输出日志"""
-        order = self._trade_pos(pos, "OPEN")
+    def has_pending_order(self) -> bool:
+        """判断是否有尚未完成的开平仓委托"""
+        return (
+            self._pending_order is not None
+            and not self._pending_order.is_finished
+        )
+
+    def open_pos(self, pos: int, o_message="") -> PendingOrder:
+        """进行开仓，成交后记录开仓信息，输出日志"""
+        return self._trade_pos(pos, "OPEN", self._on_open_pos_finished)
+
+    def close_pos(
+        self,
+        pos: int,
+        c_type: int,
+        c_message: str,
+        on_closed: Optional[Callable[[PendingOrder], None]] = None,
+    ) -> Optional[PendingOrder]:
+        """根据数量进行平仓，成交后记录平仓信息，再调用 on_closed"""
+        order = None
+        if self.ts.trade_status == 1 and not self.has_pending_order():
+
+            def on_finished(order: PendingOrder):
+                order.close_volume = service.close_ops(
+                    self.ts, c_type, c_message, order
+                )
+                if on_closed is not None:
+                    on_closed(order)
+
+            order = self._trade_pos(pos, "CLOSE", on_finished)
+        return order  # type: ignore
+
+    def _on_open_pos_finished(self, order: PendingOrder):
+        """开仓成交后记录开仓信息，输出日志"""
         self._set_open_pos_info(order)
         self._store_open_pos_info(order)
         log_str = "{} {} {} 开仓 价格：{} 数量：{}"
@@ -105,21 +150,10 @@ class TradeStrategy(Strategy):
                 self.ts.custom_symbol,
                 self.ts.symbol,
                 bool(self._get_direction()),
-                pos,
+                order.volume_orign,
                 order.trade_price,
                 tq_tools.get_date_str(order.insert_date_time),
             )
-        return order
-
-    def close_pos(self, pos: int, c_type: int, c_message: str) -> Order:
-        """根据数量进行平仓，并记录平仓信息，输出日志"""
-        order = None
-        if self.ts.trade_status == 1:
-            order = self._trade_pos(pos, "CLOSE")
-            order.close_volume = service.close_ops(
-                self.ts, c_type, c_message, order
-            )
-        return order  # type: ignore
 
     def is_changing(self, k_type: int) -> bool:
         """判断是否有某个周期的K线正在发生改变
@@ -148,22 +182,22 @@ class TradeStrategy(Strategy):
             )
         return False
 
+    def get_watched_objects(self) -> Tuple[List, List]:
+        """返回该策略关注的行情对象和K线序列，用于交易调度"""
+        return [self.quote], [self._d_klines]
+
     def fetch_daily_klines(self) -> DataFrame:
         """获得日线序列, 由于天勤量化实盘中实时获取日线序列会导致错误，故需要特殊处理
 
         在实盘交易中，由于获取的是日线的拷贝数据。故当日线发生变化时，需要重新获取日线数据。
         """
         if self.config.is_backtest:
-            self._d_klines = self.api.get_kline_serial(
-                self.ts.symbol,
-                self.config.getDailyK_Duration(),
-                self.config.getKlineLength(),
+            self._d_klines = self.config.get_kline_serial(
+                self.ts.symbol, self.config.getDailyK_Duration()
             )
         else:
-            self._d_klines = self.api.get_kline_serial(
-                self.ts.symbol,
-                self.config.getDailyK_Duration(),
-                self.config.getKlineLength(),
+            self._d_klines = self.config.get_kline_serial(
+                self.ts.symbol, self.config.getDailyK_Duration()
             ).copy()
         return self._d_klines
 
@@ -171,38 +205,34 @@ class TradeStrategy(Strategy):
         record = service.get_switch_symbol_trade_record(self.ts)
         if record is not None:
             ovi = record.current_open_volume_info
-            order_c = self.close_pos(ovi.volume, 2, "换月平仓")
-            record.close_volume_info = order_c.close_volume
-            if record.next_need_open:
-                # TO-DO: 当需要换月开仓时，需要确定它的止盈止损条件，
-                # 但目前还无法确定，所以暂时不开仓，等待条件确定后在实现开仓逻辑
-                record.next_open_status = True
-            service.update_switch_symbol_trade_record(record)
-
-    def _trade_pos(self, pos: int, offset: str) -> Order:
+
+            def on_closed(order_c: PendingOrder):
+                record.close_volume_info = order_c.close_volume
+                if record.next_need_open:
+                    # TO-DO: 当需要换月开仓时，需要确定它的止盈止损条件，
+                    # 但目前还无法确定，所以暂时不开仓，等待条件确定后在实现开仓逻辑
+                    record.next_open_status = True
+                service.update_switch_symbol_trade_record(record)
+
+            self.close_pos(ovi.volume, 2, "换月平仓", on_closed)
+
+    def _trade_pos(
+        self,
+        pos: int,
+        offset: str,
+        on_finished: Callable[[PendingOrder], None],
+    ) -> PendingOrder:
         """和期货交易所进行期货交易
-        先尝试市价下单，如果不支持则将当前价格作为限价尝试下单"""
-        try:
-            order = self.api.insert_order(
-                symbol=self.ts.symbol,
-                direction=self._get_open_direction(),
-                offset=offset,
-                volume=pos,
-            )
-        except Exception:
-            order = self.api.insert_order(
-                symbol=self.ts.symbol,
-                direction=self._get_open_direction(),
-                offset=offset,
-                volume=pos,
-                limit_price=self._get_current_price(),
-            )
-        while True:
-            self.api.wait_update()
-            if order.status == "FINISHED":
-                break
-        service.store_tq_order(order)
-        return order
+
+        委托单交由委托单管理员跟踪，不等待成交，成交后调用 on_finished"""
+        self._pending_order = self.config.order_manager.submit(
+            self.ts.symbol,
+            self._get_open_direction(),
+            offset,
+            pos,
+            on_finished,
+        )
+        return self._pending_order
 
     def _calc_price(self, o_price: float, scale: float, is_up: bool) -> float:
         """根据给定价格和调整比例和调整方向计算最新价格
@@ -221,10 +251,8 @@ class TradeStrategy(Strategy):
             return round(o_price * (1 - self._get_base_scale() * scale), 2)
 
     def _is_last_5m(self) -> bool:
-        """判断是否是最后5分钟"""
-        t_time = tafunc.time_to_datetime(self.quote.datetime)
-        time_num = int(t_time.time().strftime("%H%M%S"))
-        return 150000 > time_num > 145500
+        """判断是否是日盘收盘前最后5分钟，如 14:55 至 15:00"""
+        return self.config.calendar.is_closing_window(self.quote.datetime, 300)
 
     def _has_dk_changed(self):
         """当日线生成新K线时返回True"""
@@ -246,6 +274,10 @@ class TradeStrategy(Strategy):
         """从天勤的报价对象中获取交易的当前时间"""
         return self._get_trade_date().strftime("%Y-%m-%d %H:%M:%S")
 
+    def _lazy_trade_date_str(self) -> Lazy:
+        """交易当前时间字符串，只在输出日志时才计算"""
+        return Lazy(self._get_trade_date_str)
+
     def _calc_open_pos(self, price) -> int:
         """计算开仓手数
 
@@ -263,15 +295,57 @@ class TradeStrategy(Strategy):
 
     def _try_close_pos(self):
         """交易的主要方法，负责判断是否满足平仓条件：当合约有持仓时，尝试止盈或止损
-        满足条件后平仓。"""
+        满足条件后平仓。
+
+        登记了价格触发点的策略只在价格到达触发点或有不依赖价格的判断时执行对应的判断
+        """
         if self.is_trading():
-            self._try_stop_loss()
-            self._try_take_profit()
+            due = self._get_due_close_checks()
+            if due is None or self._try_stop_loss in due:
+                with latency_recorder.span("stop_loss"):
+                    self._try_stop_loss()
+            # 已经止损下单时不再尝试止盈
+            if (due is None or self._try_take_profit in due) \
+                    and not self.has_pending_order():
+                with latency_recorder.span("take_profit"):
+                    self._try_take_profit()
+            if due:
+                # 判断可能改变了平仓条件，下一次行情更新时重新登记触发点
+                price_trigger_index.remove(
+                    self.symbol, self._get_trigger_owner())
+
+    def _get_due_close_checks(self) -> Optional[List[Callable]]:
+        """返回本次需要执行的平仓判断，没有登记价格触发点时返回 None，全部执行"""
+        owner = self._get_trigger_owner()
+        entry = price_trigger_index.get(self.symbol, owner)
+        if entry is None:
+            triggers = self._get_price_triggers()
+            if triggers is None:
+                return None
+            entry = price_trigger_index.register(self.symbol, owner, triggers)
+        due = [t.callback for t in price_trigger_index.fired(
+            entry, self._get_current_price())]
+        due.extend(self._get_unpriced_close_checks())
+        return due
+
+    def _get_price_triggers(self) -> Optional[List[PriceTrigger]]:
+        """根据平仓条件返回止损止盈的价格触发点，返回 None 时每次行情更新都执行全部判断"""
+        return None
+
+    def _get_unpriced_close_checks(self) -> List[Callable]:
+        """返回不依赖价格、本次需要执行的平仓判断，如收盘前5分钟止盈"""
+        return []
+
+    def _get_trigger_owner(self) -> str:
+        """同一合约上登记触发点的策略名称"""
+        return type(self).__name__
 
     def _try_open_pos(self):
         """交易的主要方法，负责判断是否满足开仓条件：当合约无持仓，且满足条件后开仓。"""
         if not self.is_trading():
-            if self._can_open_pos():
+            with latency_recorder.span("condition"):
+                can_open = self._can_open_pos()
+            if can_open:
                 try:
                     pos = self._calc_open_pos(self._get_current_price())
                     self.open_pos(pos)
@@ -294,13 +368,14 @@ class TradeStrategy(Strategy):
         """获取当前交易所交易价格"""
         return self.quote.last_price
 
-    def _set_open_pos_info(self, order: Order):
+    def _set_open_pos_info(self, order: PendingOrder):
         """设置开仓信息"""
         self._set_sold_condition()
         self._set_sold_prices(order)
+        price_trigger_index.remove(self.symbol, self._get_trigger_owner())
 
     @abstractmethod
-    def _store_open_pos_info(self, order: Order):
+    def _store_open_pos_info(self, order: PendingOrder):
         """存储开仓信息"""
 
     @abstractmethod
@@ -336,7 +411,7 @@ class TradeStrategy(Strategy):
         """设置平仓条件"""
 
     @abstractmethod
-    def _set_sold_prices(self, order: Order):
+    def _set_sold_prices(self, order: PendingOrder):
         """设置平仓价格"""
 
     @abstractmethod
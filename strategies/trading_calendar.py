@@ -0,0 +1,219 @@
+"""交易时段日历
+
+根据天勤 quote.trading_time 中的日盘/夜盘时段以及节假日预先生成每个交易日的交易时段，
+之后“是否在交易时段内 / 当日交易是否结束 / 下一次开盘时间”都只需在有序的时段列表中
+二分查找，不再每次调用 api.get_trading_status，也不依赖机器的墙上时间。
+
+时间统一使用东八区本地时间，内部以距 1970-01-01 00:00:00 的秒数表示。
+"""
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.common_tools import tz_utc_8
+
+_EPOCH = datetime(1970, 1, 1)
+_CHINA_OFFSET = 8 * 60 * 60
+# 每次生成的交易时段覆盖的自然日数量
+_BUILD_DAYS = 60
+
+TimeLike = Union[str, datetime, int, float]
+
+
+def _parse_clock(clock: str) -> int:
+    """将 09:00:00 或 25:30:00 (夜盘跨日) 形式的时间转换为当日秒数"""
+    hour, minute, second = (int(p) for p in clock.split(":"))
+    return hour * 3600 + minute * 60 + second
+
+
+def _get_sessions(trading_time, name: str) -> List[Tuple[int, int]]:
+    if isinstance(trading_time, dict):
+        sessions = trading_time.get(name) or []
+    else:
+        sessions = getattr(trading_time, name, None) or []
+    return [(_parse_clock(s), _parse_clock(e)) for s, e in sessions]
+
+
+def to_local_seconds(value: TimeLike) -> float:
+    """将行情时间转换为东八区本地秒数
+
+    支持 quote.datetime 字符串，datetime (带时区时先转换为东八区)，
+    以及K线中的纳秒时间戳。
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(tz_utc_8).replace(tzinfo=None)
+        return (value - _EPOCH).total_seconds()
+    return value / 1e9 + _CHINA_OFFSET
+
+
+class TradingCalendar:
+    """某个品种的交易时段日历
+
+    Args:
+        trading_time: quote.trading_time，包含 day 和 night 两组时段
+        holidays: 节假日，节假日不交易，节假日前一个交易日也没有夜盘
+    """
+
+    def __init__(self, trading_time, holidays: Iterable[date] = ()):
+        self._day = _get_sessions(trading_time, "day")
+        self._night = _get_sessions(trading_time, "night")
+        self._holidays = set(holidays)
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        # 对应时段是否是某交易日的最后一个时段(日盘收盘)
+        self._closings: List[bool] = []
+        # 对应时段所属的交易日
+        self._days: List[date] = []
+        self._first_day: Optional[date] = None
+        self._last_day: Optional[date] = None
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self._holidays
+
+    def is_in_session(self, value: TimeLike) -> bool:
+        """是否处于交易时段内"""
+        ts = to_local_seconds(value)
+        idx = self._locate(ts)
+        return idx >= 0 and ts < self._ends[idx]
+
+    def session_start(self, value: TimeLike) -> Optional[float]:
+        """处于交易时段内时返回该时段的开始时间(本地秒数)，否则返回 None"""
+        ts = to_local_seconds(value)
+        idx = self._locate(ts)
+        if idx >= 0 and ts < self._ends[idx]:
+            return self._starts[idx]
+        return None
+
+    def is_session_ended(self, value: TimeLike, delay: float = 0) -> bool:
+        """当日交易是否已经结束
+
+        当前不在交易时段内，最近结束的时段是日盘收盘时段，且已收盘 delay 秒以上
+        """
+        ts = to_local_seconds(value)
+        idx = self._locate(ts)
+        return (
+            idx >= 0
+            and ts >= self._ends[idx] + delay
+            and self._closings[idx]
+        )
+
+    def is_closing_window(self, value: TimeLike, seconds: float = 300) -> bool:
+        """是否处于日盘收盘前 seconds 秒内，如 14:55 至 15:00"""
+        ts = to_local_seconds(value)
+        idx = self._locate(ts)
+        return (
+            idx >= 0
+            and self._closings[idx]
+            and self._ends[idx] - seconds < ts < self._ends[idx]
+        )
+
+    def trading_day(self, value: TimeLike) -> date:
+        """返回时间所属的交易日，夜盘及收盘后的时间属于下一个交易日"""
+        ts = to_local_seconds(value)
+        idx = self._locate(ts)
+        if idx < 0 or ts >= self._ends[idx]:
+            idx = self._next_index(idx)
+        return self._days[idx]
+
+    def next_open(self, value: TimeLike) -> datetime:
+        """下一个交易时段的开盘时间(东八区本地时间)"""
+        ts = to_local_seconds(value)
+        idx = self._next_index(self._locate(ts))
+        return _EPOCH + timedelta(seconds=self._starts[idx])
+
+    def _next_index(self, idx: int) -> int:
+        while idx + 1 >= len(self._starts):
+            self._extend_to(self._last_day + timedelta(days=_BUILD_DAYS))
+        return idx + 1
+
+    def _locate(self, ts: float) -> int:
+        """返回开始时间不晚于 ts 的最后一个时段的位置"""
+        day = (_EPOCH + timedelta(seconds=ts)).date()
+        if self._first_day is None:
+            self._build(
+                day - timedelta(days=7), day + timedelta(days=_BUILD_DAYS)
+            )
+        elif day - timedelta(days=7) < self._first_day:
+            self._build(day - timedelta(days=7), self._last_day)
+        elif day + timedelta(days=7) > self._last_day:
+            self._extend_to(day + timedelta(days=_BUILD_DAYS))
+        return bisect_right(self._starts, ts) - 1
+
+    def _extend_to(self, last_day: date):
+        self._build(self._first_day, last_day)
+
+    def _build(self, first_day: date, last_day: date):
+        """生成 [first_day, last_day] 之间所有交易日的交易时段"""
+        sessions: Dict[float, Tuple[float, bool, date]] = {}
+        day = first_day
+        prev_trading_day = self._prev_trading_day(first_day)
+        while day <= last_day:
+            if self.is_trading_day(day):
+                self._add_trading_day(sessions, day, prev_trading_day)
+                prev_trading_day = day
+            day += timedelta(days=1)
+        starts = sorted(sessions)
+        self._starts = starts
+        self._ends = [sessions[s][0] for s in starts]
+        self._closings = [sessions[s][1] for s in starts]
+        self._days = [sessions[s][2] for s in starts]
+        self._first_day, self._last_day = first_day, last_day
+
+    def _prev_trading_day(self, day: date) -> date:
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def _add_trading_day(self,
+                         sessions: Dict[float, Tuple[float, bool, date]],
+                         day: date, prev_trading_day: date):
+        # 夜盘在上一个交易日晚上进行，两者之间有节假日时没有夜盘
+        gap = (prev_trading_day + timedelta(days=i)
+               for i in range(1, (day - prev_trading_day).days))
+        if not any(d in self._holidays for d in gap):
+            base = self._day_seconds(prev_trading_day)
+            for start, end in self._night:
+                sessions[base + start] = (base + end, False, day)
+        base = self._day_seconds(day)
+        for i, (start, end) in enumerate(self._day):
+            closing = i == len(self._day) - 1
+            sessions[base + start] = (base + end, closing, day)
+
+    @staticmethod
+    def _day_seconds(day: date) -> float:
+        return (datetime.combine(day, time()) - _EPOCH).total_seconds()
+
+
+class CalendarRegistry:
+    """按交易时段共享交易日历，交易时段相同的品种使用同一个日历"""
+
+    def __init__(self, holidays: Iterable[date] = ()):
+        self._holidays: Tuple[date, ...] = ()
+        self._calendars: Dict[tuple, TradingCalendar] = {}
+        self.set_holidays(holidays)
+
+    def set_holidays(self, holidays: Iterable[Union[date, datetime]]):
+        """设置交易所节假日，已生成的日历作废
+
+        节假日来自交易配置，数据库中保存为 datetime，这里统一转换为日期
+        """
+        self._holidays = tuple(
+            d.date() if isinstance(d, datetime) else d for d in holidays)
+        self._calendars.clear()
+
+    def get_calendar(self, trading_time) -> TradingCalendar:
+        key = (
+            tuple(_get_sessions(trading_time, "day")),
+            tuple(_get_sessions(trading_time, "night")),
+        )
+        if key not in self._calendars:
+            self._calendars[key] = TradingCalendar(
+                trading_time, self._holidays)
+        return self._calendars[key]
+
+
+calendar_registry = CalendarRegistry()
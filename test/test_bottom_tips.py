@@ -0,0 +1,60 @@
+from datetime import date, datetime
+
+import dao.trade.bottom_trade_dao as bdao
+import dao.trade.trade_service as service
+from dao.odm.future_trade import BottomOpenVolumeTip
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        latest = {}
+        for row in sorted(self.rows, key=lambda r: r["dkline_time"],
+                          reverse=True):
+            latest.setdefault((row["symbol"], row["direction"]), row)
+        return [{"_id": k, "tip": v} for k, v in latest.items()]
+
+
+def _tip(symbol, direction, day):
+    return {"_id": f"{symbol}{direction}{day}", "custom_symbol": "c",
+            "symbol": symbol, "direction": direction, "need_trade": True,
+            "dkline_time": datetime(2023, 7, day)}
+
+
+class TestClass:
+    def test_latest_tips_in_one_query(self, monkeypatch):
+        collection = FakeCollection([
+            _tip("SHFE.rb2401", 1, 25), _tip("SHFE.rb2401", 1, 26),
+            _tip("DCE.m2401", 0, 26), _tip("DCE.c2401", 1, 24),
+        ])
+        monkeypatch.setattr(BottomOpenVolumeTip, "_get_collection",
+                            classmethod(lambda cls: collection))
+        tips = bdao.getLatestTips()
+        assert len(collection.pipelines) == 1
+        # 只保留最近一批提示
+        assert sorted(tips) == [("DCE.m2401", 0), ("SHFE.rb2401", 1)]
+        assert tips[("SHFE.rb2401", 1)].dkline_time.day == 26
+
+    def test_cache_by_trading_day(self, monkeypatch):
+        calls = []
+
+        def get_latest_tips():
+            calls.append(1)
+            return {("SHFE.rb2401", 1): "tip"}
+
+        monkeypatch.setattr(bdao, "getLatestTips", get_latest_tips)
+        monkeypatch.setattr(service, "_latest_tips",
+                            service._LatestTipCache())
+        day = date(2023, 7, 26)
+        assert service.get_last_bottom_tips_by_symbol(
+            "SHFE.rb2401", 1, day) == "tip"
+        assert service.get_last_bottom_tips_by_symbol(
+            "DCE.m2401", 1, day) is None
+        assert len(calls) == 1
+        service.get_last_bottom_tips_by_symbol(
+            "SHFE.rb2401", 1, date(2023, 7, 27))
+        assert len(calls) == 2
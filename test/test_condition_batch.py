@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import strategies.tools as tools
+from strategies.trade_strategies.mts.condition_batch import ConditionBatch
+from strategies.trade_strategies.mts.mts_long import MainLongTradeStrategy
+from strategies.trade_strategies.mts.mts_short import MainShortTradeStrategy
+
+FRAMES = ("_d_klines", "_3h_klines", "_30m_klines", "_5m_klines")
+
+
+def _klines(count, seed):
+    rng = np.random.default_rng(seed)
+    close = np.round(3000 * np.exp(np.cumsum(rng.normal(0, 0.006, count))), 1)
+    open_p = np.round(close * (1 + rng.normal(0, 0.004, count)), 1)
+    klines = pd.DataFrame({
+        "id": np.arange(count, dtype=float),
+        "datetime": (1672707600 + np.arange(count) * 1800) * 1e9,
+        "open": open_p,
+        "high": np.maximum(open_p, close) + 2,
+        "low": np.minimum(open_p, close) - 2,
+        "close": close,
+        "volume": np.full(count, 100.0),
+    })
+    tools.fill_main_indicators(klines)
+    return klines
+
+
+def _strategy(cls):
+    """不连接数据库和天勤，只设置条件判断用到的属性"""
+    strategy = cls.__new__(cls)
+    strategy.symbol = "DCE.a2309"
+    strategy.quote = SimpleNamespace(datetime="2023-01-03 09:00:00.000000")
+    open_condition = SimpleNamespace(**{
+        name: SimpleNamespace()
+        for name in ("daily_condition", "hourly_condition",
+                     "minute_30_condition", "minute_5_condition")
+    })
+    strategy.ts = SimpleNamespace(symbol="DCE.a2309", trade_status=0,
+                                  open_condition=open_condition)
+    return strategy
+
+
+class FakeMJ:
+    def __init__(self, strategies):
+        self.strategies = strategies
+
+    def prepare_open_candidates(self):
+        return self.strategies
+
+
+def _twins(count, seed):
+    """生成两组相同的交易策略，K线为同一组序列上随机位置截取的窗口"""
+    rng = np.random.default_rng(seed)
+    series = [_klines(300, s) for s in range(4)]
+    batched, scalar = [], []
+    for i in range(count):
+        cls = MainLongTradeStrategy if i % 2 else MainShortTradeStrategy
+        a, b = _strategy(cls), _strategy(cls)
+        for attr, klines in zip(FRAMES, series):
+            end = int(rng.integers(62, len(klines)))
+            setattr(a, attr, klines.iloc[end - 60:end].reset_index(drop=True))
+            setattr(b, attr, getattr(a, attr).copy())
+        flag = bool(rng.random() < 0.5)
+        for s in (a, b):
+            s._match_3hk_c2_distance = lambda flag=flag: flag
+            s.is_within_2days = lambda flag=flag: flag
+        batched.append(a)
+        scalar.append(b)
+    return batched, scalar
+
+
+def _cached(strategy, column):
+    return [getattr(strategy, attr)[column].iat[-2]
+            if column in getattr(strategy, attr).columns else np.nan
+            for attr in FRAMES]
+
+
+def _open_condition(strategy):
+    return {name: vars(value)
+            for name, value in vars(strategy.ts.open_condition).items()}
+
+
+class TestClass:
+    def test_prefill_matches_scalar_cascade(self):
+        batched, scalar = _twins(200, 0)
+        batch = ConditionBatch()
+        excluded = batch.prefill([FakeMJ(batched[:100]),
+                                  FakeMJ(batched[100:])])
+        assert batch.stats()["excluded"] == excluded > 0
+        passed_daily = 0
+        for a, b in zip(batched, scalar):
+            column = ("l_condition" if isinstance(a, MainLongTradeStrategy)
+                      else "s_condition")
+            assert a._can_open_pos() == b._can_open_pos()
+            cached = _cached(a, column)
+            np.testing.assert_array_equal(cached, _cached(b, column))
+            assert _open_condition(a) == _open_condition(b)
+            passed_daily += bool(cached[0])
+        # 满足日线条件的合约由逐根判断输出日志并记录开仓条件
+        assert passed_daily > 0
+
+    def test_cached_conditions_not_evaluated_again(self):
+        batched, _ = _twins(20, 1)
+        batch = ConditionBatch()
+        batch.prefill([FakeMJ(batched)])
+        evaluated = batch.stats()["evaluated"]
+        assert evaluated >= len(batched)
+        # 已缓存的K线不再判断，之前不满足的合约也不会再次排除
+        assert batch.prefill([FakeMJ(batched)]) == 0
+        assert batch.stats()["evaluated"] <= evaluated + len(batched)
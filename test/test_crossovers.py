@@ -0,0 +1,145 @@
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import strategies.tools as tools
+from strategies.crossovers import CrossIndexCache, cross_index_cache
+from strategies.trade_strategies.bts.bottom_trade_strategy import (
+    BottomTradeStrategy,
+)
+from strategies.trade_strategies.mts.main_trade_strategy import (
+    MainTradeStrategy,
+)
+
+_NS = 1_000_000_000
+
+
+def _klines(count, seed, duration=30 * 60):
+    rng = np.random.default_rng(seed)
+    close = np.round(3000 * np.exp(np.cumsum(rng.normal(0, 0.01, count))), 1)
+    return pd.DataFrame({
+        "id": np.arange(count, dtype=float) + 1000,
+        "datetime": (1672707600 + np.arange(count) * duration) * float(_NS),
+        "open": close,
+        "high": close + 5,
+        "low": close - 5,
+        "close": close,
+        "volume": np.full(count, 100.0),
+    })
+
+
+def _windows(seed, slides=30):
+    """按天勤K线窗口的方式逐根滑动，每个窗口都重新计算指标"""
+    history = _klines(200 + slides, seed)
+    for begin in range(slides):
+        window = history.iloc[begin:begin + 200].reset_index(drop=True)
+        tools.fill_main_indicators(window)
+        tools.fill_bottom_indicators(window)
+        yield window
+
+
+class FakeStrategy:
+    logger = logging.getLogger(__name__)
+    symbol = "DCE.a2309"
+    config = SimpleNamespace(get3hK_Duration=lambda: 3 * 60 * 60,
+                             get30mK_Duration=lambda: 30 * 60)
+    _get_30m_cross_kline = MainTradeStrategy._get_30m_cross_kline
+    _get_3hk_cross_ids = MainTradeStrategy._get_3hk_cross_ids
+    _get_last_below_e60 = BottomTradeStrategy._get_last_below_e60
+
+    def __init__(self, klines, d_klines):
+        self._3h_klines = klines
+        self._30m_klines = klines
+        self._d_klines = d_klines
+
+
+def _old_3hk_cross_ids(klines):
+    """改为交叉索引之前的 iterrows 实现"""
+    k1, k2 = 0, 0
+    is_done_1 = False
+    for _, kline in klines.iloc[::-1].iterrows():
+        if not is_done_1 and kline.ema22 <= kline.ema60:
+            k1 = kline.id
+            is_done_1 = True
+        if kline.ema9 <= kline.ema60:
+            k2 = kline.id
+            break
+    return k1, k2
+
+
+def _old_30m_cross_kline(klines, d_klines):
+    l30m_kline = d_klines.iloc[-9]
+    for i, temp_kline in klines.iloc[::-1].iterrows():
+        if temp_kline.close >= temp_kline.ema60:
+            if i == 199:
+                break
+            t30m_kline = klines.iloc[i + 1]
+            if t30m_kline.ema22 > t30m_kline.ema60:
+                l30m_kline = t30m_kline
+                break
+    return l30m_kline
+
+
+def _old_wanted_kline(klines, before):
+    m30_klines = klines[klines.datetime < before].iloc[::-1]
+    wanted_kline = m30_klines.iloc[-10]
+    for i, t_kline in m30_klines.iterrows():
+        if t_kline.close <= t_kline.ema60 or t_kline.ema5 <= t_kline.ema60:
+            wanted_kline = klines.iloc[i + 1]
+            break
+    return wanted_kline
+
+
+class TestClass:
+    def test_last_true_matches_brute_force(self):
+        rng = np.random.default_rng(1)
+        cache = CrossIndexCache()
+        for trial in range(200):
+            n = int(rng.integers(2, 40))
+            states = rng.random(n) < rng.random()
+            ids = np.arange(n, dtype=float) + trial
+            for upto in range(n):
+                expected = np.flatnonzero(states[:upto + 1])
+                expected = expected[-1] if len(expected) else -1
+                got = cache.last_true("k", ids, lambda lo, hi: states[lo:hi],
+                                      upto)
+                assert got == expected
+        assert cache.stats()["misses"] == 200
+
+    def test_index_rebuilt_only_when_window_slides(self):
+        cache = CrossIndexCache()
+        states = np.array([True, False, False, True, False])
+        ids = np.arange(5, dtype=float)
+        calls = []
+
+        def state(lo, hi):
+            calls.append((lo, hi))
+            return states[lo:hi]
+
+        assert cache.last_true("k", ids, state, 4) == 3
+        # 最后一根K线变化时只重新计算最后一根
+        states[4] = True
+        assert cache.last_true("k", ids, state, 4) == 4
+        assert cache.last_true("k", ids, state, 2) == 0
+        assert calls == [(4, 5), (0, 4), (4, 5)]
+        assert cache.last_true("k", ids + 1, state, 3) == 3
+        assert calls[-1] == (0, 4)
+
+    def test_strategy_lookups_match_iterrows(self):
+        cross_index_cache.reset()
+        d_klines = _klines(200, 99, 24 * 60 * 60)
+        for seed in range(4):
+            for klines in _windows(seed):
+                fake = FakeStrategy(klines, d_klines)
+                assert fake._get_3hk_cross_ids() == _old_3hk_cross_ids(klines)
+                kline, _, _ = fake._get_30m_cross_kline()
+                assert kline.equals(_old_30m_cross_kline(klines, d_klines))
+                for pos in (20, 120, 198, 199):
+                    before = klines.datetime.iloc[pos]
+                    expected = _old_wanted_kline(klines, before)
+                    i = fake._get_last_below_e60(before)
+                    wanted = klines.iloc[i + 1] if i >= 0 else klines.iloc[9]
+                    assert wanted.equals(expected)
+        assert cross_index_cache.stats()["hits"] > 0
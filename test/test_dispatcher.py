@@ -0,0 +1,78 @@
+import pandas as pd
+
+from exe_departments.dispatcher import TradeDispatcher
+
+
+class FakeApi:
+    def __init__(self):
+        self.changed = set()
+
+    def is_changing(self, obj, key=None):
+        return id(obj) in self.changed or (
+            isinstance(obj, pd.Series) and obj["datetime"] in self.changed)
+
+
+class FakeTrader:
+    def __init__(self, quotes, serials):
+        self._watched = (quotes, serials)
+
+    def get_watched_objects(self):
+        return self._watched
+
+
+class TestClass:
+    def test_only_owners_of_changed_objects_are_woken(self):
+        api = FakeApi()
+        rb_quote, m_quote, shared_quote = object(), object(), object()
+        serial = pd.DataFrame({"datetime": [1.0, 2.0]})
+        rb = FakeTrader([rb_quote, shared_quote], [])
+        m = FakeTrader([m_quote, shared_quote], [serial])
+        dispatcher = TradeDispatcher(api, heartbeat=3600)
+        dispatcher.register([rb, m])
+        assert dispatcher.dispatch([rb, m]) == []
+        api.changed = {id(rb_quote)}
+        assert dispatcher.dispatch([rb, m]) == [rb]
+        api.changed = {id(shared_quote)}
+        assert dispatcher.dispatch([rb, m]) == [rb, m]
+        api.changed = {2.0}
+        assert dispatcher.dispatch([rb, m]) == [m]
+        stats = dispatcher.stats()
+        assert stats["quotes"] == 3
+        assert stats["iterations"] == 4
+        assert stats["max_woken"] == 2
+
+    def test_heartbeat_wakes_all_traders(self):
+        trader = FakeTrader([object()], [])
+        dispatcher = TradeDispatcher(FakeApi(), heartbeat=0)
+        dispatcher.register([trader])
+        assert dispatcher.dispatch([trader]) == [trader]
+
+    def test_refresh_registers_new_strategy_objects(self):
+        api = FakeApi()
+        old_quote, new_quote, shared_quote = object(), object(), object()
+        rb = FakeTrader([old_quote, shared_quote], [])
+        m = FakeTrader([shared_quote], [])
+        dispatcher = TradeDispatcher(api, heartbeat=3600)
+        dispatcher.register([rb, m])
+        # 交易中创建下一合约策略或换月，交易人关注的对象发生变化
+        rb._watched = ([new_quote, shared_quote], [])
+        dispatcher.refresh(rb)
+        api.changed = {id(new_quote)}
+        assert dispatcher.dispatch([rb, m]) == [rb]
+        api.changed = {id(old_quote)}
+        assert dispatcher.dispatch([rb, m]) == []
+        api.changed = {id(shared_quote)}
+        assert dispatcher.dispatch([rb, m]) == [rb, m]
+        assert dispatcher.stats()["quotes"] == 2
+
+    def test_heartbeat_uses_injected_clock(self):
+        now = [1000.0]
+        trader = FakeTrader([object()], [])
+        dispatcher = TradeDispatcher(FakeApi(), heartbeat=60,
+                                     clock=lambda: now[0])
+        dispatcher.register([trader])
+        assert dispatcher.dispatch([trader]) == []
+        now[0] += 59
+        assert dispatcher.dispatch([trader]) == []
+        now[0] += 1
+        assert dispatcher.dispatch([trader]) == [trader]
@@ -0,0 +1,73 @@
+"""使用本地 mongod 检查交易数据查询的执行计划，没有可用的 mongod 时跳过"""
+import uuid
+from datetime import datetime
+
+import pytest
+from mongoengine import connect, disconnect
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import dao.indexes as indexes
+from dao.odm.future_trade import (
+    BottomOpenVolume,
+    BottomOpenVolumeTip,
+    BottomTradeStatus,
+    MainJointSymbolStatus,
+    MainOpenVolume,
+    MainTradeStatus,
+    SwitchSymbolTradeRecord,
+)
+
+MONGO_URL = "mongodb://localhost:27017/"
+
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("没有可用的本地 mongod")
+    db_name = f"test_{uuid.uuid4().hex}"
+    connect(host=f"{MONGO_URL}{db_name}")
+    indexes.ensure_indexes()
+    yield db_name
+    disconnect()
+    client.drop_database(db_name)
+
+
+def _stages(plan):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+QUERIES = {
+    "main_open_volume": lambda: MainOpenVolume.objects(
+        symbol="SHFE.rb2401", direction=1),
+    "bottom_open_volume": lambda: BottomOpenVolume.objects(
+        symbol="SHFE.rb2401", direction=1),
+    "main_trade_status": lambda: MainTradeStatus.objects(
+        symbol="SHFE.rb2401", direction=1),
+    "bottom_status_by_custom_symbol": lambda: BottomTradeStatus.objects(
+        custom_symbol="KQ.m@SHFE.rb"),
+    "mj_status": lambda: MainJointSymbolStatus.objects(
+        custom_symbol="KQ.m@SHFE.rb"),
+    "switch_record": lambda: SwitchSymbolTradeRecord.objects(
+        custom_symbol="KQ.m@SHFE.rb", current_symbol="SHFE.rb2401",
+        current_close_status=False),
+    "last_tip": lambda: BottomOpenVolumeTip.objects().limit(1),
+    "tips_in_7_days": lambda: BottomOpenVolumeTip.objects(
+        symbol="SHFE.rb2401", direction=1,
+        dkline_time__gte=datetime(2023, 7, 1)),
+}
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_uses_index(db, name):
+    plan = QUERIES[name]().explain()["queryPlanner"]["winningPlan"]
+    stages = list(_stages(plan))
+    assert "COLLSCAN" not in stages, f"{name}: {stages}"
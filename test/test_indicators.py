@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+import strategies.tools as tools
+from strategies.indicators import IndicatorCache, IndicatorEngine
+
+MAIN_COLUMNS = ["ema9", "ema22", "ema60", "MACD.close", "MACD.high",
+                "MACD.low"]
+
+
+def _make_history(size: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 3000 + np.cumsum(rng.normal(0, 15, size))
+
+
+def _window(closes: np.ndarray, end: int, length: int = 200) -> pd.DataFrame:
+    start = end - length
+    return pd.DataFrame({
+        "id": np.arange(start, end, dtype=float),
+        "close": closes[start:end].copy(),
+    })
+
+
+def _assert_same(klines: pd.DataFrame, expected: pd.DataFrame):
+    for column in MAIN_COLUMNS:
+        np.testing.assert_array_equal(
+            klines[column].to_numpy(), expected[column].to_numpy())
+    np.testing.assert_allclose(klines["diff"], expected["diff"], atol=1e-8)
+    np.testing.assert_allclose(klines["dea"], expected["dea"], atol=1e-8)
+
+
+def test_incremental_matches_full_calculation():
+    closes = _make_history(700)
+    engine = IndicatorEngine((9, 22, 60))
+    end = 200
+    while end < len(closes):
+        klines = _window(closes, end)
+        # 正在生成的K线价格在变化
+        klines.loc[klines.index[-1], "close"] += 3.5
+        engine.fill(("SHFE.rb2401", 300), klines)
+        expected = _window(closes, end)
+        expected.loc[expected.index[-1], "close"] += 3.5
+        tools.fill_main_indicators(expected)
+        _assert_same(klines, expected)
+        end += 1 if end % 5 else 2
+
+
+def test_forming_bar_update_matches_full_calculation():
+    closes = _make_history(260, seed=11)
+    engine = IndicatorEngine((9, 22, 60))
+    klines = _window(closes, 250)
+    engine.fill("key", klines)
+    for price in (2990.0, 3010.5, 3005.25):
+        klines.loc[klines.index[-1], "close"] = price
+        engine.fill("key", klines)
+        expected = klines[["id", "close"]].copy()
+        tools.fill_main_indicators(expected)
+        _assert_same(klines, expected)
+
+
+def test_short_history_uses_full_calculation():
+    closes = _make_history(120, seed=3)
+    klines = _window(np.concatenate((np.full(80, np.nan), closes)), 200)
+    expected = klines.copy()
+    tools.fill_bottom_indicators(klines, ("DCE.m2401", 86400))
+    tools.fill_bottom_indicators(expected)
+    for column in ["ema5", "ema20", "ema60", "MACD.close"]:
+        np.testing.assert_array_equal(
+            klines[column].to_numpy(), expected[column].to_numpy())
+
+
+def test_cache_shares_result_between_subscribers():
+    closes = _make_history(240, seed=5)
+    cache = IndicatorCache()
+    key = ("DCE.i2401", 1800)
+    long_klines = _window(closes, 220)
+    short_klines = _window(closes, 220)
+    cache.fill("main", key, long_klines)
+    cache.fill("main", key, short_klines)
+    cache.fill("main", key, long_klines)
+    assert cache.hits == 2
+    assert cache.misses == 1
+    _assert_same(short_klines, long_klines)
+    cache.fill("bottom", key, short_klines)
+    next_klines = _window(closes, 221)
+    cache.fill("main", key, next_klines)
+    assert cache.stats() == {"hits": 2, "misses": 3, "entries": 2}
+    expected = _window(closes, 221)
+    tools.fill_main_indicators(expected)
+    _assert_same(next_klines, expected)
@@ -0,0 +1,99 @@
+import pytest
+from mongoengine import disconnect
+from mongoengine.connection import get_db
+
+from dao.storage import connect_storage
+from dao.trade.journal import TradeJournal
+
+
+@pytest.fixture
+def memory_db():
+    connect_storage("memory", "", "journal_test")
+    yield get_db()
+    disconnect()
+
+
+class TestClass:
+    def test_reopen_restores_state(self, tmp_path):
+        journal = TradeJournal()
+        journal.open(str(tmp_path))
+        journal.record("open", "main_trade_status", 1,
+                       {"stop_loss_price": 10.0, "trade_status": 1}, {})
+        journal.record("update", "main_trade_status", 1,
+                       {"stop_loss_price": 12.0}, {"trade_status": 1})
+        journal.record_delete("rollover", "bottom_trade_status", 2)
+        journal.close()
+
+        reopened = TradeJournal()
+        reopened.open(str(tmp_path))
+        assert reopened.state[("main_trade_status", "1")] == {
+            "id": 1, "set": {"stop_loss_price": 12.0},
+            "unset": {"trade_status": 1}}
+        assert reopened.state[("bottom_trade_status", "2")]["deleted"]
+        reopened.close()
+
+    def test_corrupt_tail_is_ignored(self, tmp_path):
+        journal = TradeJournal()
+        journal.open(str(tmp_path))
+        journal.record("update", "c", 1, {"a": 1}, {})
+        end = journal._end
+        journal.record("update", "c", 1, {"a": 2}, {})
+        # 模拟写入中断，第二条记录内容损坏
+        journal._map[end + 20] ^= 0xFF
+        journal.close()
+
+        reopened = TradeJournal()
+        reopened.open(str(tmp_path))
+        assert reopened.state[("c", "1")]["set"] == {"a": 1}
+        # 新记录从损坏位置开始覆盖
+        reopened.record("update", "c", 1, {"a": 3}, {})
+        reopened.close()
+        reopened.open(str(tmp_path))
+        assert reopened.state[("c", "1")]["set"] == {"a": 3}
+        reopened.close()
+
+    def test_snapshot_resets_journal(self, tmp_path):
+        journal = TradeJournal(snapshot_interval=2)
+        journal.open(str(tmp_path))
+        journal.record("update", "c", 1, {"a": 1}, {})
+        journal.record("update", "c", 2, {"b": 1}, {})
+        assert journal._end == 0
+        journal.record("update", "c", 1, {"a": 2}, {})
+        journal.close()
+
+        reopened = TradeJournal()
+        reopened.open(str(tmp_path))
+        assert reopened._count == 1
+        assert reopened.state[("c", "1")]["set"] == {"a": 2}
+        assert reopened.state[("c", "2")]["set"] == {"b": 1}
+        reopened.close()
+
+    def test_growth_beyond_initial_size(self, tmp_path):
+        journal = TradeJournal(snapshot_interval=10000)
+        journal.open(str(tmp_path))
+        for i in range(3000):
+            journal.record("update", "c", i, {"note": "x" * 500}, {})
+        journal.close()
+        journal.open(str(tmp_path))
+        assert len(journal.state) == 3000
+        journal.close()
+
+    def test_recover(self, memory_db, tmp_path):
+        memory_db["main_trade_status"].insert_many([
+            {"_id": 1, "stop_loss_price": 10.0, "trade_status": 1},
+            {"_id": 2, "stop_loss_price": 20.0},
+        ])
+        journal = TradeJournal()
+        journal.open(str(tmp_path))
+        journal.record("update", "main_trade_status", 1,
+                       {"stop_loss_price": 12.0}, {"trade_status": 1})
+        journal.record_delete("rollover", "main_trade_status", 2)
+        assert journal.recover() == 2
+        # 恢复完成后设置检查点，再次打开时不再重放
+        assert journal.recover() == 0
+        journal.close()
+        journal.open(str(tmp_path))
+        assert journal.state == {}
+        journal.close()
+        docs = list(memory_db["main_trade_status"].find())
+        assert docs == [{"_id": 1, "stop_loss_price": 12.0}]
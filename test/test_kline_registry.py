@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from replay.data_source import ReplayDataSource
+from replay.kline_store import KLINE_COLUMNS, KlineStore
+from strategies.kline_registry import KlineRegistry
+
+
+class FakeApi:
+    def __init__(self):
+        self.calls = []
+
+    def get_kline_serial(self, symbol, duration, data_length=200):
+        self.calls.append((symbol, duration, data_length))
+        return {"symbol": symbol, "duration": duration, "len": data_length}
+
+
+class TestClass:
+    def test_share_serial_by_symbol_and_duration(self):
+        api = FakeApi()
+        registry = KlineRegistry(api)
+        d1 = registry.get_kline_serial("SHFE.rb2401", 86400)
+        d2 = registry.get_kline_serial("SHFE.rb2401", 86400, 1)
+        m5 = registry.get_kline_serial("SHFE.rb2401", 300)
+        assert d1 is d2
+        assert m5 is not d1
+        assert registry.subscription_count() == 2
+        assert len(api.calls) == 2
+
+    def test_resubscribe_with_longer_length(self):
+        api = FakeApi()
+        registry = KlineRegistry(api)
+        registry.get_kline_serial("DCE.m2401", 1800)
+        longer = registry.get_kline_serial("DCE.m2401", 1800, 500)
+        assert longer["len"] == 500
+        assert registry.get_kline_serial("DCE.m2401", 1800) is longer
+        assert registry.stats() == {"subscriptions": 1, "requests": 3}
+
+    def test_save_completed_bars_to_store(self, tmp_path):
+        klines = pd.DataFrame({c: np.arange(5.0) for c in KLINE_COLUMNS})
+        klines["datetime"] = np.arange(5) * 300 * 10**9
+        api = FakeApi()
+        api.get_kline_serial = lambda symbol, duration, length: klines
+        store = KlineStore(str(tmp_path))
+        registry = KlineRegistry(api, store=store)
+        registry.get_kline_serial("DCE.m2401", 300)
+        assert registry.save_to_store() == 4
+        assert registry.save_to_store() == 0
+        columns = ReplayDataSource(str(tmp_path)).get_columns("DCE.m2401", 300)
+        np.testing.assert_array_equal(columns["close"], np.arange(4.0))
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from replay.kline_store import KlineStore
+
+SYMBOL = "DCE.m2401"
+START_NS = 1690333200 * 10**9
+
+
+def _klines(start: int, count: int) -> pd.DataFrame:
+    ids = np.arange(start, start + count)
+    return pd.DataFrame({
+        "datetime": START_NS + ids * 300 * 10**9,
+        "open": ids + 0.5,
+        "high": ids + 1.0,
+        "low": ids - 1.0,
+        "close": ids.astype(float),
+        "volume": ids * 10.0,
+        "open_oi": ids * 2.0,
+        "close_oi": ids * 3.0,
+    })
+
+
+class TestClass:
+    def test_append_only_new_bars(self, tmp_path):
+        store = KlineStore(str(tmp_path))
+        assert store.append(SYMBOL, 300, _klines(0, 10)) == 10
+        # 与已有数据重叠的K线不会重复保存
+        assert store.append(SYMBOL, 300, _klines(5, 10)) == 5
+        assert store.count(SYMBOL, 300) == 15
+        assert store.last_datetime(SYMBOL, 300) == START_NS + 14 * 300 * 10**9
+        columns = store.read(SYMBOL, 300)
+        np.testing.assert_array_equal(columns["close"], np.arange(15))
+
+    def test_range_slice_is_memory_mapped_view(self, tmp_path):
+        store = KlineStore(str(tmp_path))
+        store.append(SYMBOL, 300, _klines(0, 20))
+        start = START_NS + 3 * 300 * 10**9
+        end = datetime(2023, 7, 26, 9, 40)
+        columns = store.read(SYMBOL, 300, start, end)
+        np.testing.assert_array_equal(columns["close"], np.arange(3, 8))
+        assert isinstance(columns["close"].base, np.memmap) or \
+            isinstance(columns["close"], np.memmap)
+
+    def test_empty_store(self, tmp_path):
+        store = KlineStore(str(tmp_path))
+        assert not store.has(SYMBOL, 300)
+        assert store.last_datetime(SYMBOL, 300) is None
+        assert store.get_klines(SYMBOL, 300).empty
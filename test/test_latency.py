@@ -0,0 +1,102 @@
+import json
+
+from utils.latency import ALL_PRODUCTS, LatencyHistogram, LatencyRecorder
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def _recorder(tmp_path=None, interval=10):
+    clock, wall = FakeClock(), FakeClock()
+    recorder = LatencyRecorder(clock=clock, wall_clock=wall)
+    recorder.configure(interval, str(tmp_path) if tmp_path else None)
+    return recorder, clock, wall
+
+
+class TestClass:
+    def test_histogram_percentiles_within_one_percent(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 100001):
+            histogram.record(value * 1000)
+        assert histogram.count == 100000
+        assert histogram.min == 1000 and histogram.max == 100000000
+        for p in (50, 90, 99, 99.9):
+            expected = p / 100 * 100000000
+            assert abs(histogram.percentile(p) - expected) / expected < 0.01
+        assert histogram.percentile(100) == histogram.max
+
+    def test_histogram_worst_case_bucket_within_one_percent(self):
+        # 桶宽相对数值最大的位置，7 位时 8192 落在 [8192, 8319] 桶内
+        histogram = LatencyHistogram()
+        histogram.record(8192)
+        histogram.record(10**9)
+        assert abs(histogram.percentile(50) - 8192) / 8192 < 0.01
+
+    def test_histogram_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(10)
+        b.record(5000)
+        b.record(7)
+        a.merge(b)
+        assert (a.count, a.min, a.max, a.total) == (3, 7, 5000, 5017)
+        assert a.percentile(50) == 10
+
+    def test_disabled_recorder_records_nothing(self):
+        recorder = LatencyRecorder()
+        recorder.start_tick()
+        with recorder.dispatch("KQ.m@DCE.a"):
+            with recorder.span("condition"):
+                pass
+        recorder.order_inserted()
+        recorder.end_tick()
+        assert recorder.snapshot() == {}
+
+    def test_phases_recorded_per_product(self):
+        recorder, clock, _ = _recorder()
+        clock.now = 1000
+        recorder.start_tick()
+        for product, cost in (("KQ.m@DCE.a", 2000), ("KQ.m@DCE.b", 5000)):
+            with recorder.dispatch(product):
+                with recorder.span("condition"):
+                    clock.now += cost
+                with recorder.span("insert_order", "DCE.a2309"):
+                    clock.now += 100
+                recorder.order_inserted()
+        # 交易人执行之外的下单使用合约代码
+        with recorder.span("insert_order", "DCE.c2309"):
+            clock.now += 100
+        recorder.end_tick()
+        snapshot = recorder.snapshot()
+        a, b = snapshot["KQ.m@DCE.a"], snapshot["KQ.m@DCE.b"]
+        assert a["dispatch"]["max_us"] == 0
+        assert b["dispatch"]["max_us"] == 2.1
+        assert b["condition"]["max_us"] == 5
+        assert a["tick_to_order"]["max_us"] == 2.1
+        assert b["tick_to_order"]["max_us"] == 7.2
+        assert b["trade"]["max_us"] == 5.1
+        assert snapshot["DCE.c2309"]["insert_order"]["count"] == 1
+        total = snapshot[ALL_PRODUCTS]
+        assert total["condition"]["count"] == 2
+        assert total["tick"]["max_us"] == 7.3
+
+    def test_dump_on_interval_writes_json_and_resets(self, tmp_path):
+        recorder, clock, wall = _recorder(tmp_path)
+        recorder.start_tick()
+        with recorder.dispatch("KQ.m@DCE.a"):
+            clock.now += 3000
+        recorder.end_tick()
+        assert (tmp_path / "latency.jsonl").exists() is False
+        wall.now = 10
+        recorder.start_tick()
+        recorder.end_tick()
+        lines = (tmp_path / "latency.jsonl").read_text().splitlines()
+        assert len(lines) == 1
+        dumped = json.loads(lines[0])["latency"]
+        assert dumped["KQ.m@DCE.a"]["trade"]["count"] == 1
+        assert dumped[ALL_PRODUCTS]["tick"]["count"] == 2
+        assert recorder.snapshot() == {}
@@ -0,0 +1,78 @@
+import logging
+import threading
+
+from utils.log_utils import Lazy, LazyFormat, enable_queue_logging
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.append(threading.current_thread())
+
+
+class TestClass:
+    def test_lazy_is_not_evaluated_when_level_disabled(self):
+        calls = []
+
+        def to_str(value):
+            calls.append(value)
+            return str(value)
+
+        logger = logging.getLogger("test_lazy_disabled")
+        logger.setLevel(logging.INFO)
+        logger.debug(LazyFormat("{} {}", Lazy(to_str, 1), "a"))
+        assert calls == []
+        message = LazyFormat("{} {}", Lazy(to_str, 2), "b")
+        assert str(message) == "2 b"
+        assert calls == [2]
+
+    def test_queue_logging_formats_on_listener_thread(self):
+        handler = RecordingHandler()
+        handler.setLevel(logging.INFO)
+        logger = logging.getLogger("test_queue_logging")
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        listeners = enable_queue_logging([logger])
+        try:
+            assert len(listeners) == 1
+            assert handler not in logger.handlers
+            logger.debug(LazyFormat("ignored {}", 1))
+            logger.info(LazyFormat("开仓 {} 手", 2))
+            logger.info("平仓 %s 手", 1)
+        finally:
+            for listener in listeners:
+                listener.stop()
+            logger.handlers.clear()
+        assert handler.messages == ["开仓 2 手", "平仓 1 手"]
+        assert threading.current_thread() not in handler.threads
+
+    def test_lazy_arguments_resolved_before_enqueue(self):
+        quote = {"datetime": "2023-07-26 09:05:00"}
+        threads = []
+
+        def quote_time():
+            threads.append(threading.current_thread())
+            return quote["datetime"]
+
+        handler = RecordingHandler()
+        logger = logging.getLogger("test_queue_lazy")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        listeners = enable_queue_logging([logger])
+        try:
+            logger.info(LazyFormat("{} 止损", Lazy(quote_time)))
+            # 交易线程随后更新行情，日志仍使用记录时的时间
+            quote["datetime"] = "2023-07-26 09:06:00"
+        finally:
+            for listener in listeners:
+                listener.stop()
+            logger.handlers.clear()
+        assert handler.messages == ["2023-07-26 09:05:00 止损"]
+        assert threads == [threading.current_thread()]
@@ -0,0 +1,182 @@
+from types import SimpleNamespace
+
+import dao.trade.trade_service as service
+from strategies.cyclical_strategies import CyclicalStrategy
+from strategies.main_joint_symbol_strategies.mjs_strategy import MJStrategy
+from strategies.main_joint_symbol_strategies.smjs_strategies import (
+    MJMainStrategy,
+)
+
+
+class FakeMJStrategy(MJStrategy):
+    def __init__(self, current_symbol, next_symbol, saved_status=None):
+        self.created = []
+        self.watch_changes = []
+        self.config = SimpleNamespace(
+            watch_changed=lambda: self.watch_changes.append(1))
+        self.saved_status = saved_status or {}
+        self.mjs_status = SimpleNamespace(
+            custom_symbol="rb_long_fake", current_symbol=current_symbol,
+            next_symbol=next_symbol)
+        self.current_trade_strategy = self._create_trade_strategy(
+            current_symbol)
+        self.next_trade_strategy = None
+
+    def _create_trade_strategy(self, symbol):
+        self.created.append(symbol)
+        return SimpleNamespace(symbol=symbol, resets=0)
+
+    def _find_trade_status(self, symbol):
+        return self.saved_status.get(symbol)
+
+    def _get_name(self):
+        return "fake"
+
+    def _get_direction(self):
+        return True
+
+
+class FakeMainMJStrategy(MJMainStrategy):
+    """主连主策略，交易策略只包含换月判断用到的属性"""
+
+    def __init__(self, underlying_symbol, current_symbol, next_symbol):
+        self.created = []
+        self.config = SimpleNamespace(
+            quote=SimpleNamespace(underlying_symbol=underlying_symbol,
+                                  datetime="2023-09-20 09:00:00.000000"),
+            f_info=SimpleNamespace(main_symbols=[1, 5, 10]),
+            watch_changed=lambda: None)
+        self.mjs_status = SimpleNamespace(
+            custom_symbol="rb_long_main", main_joint_symbol="KQ.m@SHFE.rb",
+            current_symbol=current_symbol, next_symbol=next_symbol)
+        self.current_trade_strategy = self._create_trade_strategy(
+            current_symbol)
+        self.next_trade_strategy = None
+
+    def _create_trade_strategy(self, symbol):
+        self.created.append(symbol)
+        return SimpleNamespace(
+            symbol=symbol, ts=SimpleNamespace(symbol=symbol, trade_status=0),
+            quote=SimpleNamespace(expire_rest_days=15),
+            execute_before_trade=lambda is_in_trading: None)
+
+    def _get_direction(self):
+        return True
+
+
+class TestClass:
+    def test_reuse_trade_strategies_until_switch(self):
+        mjs = FakeMJStrategy("SHFE.rb2310", "SHFE.rb2401")
+        current = mjs.current_trade_strategy
+        next_ts = mjs.ensure_next_trade_strategy()
+        assert mjs.ensure_next_trade_strategy() is next_ts
+        mjs._update_trade_strategy()
+        assert mjs.current_trade_strategy is current
+        assert mjs.next_trade_strategy is next_ts
+        # 只有创建下一合约策略时通知盯盘人重新登记
+        assert len(mjs.watch_changes) == 1
+        # 换月后下一合约成为当前合约，只创建新的下一合约交易策略
+        mjs.mjs_status.current_symbol = "SHFE.rb2401"
+        mjs.mjs_status.next_symbol = "SHFE.rb2405"
+        mjs._update_trade_strategy()
+        assert mjs.current_trade_strategy is next_ts
+        # 新的下一合约在再次临近换月时才创建
+        assert mjs.next_trade_strategy is None
+        assert mjs.created == ["SHFE.rb2310", "SHFE.rb2401"]
+        assert len(mjs.watch_changes) == 2
+
+    def test_next_strategy_created_near_roll(self):
+        def cycle(erd):
+            mjs = FakeMJStrategy("SHFE.rb2310", "SHFE.rb2401")
+            mjs.current_trade_strategy.ts = SimpleNamespace(
+                symbol="SHFE.rb2310", trade_status=0)
+            mjs.current_trade_strategy.quote = SimpleNamespace(
+                expire_rest_days=erd)
+            mjs.config.quote = SimpleNamespace(underlying_symbol="SHFE.rb2310")
+            f_info = SimpleNamespace(switch_days=[20, 45], roll_horizon=15)
+            cs = CyclicalStrategy(SimpleNamespace(f_info=f_info))
+            return mjs, cs
+
+        mjs, cs = cycle(90)
+        cs.switch_symbol(mjs)
+        assert mjs.next_trade_strategy is None
+        assert mjs.created == ["SHFE.rb2310"]
+        mjs.current_trade_strategy.quote.expire_rest_days = 59
+        cs.switch_symbol(mjs)
+        assert mjs.next_trade_strategy.symbol == "SHFE.rb2401"
+        # 主力合约已经切换时，无论剩余天数都需要下一合约
+        mjs, cs = cycle(90)
+        mjs.config.quote.underlying_symbol = "SHFE.rb2401"
+        cs.prepare_next_strategy(mjs)
+        assert mjs.next_trade_strategy.symbol == "SHFE.rb2401"
+        # 下一合约已有持仓时需要继续管理持仓
+        mjs, cs = cycle(90)
+        mjs.saved_status["SHFE.rb2401"] = SimpleNamespace(trade_status=1)
+        cs.prepare_next_strategy(mjs)
+        assert mjs.created == ["SHFE.rb2310", "SHFE.rb2401"]
+
+    def test_open_candidates_skip_trading_and_pending(self):
+        filled = []
+
+        def strategy(trading, pending):
+            return SimpleNamespace(
+                is_trading=lambda: trading,
+                has_pending_order=lambda: pending,
+                is_changing=lambda k_type: k_type == 3,
+                fill_indicators_by_type=filled.append)
+
+        changing = {"datetime": True}
+        mjs = FakeMJStrategy("SHFE.rb2310", "SHFE.rb2401")
+        mjs.config = SimpleNamespace(
+            quote=object(),
+            api=SimpleNamespace(is_changing=lambda obj, key: changing[key]))
+        mjs.current_trade_strategy = strategy(False, False)
+        mjs.next_trade_strategy = strategy(True, False)
+        assert mjs.prepare_open_candidates() == [mjs.current_trade_strategy]
+        # 与执行交易时相同，只为发生变化的K线填充指标
+        assert filled == [3, 3]
+        mjs.next_trade_strategy = strategy(False, True)
+        assert mjs.prepare_open_candidates() == [mjs.current_trade_strategy]
+        # 行情时间没有变化时交易策略不会执行
+        changing["datetime"] = False
+        assert mjs.prepare_open_candidates() == []
+
+    def test_main_strategy_roll_across_days(self, monkeypatch):
+        switched = []
+        monkeypatch.setattr(
+            service, "switch_symbol",
+            lambda mj, current, next_status, dt: switched.append(
+                (current.symbol, next_status.symbol)))
+        monkeypatch.setattr(service, "find_main_trade_status",
+                            lambda symbol, direction: None)
+        mjs = FakeMainMJStrategy("SHFE.rb2401", "SHFE.rb2310", "SHFE.rb2401")
+        next_ts = mjs.ensure_next_trade_strategy()
+        f_info = SimpleNamespace(switch_days=[20, 45], roll_horizon=15)
+        cs = CyclicalStrategy(SimpleNamespace(f_info=f_info))
+        # 第一个交易日：主力合约已切换且剩余天数达到换月条件
+        cs.switch_symbol(mjs)
+        mjs.execute_before_trade(True)
+        assert switched == [("SHFE.rb2310", "SHFE.rb2401")]
+        assert mjs.current_trade_strategy is next_ts
+        assert mjs.mjs_status.next_symbol == "SHFE.rb2405"
+        # 第二个交易日：已经在交易新合约，不再重复换月
+        mjs.current_trade_strategy.quote.expire_rest_days = 120
+        cs.switch_symbol(mjs)
+        mjs.execute_before_trade(True)
+        assert len(switched) == 1
+        assert mjs.current_trade_strategy.symbol == "SHFE.rb2401"
+
+    def test_roll_creates_next_strategy_for_incoming_contract(
+            self, monkeypatch):
+        switched = []
+        monkeypatch.setattr(
+            service, "switch_symbol",
+            lambda mj, current, next_status, dt: switched.append(
+                (current.symbol, next_status.symbol)))
+        # 重启当天即换月，下一合约交易策略尚未创建
+        mjs = FakeMainMJStrategy("SHFE.rb2401", "SHFE.rb2310", "SHFE.rb2401")
+        mjs.swith_symbol()
+        assert switched == [("SHFE.rb2310", "SHFE.rb2401")]
+        assert mjs.created == ["SHFE.rb2310", "SHFE.rb2401"]
+        assert mjs.current_trade_strategy.symbol == "SHFE.rb2401"
+        assert mjs.next_trade_strategy is None
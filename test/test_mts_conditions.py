@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategies.tools as tools
+from strategies.trade_strategies.mts import conditions
+from strategies.trade_strategies.mts.mts_long import MainLongTradeStrategy
+from strategies.trade_strategies.mts.mts_short import MainShortTradeStrategy
+
+
+def _klines(count, seed):
+    rng = np.random.default_rng(seed)
+    close = np.round(3000 * np.exp(np.cumsum(rng.normal(0, 0.006, count))), 1)
+    open_p = np.round(close * (1 + rng.normal(0, 0.004, count)), 1)
+    klines = pd.DataFrame({
+        "id": np.arange(count, dtype=float),
+        "datetime": (1672707600 + np.arange(count) * 1800) * 1e9,
+        "open": open_p,
+        "high": np.maximum(open_p, close) + 2,
+        "low": np.minimum(open_p, close) - 2,
+        "close": close,
+        "volume": np.full(count, 100.0),
+    })
+    klines["symbol"] = "DCE.a2309"
+    tools.fill_main_indicators(klines)
+    return klines
+
+
+def _strategy(cls):
+    """不连接数据库和天勤，只设置条件判断用到的属性"""
+    strategy = cls.__new__(cls)
+    strategy.symbol = "DCE.a2309"
+    strategy.quote = SimpleNamespace(datetime="2023-01-03 09:00:00.000000")
+    open_condition = SimpleNamespace(**{
+        name: SimpleNamespace()
+        for name in ("daily_condition", "hourly_condition",
+                     "minute_30_condition", "minute_5_condition")
+    })
+    strategy.ts = SimpleNamespace(symbol="DCE.a2309",
+                                  open_condition=open_condition)
+    return strategy
+
+
+def _scalar(strategy, attr, method, klines, i):
+    """将第 i 根K线作为最后一根已完成K线，调用逐根判断的方法"""
+    setattr(strategy, attr, klines.iloc[:i + 2].copy())
+    return int(getattr(strategy, method)())
+
+
+def _daily(d_condition):
+    return pd.DataFrame({"l_condition": [d_condition, np.nan]})
+
+
+@pytest.fixture(params=range(3))
+def klines(request):
+    return _klines(300, request.param)
+
+
+class TestClass:
+    @pytest.mark.parametrize("cls, method, attr, vector", [
+        (MainLongTradeStrategy, "_match_dk_condition", "_d_klines",
+         conditions.long_daily_conditions),
+        (MainLongTradeStrategy, "_match_30m_condition", "_30m_klines",
+         conditions.long_minute_conditions),
+        (MainLongTradeStrategy, "_match_5m_condition", "_5m_klines",
+         conditions.long_minute_conditions),
+        (MainShortTradeStrategy, "_match_dk_condition", "_d_klines",
+         conditions.short_daily_conditions),
+        (MainShortTradeStrategy, "_match_3h_condition", "_3h_klines",
+         conditions.short_3h_conditions),
+    ])
+    def test_single_timeframe_parity(self, klines, cls, method, attr,
+                                     vector):
+        strategy = _strategy(cls)
+        expected = vector(klines)
+        got = [_scalar(strategy, attr, method, klines, i)
+               for i in range(len(klines) - 1)]
+        assert got == list(expected[:-1])
+
+    def test_long_3h_parity(self, klines):
+        strategy = _strategy(MainLongTradeStrategy)
+        count = len(klines) - 1
+        d_conditions = np.array([np.nan, 0, 1, 2, 3, 4, 5] * 50)[:count]
+        c2 = np.arange(count) % 3 == 0
+        got = []
+        for i in range(count):
+            strategy._d_klines = _daily(d_conditions[i])
+            strategy._match_3hk_c2_distance = lambda flag=c2[i]: flag
+            got.append(_scalar(strategy, "_3h_klines", "_match_3h_condition",
+                               klines, i))
+        expected = conditions.long_3h_conditions(
+            klines.iloc[:-1], d_conditions, c2)
+        assert got == list(expected)
+
+    def test_short_30m_parity(self, klines):
+        strategy = _strategy(MainShortTradeStrategy)
+        count = len(klines) - 1
+        within = np.arange(count) % 2 == 0
+        got = []
+        for i in range(count):
+            strategy.is_within_2days = lambda flag=within[i]: flag
+            got.append(_scalar(strategy, "_30m_klines",
+                               "_match_30m_condition", klines, i))
+        expected = conditions.short_30m_conditions(klines.iloc[:-1], within)
+        assert got == list(expected)
+
+    def test_conditions_cached_on_evaluated_kline(self):
+        klines = _klines(50, 0)
+        strategy = _strategy(MainLongTradeStrategy)
+        strategy._30m_klines = klines
+        result = strategy._match_30m_condition()
+        assert klines["l_condition"].iloc[-2] == int(result)
+        assert klines["l_condition"].isna().sum() == len(klines) - 1
+        # 已经判断过的K线直接使用缓存的结果
+        klines.iat[-2, klines.columns.get_loc("l_condition")] = 7
+        assert strategy._match_30m_condition() == 7
+
+    def test_synthetic_data_covers_conditions(self):
+        seen = set()
+        for seed in range(3):
+            klines = _klines(300, seed)
+            seen.update(conditions.long_daily_conditions(klines).tolist())
+            seen.update(10 + conditions.short_3h_conditions(klines))
+        assert {0, 1, 2, 11}.issubset(seen)
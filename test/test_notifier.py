@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from utils.notifier import NotificationOutbox, PushDeerSender
+
+
+class PushServer:
+    """本地的 PushDeer 替身，记录收到的消息，可以设置失败次数和响应延迟"""
+
+    def __init__(self):
+        self.messages = []
+        self.failures = 0
+        self.delay = 0.0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.delay)
+                if server.failures > 0:
+                    server.failures -= 1
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                query = parse_qs(urlparse(self.path).query)
+                server.messages.append((query["text"][0], query["desp"][0]))
+                body = json.dumps({"code": 0}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def push_server():
+    server = PushServer()
+    yield server
+    server.shutdown()
+
+
+def create_outbox(server, **kwargs):
+    sender = PushDeerSender("key", server=server.url, timeout=5)
+    return NotificationOutbox(sender, **kwargs)
+
+
+class TestClass:
+    def test_put_does_not_wait_for_slow_server(self, push_server):
+        push_server.delay = 0.5
+        outbox = create_outbox(push_server, batch_window=0)
+        start = time.monotonic()
+        outbox.put("## 开仓", "rb2401 买入 1 手")
+        outbox.put("## 开仓", "ag2402 买入 1 手")
+        assert time.monotonic() - start < 0.1
+        outbox.close()
+        contents = "".join(c for _, c in push_server.messages)
+        assert "rb2401" in contents and "ag2402" in contents
+
+    def test_burst_is_coalesced(self, push_server):
+        outbox = create_outbox(push_server, batch_window=0.2)
+        outbox.put("## 开仓", "rb2401 买入 1 手")
+        outbox.put("## 开仓", "rb2401 买入 1 手")
+        outbox.put("## 开仓", "ag2402 买入 2 手")
+        outbox.close()
+        assert len(push_server.messages) == 1
+        title, content = push_server.messages[0]
+        assert title == "## 开仓 等2条通知"
+        assert "rb2401" in content and "ag2402" in content
+
+    def test_retry_with_backoff(self, push_server):
+        push_server.failures = 2
+        outbox = create_outbox(push_server, batch_window=0, backoff=0.01)
+        outbox.put("## 平仓", "rb2401 卖出 1 手")
+        deadline = time.monotonic() + 5
+        while not push_server.messages and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.close()
+        assert push_server.messages == [("## 平仓", "rb2401 卖出 1 手")]
+        assert outbox.dropped_count == 0
+
+    def test_give_up_after_max_retries(self, push_server):
+        push_server.failures = 10
+        outbox = create_outbox(push_server, batch_window=0, max_retries=1,
+                               backoff=0.01)
+        outbox.put("## 平仓", "rb2401 卖出 1 手")
+        deadline = time.monotonic() + 5
+        while not outbox.dropped_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.close()
+        assert push_server.failures == 8
+        assert outbox.dropped_count == 1
@@ -0,0 +1,116 @@
+import pytest
+
+import dao.trade.trade_service as service
+from strategies.order_manager import OrderManager
+
+SYMBOL = "SHFE.rb2401"
+
+
+class FakeOrder:
+    def __init__(self, order_id, volume, limit_price):
+        self.order_id = order_id
+        self.insert_date_time = 0
+        self.volume_orign = volume
+        self.volume_left = volume
+        self.limit_price = limit_price
+        self.trade_price = float("nan")
+        self.status = "ALIVE"
+        self.last_msg = ""
+
+    def fill(self, price, volume=None):
+        self.volume_left -= volume or self.volume_left
+        self.trade_price = price
+        self.status = "FINISHED"
+
+
+class FakeQuote:
+    last_price = 3000.0
+
+
+class FakeApi:
+    def __init__(self):
+        self.orders = []
+        self.cancelled = []
+
+    def insert_order(self, symbol, direction, offset, volume,
+                     limit_price=None):
+        order = FakeOrder(f"o{len(self.orders)}", volume, limit_price)
+        self.orders.append(order)
+        return order
+
+    def cancel_order(self, order):
+        self.cancelled.append(order)
+        order.status = "FINISHED"
+
+    def get_quote(self, symbol):
+        return FakeQuote()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def stored_orders(monkeypatch):
+    orders = []
+    monkeypatch.setattr(service, "store_tq_order", orders.append)
+    return orders
+
+
+class TestClass:
+    def test_callback_after_filled(self, stored_orders):
+        api = FakeApi()
+        finished = []
+        manager = OrderManager(api)
+        pending = manager.submit(SYMBOL, "BUY", "OPEN", 2, finished.append)
+        manager.advance()
+        # 下单后不等待成交
+        assert not pending.is_finished
+        assert pending.volume_orign == 2
+        api.orders[0].fill(3000)
+        manager.advance()
+        assert finished == [pending]
+        assert pending.status == "FINISHED"
+        assert pending.trade_price == 3000
+        assert stored_orders == api.orders
+        assert manager.pending_count() == 0
+
+    def test_cancel_and_reprice_after_timeout(self):
+        api = FakeApi()
+        clock = FakeClock()
+        finished = []
+        manager = OrderManager(api, timeout=5, clock=clock)
+        pending = manager.submit(SYMBOL, "SELL", "CLOSE", 3, finished.append)
+        api.orders[0].volume_left = 2
+        api.orders[0].trade_price = 3010
+        clock.now = 6
+        manager.advance()
+        manager.advance()
+        assert api.cancelled == [api.orders[0]]
+        # 撤单后以最新价对剩余手数重新下单
+        assert pending.reprices == 1
+        assert api.orders[1].volume_orign == 2
+        assert api.orders[1].limit_price == 3000
+        api.orders[1].fill(3004)
+        manager.advance()
+        assert finished == [pending]
+        assert pending.volume_orign == 3
+        assert pending.trade_price == pytest.approx((3010 + 3004 * 2) / 3)
+
+    def test_give_up_after_max_reprices(self):
+        api = FakeApi()
+        clock = FakeClock()
+        finished = []
+        manager = OrderManager(api, timeout=5, max_reprices=1, clock=clock)
+        pending = manager.submit(SYMBOL, "BUY", "OPEN", 1, finished.append)
+        for _ in range(4):
+            clock.now += 6
+            manager.advance()
+        assert pending.status == "FAILED"
+        assert pending.volume_orign == 0
+        assert finished == []
+        assert manager.pending_count() == 0
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from tqsdk2 import BacktestFinished
+
+import headquarters.parallel_backtest as parallel_backtest
+from headquarters.headquarters import Commander
+from headquarters.parallel_backtest import split_configs
+
+
+def _configs(active, inactive):
+    return [SimpleNamespace(symbol=f"a{i}", is_active=1)
+            for i in range(active)] + \
+        [SimpleNamespace(symbol=f"i{i}", is_active=0)
+         for i in range(inactive)]
+
+
+class TestClass:
+    def test_split_active_configs_evenly(self):
+        shards = split_configs(_configs(5, 4), 3)
+        assert len(shards) == 3
+        active_counts = [sum(c.is_active for c in s) for s in shards]
+        assert sorted(active_counts) == [1, 2, 2]
+        assert sum(len(s) for s in shards) == 9
+
+    def test_no_empty_shards(self):
+        shards = split_configs(_configs(2, 0), 8)
+        assert [[c.symbol for c in s] for s in shards] == [["a0"], ["a1"]]
+
+    def test_shard_runs_its_staker(self, monkeypatch):
+        events = []
+
+        class FakeStaker:
+            def start_work(self):
+                events.append("staker")
+                raise BacktestFinished(None)
+
+        commander = Commander.__new__(Commander)
+        commander.db_name = "shard-db"
+        commander._dba = SimpleNamespace(
+            close=lambda: events.append("dba"))
+        commander.trade_manager = SimpleNamespace(
+            staker=FakeStaker(),
+            tqApi=SimpleNamespace(close=lambda: events.append("api")))
+        created = []
+
+        def fake_commander(is_backtest, configs):
+            created.append([c.symbol for c in configs])
+            return commander
+
+        monkeypatch.setattr(parallel_backtest, "Commander", fake_commander)
+        monkeypatch.setattr(parallel_backtest.common, "setup_log_config",
+                            lambda *args: None)
+        monkeypatch.setattr(parallel_backtest.c_utils, "get_future_configs",
+                            lambda is_backtest: _configs(3, 1))
+        assert parallel_backtest.run_shard(1, 2, "info") == "shard-db"
+        assert created == [["a1", "i0"]]
+        assert events == ["staker", "dba", "api"]
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from strategies.price_triggers import (
+    LOWER,
+    UPPER,
+    PriceTrigger,
+    PriceTriggerIndex,
+    TriggerSet,
+    price_trigger_index,
+)
+from strategies.trade_strategies.mts.mts_long import MainLongTradeStrategy
+from strategies.trade_strategies.mts.mts_short import MainShortTradeStrategy
+
+
+def _strategy(cls, **sold_condition):
+    """不连接数据库和天勤，止损止盈判断只记录调用"""
+    strategy = cls.__new__(cls)
+    strategy.symbol = "DCE.a2309"
+    strategy.quote = SimpleNamespace(last_price=3000.0)
+    strategy._pending_order = None
+    strategy.config = SimpleNamespace(f_info=SimpleNamespace(
+        long_config=SimpleNamespace(base_scale=0.02, promote_scale_1=2),
+        short_config=SimpleNamespace(base_scale=0.02, promote_scale=2)))
+    sc = dict(stop_loss_price=2940.0, tp_started_point=3120.0,
+              has_enter_tp=False, has_increase_slp=False, has_stop_tp=False,
+              take_profit_cond=4, take_profit_stage=0)
+    sc.update(sold_condition)
+    strategy.ts = SimpleNamespace(
+        trade_status=1, sold_condition=SimpleNamespace(**sc),
+        open_pos_info=SimpleNamespace(trade_price=3000.0))
+    strategy.calls = []
+    strategy._try_stop_loss = lambda: strategy.calls.append("stop_loss")
+    strategy._try_take_profit = lambda: strategy.calls.append("take_profit")
+    strategy._is_last_5m = lambda: False
+    return strategy
+
+
+def _tick(strategy, price):
+    strategy.quote.last_price = price
+    strategy.calls.clear()
+    strategy._try_close_pos()
+    return list(strategy.calls)
+
+
+class TestClass:
+    def test_trigger_set_checks_nearest_bounds(self):
+        triggers = TriggerSet([
+            PriceTrigger("sl", 90, LOWER, None),
+            PriceTrigger("sl2", 80, LOWER, None),
+            PriceTrigger("tp", 120, UPPER, None),
+            PriceTrigger("target", 110, UPPER, None),
+        ])
+        assert (triggers.low, triggers.high) == (90, 110)
+        assert triggers.fired(100) == []
+        assert [t.name for t in triggers.fired(80)] == ["sl", "sl2"]
+        assert [t.name for t in triggers.fired(115)] == ["target"]
+        assert TriggerSet([]).fired(1e9) == []
+
+    def test_index_registers_per_symbol_and_owner(self):
+        index = PriceTriggerIndex()
+        entry = index.register("DCE.a2309", "long",
+                               [PriceTrigger("sl", 90, LOWER, None)])
+        index.register("DCE.a2309", "short",
+                       [PriceTrigger("sl", 110, UPPER, None)])
+        assert index.get("DCE.a2309", "long") is entry
+        assert index.fired(entry, 100) == []
+        assert len(index.fired(entry, 90)) == 1
+        assert index.stats() == {"checks": 2, "skips": 1, "entries": 2}
+        assert sorted(index.triggers("DCE.a2309")) == ["long", "short"]
+        index.remove("DCE.a2309", "long")
+        assert index.get("DCE.a2309", "long") is None
+
+    def test_long_checks_only_when_price_reaches_trigger(self):
+        price_trigger_index.reset()
+        strategy = _strategy(MainLongTradeStrategy)
+        assert _tick(strategy, 3000) == []
+        assert _tick(strategy, 2940) == ["stop_loss"]
+        assert _tick(strategy, 3120) == ["take_profit"]
+        # 进入止盈后，阶段2只在达到3倍目标价时判断
+        sc = strategy.ts.sold_condition
+        sc.has_enter_tp, sc.take_profit_stage = True, 2
+        assert _tick(strategy, 3150) == []
+        entry = price_trigger_index.triggers("DCE.a2309")[
+            "MainLongTradeStrategy"]
+        assert [(t.name, t.price) for t in entry] == [
+            ("止损", 2940.0), ("止盈剩余全部", 3180.0)]
+        assert _tick(strategy, 3180) == ["take_profit"]
+
+    def test_long_unpriced_checks(self):
+        price_trigger_index.reset()
+        strategy = _strategy(MainLongTradeStrategy, has_enter_tp=True,
+                             take_profit_cond=1)
+        assert _tick(strategy, 3000) == []
+        strategy._is_last_5m = lambda: True
+        assert _tick(strategy, 3000) == ["take_profit"]
+        strategy.ts.sold_condition.take_profit_cond = 4
+        strategy.ts.sold_condition.take_profit_stage = 1
+        assert _tick(strategy, 3000) == ["take_profit"]
+
+    def test_short_trend_take_profit_once_per_daily_kline(self):
+        price_trigger_index.reset()
+        strategy = _strategy(MainShortTradeStrategy, stop_loss_price=3060.0,
+                             take_profit_stage=1)
+        strategy._d_klines = pd.DataFrame({"id": [1.0, 2.0, 3.0]})
+        checked = []
+        strategy._try_trend_take_profit = lambda: checked.append(1)
+        del strategy._try_take_profit
+        strategy.calls = []
+        assert _tick(strategy, 3000) == []
+        assert _tick(strategy, 3000) == []
+        assert len(checked) == 1
+        # 止盈状态或日线变化后再次判断
+        strategy.ts.sold_condition.has_stop_tp = True
+        _tick(strategy, 3000)
+        strategy._d_klines = pd.DataFrame({"id": [2.0, 3.0, 4.0]})
+        _tick(strategy, 3000)
+        _tick(strategy, 3000)
+        assert len(checked) == 3
+        assert _tick(strategy, 3060) == ["stop_loss"]
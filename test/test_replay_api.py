@@ -0,0 +1,106 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from tqsdk2 import BacktestFinished
+
+from replay.api import ReplayApi, to_ns
+from replay.data_source import ReplayDataSource
+
+SYMBOL = "SHFE.rb2401"
+START = datetime(2023, 7, 26, 9, 0)
+TRADING_TIME = {"day": [["09:00:00", "10:15:00"]], "night": []}
+
+
+def _write_bars(path, symbol, duration, count, start=START):
+    first = to_ns(start)
+    closes = 3000 + np.arange(count, dtype=float)
+    bars = pd.DataFrame({
+        "datetime": first + np.arange(count) * duration * 10**9,
+        "open": closes - 1,
+        "high": closes + 2,
+        "low": closes - 2,
+        "close": closes,
+        "volume": np.full(count, 10),
+        "open_oi": np.full(count, 100),
+        "close_oi": np.full(count, 101),
+    })
+    (path / symbol).mkdir(exist_ok=True)
+    bars.to_csv(path / symbol / f"{duration}.csv", index=False)
+
+
+@pytest.fixture
+def source(tmp_path):
+    instruments = {
+        "SHFE.rb": {"trading_time": TRADING_TIME, "volume_multiple": 10,
+                    "price_tick": 1},
+        SYMBOL: {"expire_datetime": "2024-01-15"},
+    }
+    (tmp_path / "instruments.json").write_text(json.dumps(instruments))
+    _write_bars(tmp_path, SYMBOL, 300, 12)
+    (tmp_path / "KQ.m@SHFE.rb").mkdir()
+    pd.DataFrame({"datetime": [to_ns(datetime(2023, 1, 1))],
+                  "underlying_symbol": [SYMBOL]}).to_csv(
+        tmp_path / "KQ.m@SHFE.rb" / "underlying.csv", index=False)
+    return ReplayDataSource(str(tmp_path))
+
+
+class TestClass:
+    def test_kline_events_and_is_changing(self, source):
+        api = ReplayApi(source, START, datetime(2023, 7, 26, 10, 0))
+        klines = api.get_kline_serial(SYMBOL, 300, 5)
+        quote = api.get_quote(SYMBOL)
+        mj_quote = api.get_quote("KQ.m@SHFE.rb")
+        # 开始时第一根K线正在形成，只有开盘价
+        assert klines.iloc[-1].close == 2999
+        assert np.isnan(klines.iloc[0].close)
+        assert mj_quote.underlying_symbol == SYMBOL
+        api.wait_update()
+        # 相邻K线的结束和开始在同一次更新中处理
+        assert api.is_changing(klines.iloc[-1], "datetime")
+        assert api.is_changing(quote, "datetime")
+        assert klines.iloc[-2].close == 3000
+        assert klines.iloc[-1].id == 1
+        assert klines.iloc[-1].close == 3000
+        assert quote.datetime == "2023-07-26 09:05:00.000000"
+        assert mj_quote.last_price == 3000
+        assert quote.expire_rest_days == 173
+        assert api.get_trading_status(SYMBOL).trade_status == "CONTINOUS"
+        for _ in range(11):
+            api.wait_update()
+        # 最后一根K线只有结束事件，不产生新K线
+        assert klines.iloc[-1].close == 3011
+        assert api.is_changing(klines.iloc[-1])
+        assert not api.is_changing(klines.iloc[-1], "datetime")
+        assert quote.datetime == "2023-07-26 09:59:59.999999"
+        assert mj_quote.datetime == quote.datetime
+
+    def test_orders_fill_on_next_update(self, source):
+        api = ReplayApi(source, START, datetime(2023, 7, 26, 10, 0),
+                        init_balance=100000)
+        api.get_kline_serial(SYMBOL, 300)
+        api.wait_update()
+        order = api.insert_order(SYMBOL, "BUY", "OPEN", 2)
+        assert order.status == "ALIVE"
+        api.wait_update()
+        assert order.status == "FINISHED"
+        assert order.trade_price == 3000
+        assert api.is_changing(order)
+        while api.get_quote(SYMBOL).last_price < 3004:
+            api.wait_update()
+        close = api.insert_order(SYMBOL, "SELL", "CLOSE", 2, 3004)
+        api.wait_update()
+        assert close.trade_price == 3004
+        assert api.get_account().balance == 100000 + 4 * 2 * 10
+        error = api.insert_order(SYMBOL, "SELL", "CLOSE", 1)
+        api.wait_update()
+        assert error.is_error
+
+    def test_finished_at_end(self, source):
+        api = ReplayApi(source, START, datetime(2023, 7, 26, 9, 10))
+        api.get_kline_serial(SYMBOL, 300)
+        with pytest.raises(BacktestFinished):
+            for _ in range(10):
+                api.wait_update()
@@ -0,0 +1,51 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from mongoengine import disconnect
+
+from benchmarks.suites import BenchEnv
+from dao.storage import connect_storage
+from exe_departments.stakers import BTStaker, Staker
+from replay.api import ReplayApi
+from strategies.trading_calendar import to_local_seconds
+
+
+@pytest.fixture
+def memory_db():
+    connect_storage("memory", "", "stakers_test")
+    yield
+    disconnect()
+
+
+def _trader(dt):
+    return SimpleNamespace(
+        _config=SimpleNamespace(quote=SimpleNamespace(datetime=dt)))
+
+
+class TestClass:
+    def test_backtest_clock_follows_quotes(self):
+        staker = BTStaker.__new__(BTStaker)
+        staker.traders = [_trader("")]
+        clock = staker._get_clock()
+        assert clock() == 0.0
+        staker.traders = [_trader("2023-07-26 09:05:00.000000"),
+                          _trader("2023-07-26 09:05:10.500000"),
+                          _trader("")]
+        assert clock() == to_local_seconds("2023-07-26 09:05:10.500000")
+
+    def test_live_clock_is_wall_clock(self):
+        assert Staker._get_clock(None) is time.monotonic
+
+    def test_backtest_staker_on_fresh_replay_api(self, memory_db):
+        env = BenchEnv(1, 1)
+        try:
+            # 与 TradeManager 相同，不预先订阅主力合约
+            api = ReplayApi(env.source, env.start, env.end)
+            staker = BTStaker(api, 2, [1, 2], env.future_configs())
+            quote = staker.traders[0]._config.quote
+            assert quote.datetime
+            assert api.get_quote(quote.underlying_symbol).datetime \
+                == quote.datetime
+        finally:
+            env.close()
@@ -0,0 +1,91 @@
+import pytest
+from bson import ObjectId
+
+import dao.trade.main_trade_dao as mdao
+import dao.trade.trade_dao as dao
+from dao.odm.future_trade import (
+    BottomTradeStatus,
+    MainJointSymbolStatus,
+    MainTradeStatus,
+)
+from dao.trade.status_repository import StatusRepository
+
+
+class FakeQuery(list):
+    def first(self):
+        return self[0] if self else None
+
+
+class FakeObjects:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+        self.inserts = []
+
+    def __call__(self, **kwargs):
+        self.queries += 1
+        return FakeQuery(
+            d for d in self.docs
+            if all(getattr(d, k) == v for k, v in kwargs.items()))
+
+    def insert(self, docs, load_bulk=True):
+        self.inserts.append(list(docs))
+        for doc in docs:
+            doc.pk = ObjectId()
+        self.docs.extend(docs)
+
+
+@pytest.fixture
+def objects():
+    existing = MainTradeStatus(id=ObjectId(), custom_symbol="c",
+                               symbol="SHFE.rb2401", direction=1)
+    objects = {
+        MainJointSymbolStatus: FakeObjects([]),
+        MainTradeStatus: FakeObjects([existing]),
+        BottomTradeStatus: FakeObjects([]),
+    }
+    # 直接读取 objects 会连接数据库，不能使用 monkeypatch
+    saved = {cls: cls.__dict__.get("objects") for cls in objects}
+    for cls, fake in objects.items():
+        setattr(cls, "objects", fake)
+    yield objects
+    for cls, manager in saved.items():
+        if manager is None:
+            delattr(cls, "objects")
+        else:
+            setattr(cls, "objects", manager)
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    repository = StatusRepository()
+    monkeypatch.setattr(mdao, "status_repository", repository)
+    monkeypatch.setattr(dao, "status_repository", repository)
+    return repository
+
+
+class TestClass:
+    def test_preload_and_insert_created_in_bulk(self, objects, repository):
+        main = objects[MainTradeStatus]
+        with repository.preloading():
+            found = mdao.getTradeStatus("SHFE.rb2401", 1)
+            assert found is main.docs[0]
+            for symbol in ("SHFE.rb2405", "SHFE.rb2410"):
+                assert mdao.getTradeStatus(symbol, 1) is None
+                created = mdao.createTradeStatus("c", symbol, 1, None)
+                assert created.pk is None
+                assert mdao.getTradeStatus(symbol, 1) is created
+            assert dao.getMainJointSymbolStatus("c") is None
+            dao.createMainJointSymbolStatus(
+                "KQ.m@SHFE.rb", "SHFE.rb2405", "SHFE.rb2410", 1, "main", None)
+        # 每个集合只查询一次，新状态一次性插入
+        assert [len(f.inserts) for f in objects.values()] == [1, 1, 0]
+        assert all(f.queries == 1 for f in objects.values())
+        assert len(main.inserts[0]) == 2
+        assert not main.inserts[0][0]._created
+        assert not repository.is_preloading
+
+    def test_query_database_outside_preloading(self, objects, repository):
+        mdao.getTradeStatus("SHFE.rb2401", 1)
+        mdao.getTradeStatus("SHFE.rb2401", 1)
+        assert objects[MainTradeStatus].queries == 2
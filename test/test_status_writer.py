@@ -0,0 +1,124 @@
+import pytest
+from bson import ObjectId
+
+from dao.odm.future_trade import (
+    MainOpenVolume,
+    MainSoldCondition,
+    MainTradeStatus,
+)
+import dao.trade.status_writer as status_writer_module
+from dao.trade.journal import TradeJournal
+from dao.trade.status_writer import StatusWriter
+
+
+class FakeCollection:
+    def __init__(self, name, writes):
+        self.name = name
+        self._writes = writes
+
+    def __eq__(self, other):
+        return self.name == other.name
+
+    def bulk_write(self, requests, ordered=True):
+        self._writes.append((self.name, [r._doc for r in requests]))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    writes = []
+    for cls, name in [(MainTradeStatus, "status"), (MainOpenVolume, "ov")]:
+        collection = FakeCollection(name, writes)
+        monkeypatch.setattr(cls, "_get_collection",
+                            classmethod(lambda c, col=collection: col))
+    return writes
+
+
+def _status():
+    ts = MainTradeStatus(id=ObjectId(), custom_symbol="a", symbol="b",
+                         direction=1, sold_condition=MainSoldCondition())
+    ts._clear_changed_fields()
+    return ts
+
+
+class TestClass:
+    def test_flush_changed_fields_on_interval(self, writes):
+        clock = FakeClock()
+        writer = StatusWriter(interval=1, clock=clock)
+        t1, t2 = _status(), _status()
+        t1.sold_condition.stop_loss_price = 3000.0
+        writer.mark(t1)
+        t2.carrying_volume = 2
+        writer.mark(t2)
+        writer.mark(t1)
+        assert writer.flush_if_due() == 0
+        clock.now = 1
+        assert writer.flush_if_due() == 2
+        # 只更新发生变化的字段，同一集合合并为一次批量写入
+        assert writes == [("status", [
+            {"$set": {"carrying_volume": 2}},
+            {"$set": {"sold_condition.stop_loss_price": 3000.0}},
+        ])]
+        assert writer.pending_count() == 0
+        assert t1._get_changed_fields() == []
+
+    def test_keep_mark_order_across_collections(self, writes):
+        writer = StatusWriter()
+        ts = _status()
+        ov = MainOpenVolume(id=ObjectId(), symbol="b", direction=1)
+        ov._clear_changed_fields()
+        ts.carrying_volume = 1
+        writer.mark(ts)
+        ov.is_close = True
+        writer.mark(ov)
+        writer.mark(ts)
+        assert writer.flush() == 2
+        assert [name for name, _ in writes] == ["ov", "status"]
+
+    def test_keep_dirty_documents_when_write_failed(self, writes, monkeypatch):
+        writer = StatusWriter()
+        ts = _status()
+        ts.carrying_volume = 1
+        writer.mark(ts)
+
+        def fail(self, requests, ordered=True):
+            raise ConnectionError()
+
+        monkeypatch.setattr(FakeCollection, "bulk_write", fail)
+        with pytest.raises(ConnectionError):
+            writer.flush()
+        assert writer.pending_count() == 1
+        assert ts._get_changed_fields() == ["carrying_volume"]
+
+    def test_checkpoint_journal_after_flush(self, writes, monkeypatch,
+                                            tmp_path):
+        journal = TradeJournal()
+        journal.open(str(tmp_path))
+        monkeypatch.setattr(status_writer_module, "trade_journal", journal)
+        writer = StatusWriter()
+        ts = _status()
+        ts.carrying_volume = 1
+        writer.mark(ts)
+
+        def fail(self, requests, ordered=True):
+            raise ConnectionError()
+
+        with monkeypatch.context() as m:
+            m.setattr(FakeCollection, "bulk_write", fail)
+            with pytest.raises(ConnectionError):
+                writer.flush()
+        # 写入失败时日志保留修改，重启后仍可恢复
+        assert len(journal.state) == 1
+        writer.flush()
+        assert journal.state == {}
+        journal.close()
+        journal.open(str(tmp_path))
+        assert journal.state == {} and journal._count == 0
+        journal.close()
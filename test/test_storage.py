@@ -0,0 +1,35 @@
+import json
+
+import pytest
+from mongoengine import disconnect
+
+from dao.odm.future_trade import MainJointSymbolStatus
+from dao.storage import connect_storage, dump_database
+
+
+@pytest.fixture
+def memory_db():
+    connect_storage("memory", "", "bt_memory")
+    yield
+    disconnect()
+
+
+class TestClass:
+    def test_memory_storage_and_dump(self, memory_db, tmp_path):
+        status = MainJointSymbolStatus(
+            custom_symbol="KQ.m@SHFE.rb_1_main",
+            main_joint_symbol="KQ.m@SHFE.rb",
+            current_symbol="SHFE.rb2401", next_symbol="SHFE.rb2405",
+            direction=1)
+        status.save()
+        found = MainJointSymbolStatus.objects(
+            custom_symbol="KQ.m@SHFE.rb_1_main").first()
+        assert found.current_symbol == "SHFE.rb2401"
+        assert dump_database(str(tmp_path)) == 1
+        records = json.loads(
+            (tmp_path / "main_joint_symbol_status.json").read_text("utf-8"))
+        assert records[0]["next_symbol"] == "SHFE.rb2405"
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            connect_storage("sqlite", "", "bt")
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from strategies.entity import StrategyConfig
+from strategies.trading_calendar import CalendarRegistry, TradingCalendar
+
+TRADING_TIME = {
+    "day": [["09:00:00", "10:15:00"], ["10:30:00", "11:30:00"],
+            ["13:30:00", "15:00:00"]],
+    "night": [["21:00:00", "25:00:00"]],
+}
+
+
+class TestClass:
+    def test_day_and_night_sessions(self):
+        calendar = TradingCalendar(TRADING_TIME)
+        # 2023-07-26 为星期三
+        assert calendar.is_in_session("2023-07-26 09:00:00.000000")
+        assert not calendar.is_in_session("2023-07-26 10:20:00.000000")
+        assert calendar.is_in_session("2023-07-26 23:04:21.000001")
+        assert calendar.is_in_session("2023-07-27 00:59:59.000000")
+        assert not calendar.is_in_session("2023-07-27 01:00:00.000000")
+        # 周五夜盘持续到周六凌晨，周一凌晨没有交易
+        assert calendar.is_in_session("2023-07-29 00:30:00.000000")
+        assert not calendar.is_in_session("2023-07-31 00:30:00.000000")
+
+    def test_session_ended_and_next_open(self):
+        calendar = TradingCalendar(TRADING_TIME)
+        assert not calendar.is_session_ended("2023-07-26 14:59:00.000000")
+        assert calendar.is_session_ended("2023-07-26 15:00:00.000000")
+        assert not calendar.is_session_ended(
+            "2023-07-26 15:30:00.000000", 3600)
+        assert calendar.is_session_ended("2023-07-26 16:00:00.000000", 3600)
+        assert not calendar.is_session_ended("2023-07-26 11:45:00.000000")
+        assert calendar.next_open("2023-07-26 15:10:00.000000") == \
+            datetime(2023, 7, 26, 21)
+        assert calendar.next_open("2023-07-28 15:10:00.000000") == \
+            datetime(2023, 7, 28, 21)
+        assert calendar.next_open("2023-07-29 01:10:00.000000") == \
+            datetime(2023, 7, 31, 9)
+
+    def test_closing_window(self):
+        calendar = TradingCalendar(TRADING_TIME)
+        assert calendar.is_closing_window("2023-07-26 14:56:00.000000")
+        assert not calendar.is_closing_window("2023-07-26 14:55:00.000000")
+        assert not calendar.is_closing_window("2023-07-26 11:27:00.000000")
+        assert not calendar.is_closing_window("2023-07-26 15:00:00.000000")
+
+    def test_holiday_cancels_night_session(self):
+        # 2023-09-29 至 2023-10-06 为国庆假期
+        holidays = [date(2023, 9, 29)] + \
+            [date(2023, 10, d) for d in range(2, 7)]
+        calendar = TradingCalendar(TRADING_TIME, holidays)
+        assert not calendar.is_in_session("2023-09-28 21:30:00.000000")
+        assert not calendar.is_in_session("2023-10-03 10:00:00.000000")
+        assert calendar.next_open("2023-09-28 15:10:00.000000") == \
+            datetime(2023, 10, 9, 9)
+        # 2023-10-09 为星期一，之前的休市日没有夜盘
+        assert calendar.is_in_session("2023-10-09 21:30:00.000000")
+
+    def test_kline_timestamp(self):
+        calendar = TradingCalendar(TRADING_TIME)
+        # 2023-07-26 09:05:00 (东八区) 的纳秒时间戳
+        assert calendar.is_in_session(1690333500 * 10**9)
+
+    def test_trading_day(self):
+        calendar = TradingCalendar(TRADING_TIME)
+        assert calendar.trading_day("2023-07-26 14:59:59.999999") == \
+            date(2023, 7, 26)
+        assert calendar.trading_day("2023-07-26 15:30:00.000000") == \
+            date(2023, 7, 27)
+        # 周五夜盘属于下周一的交易日
+        assert calendar.trading_day("2023-07-28 21:00:00.000000") == \
+            date(2023, 7, 31)
+        assert calendar.trading_day("2023-07-29 12:00:00.000000") == \
+            date(2023, 7, 31)
+
+    def test_backtest_config_uses_quote_time(self):
+        config = StrategyConfig.__new__(StrategyConfig)
+        config.is_backtest = True
+        config.calendar = TradingCalendar(TRADING_TIME)
+        config.quote = SimpleNamespace(datetime="2023-07-26 09:05:00.000000")
+        assert config.is_trading_time()
+        assert config.get_trading_day() == date(2023, 7, 26)
+        assert not config.is_daily_trade_finished()
+        config.quote.datetime = "2023-07-26 15:00:00.000000"
+        assert not config.is_trading_time()
+        assert config.get_trading_day() == date(2023, 7, 27)
+        assert config.is_daily_trade_finished()
+
+    def test_registry_uses_configured_holidays(self):
+        registry = CalendarRegistry()
+        before = registry.get_calendar(TRADING_TIME)
+        assert before.is_in_session("2023-10-03 10:00:00.000000")
+        # 数据库中的节假日为 datetime
+        registry.set_holidays([datetime(2023, 10, d) for d in range(2, 7)])
+        calendar = registry.get_calendar(TRADING_TIME)
+        assert calendar is not before
+        assert not calendar.is_in_session("2023-10-03 10:00:00.000000")
+        assert calendar.trading_day("2023-09-29 15:30:00.000000") == \
+            date(2023, 10, 9)
+
+    def test_config_without_quote(self):
+        config = StrategyConfig.__new__(StrategyConfig)
+        config.is_backtest = True
+        config.calendar = TradingCalendar(TRADING_TIME)
+        config.quote = SimpleNamespace(datetime="")
+        assert not config.is_trading_time()
+        assert isinstance(config.get_current_time(), datetime)
+        config.is_backtest = False
+        assert not config.is_trading_time()
@@ -1,10 +1,13 @@
 import argparse
+import os
 from datetime import date
 import sys
 from logging import Logger
 import logging.config
 import yaml
 
+from utils.log_utils import enable_queue_logging
+
 now = date.today()
 
 
@@ -56,6 +59,23 @@ def get_argumets() -> SystemConfig:
     return systemConfig
 
 
+def get_parallel_backtest_args():
+    '''为并行回测获取命令行参数
+    '''
+    _parser = argparse.ArgumentParser(prog="tqsdk_future_backtest_parallel",
+                                      description="按品种分片并行执行回测")
+
+    _parser.add_argument("-l", "--log", choices=["warning", "info", "debug"],
+                         help="日志级别，默认为warning", default="warning")
+    _parser.add_argument("-n", "--workers", type=int,
+                         default=os.cpu_count() or 1,
+                         help="并行进程数量，默认为CPU核数")
+    _parser.add_argument("-r", "--result_db", type=str, default=None,
+                         help="合并回测结果的数据库名称，默认使用新的uuid")
+    args = _parser.parse_args()
+    return (args.log, args.workers, args.result_db)
+
+
 def get_init_db_args():
     '''为初始化期货交易配置信息获取数据库相关信息
     '''
@@ -95,7 +115,11 @@ def setup_log_config(log_level: str, config_file_name='log_config'):
         raise ValueError('Invalid log level: %s' % log_level)
     with open(f'conf/{config_file_name}.yaml', 'r') as f:
         config = yaml.safe_load(f.read())
-        logging.config.dictConfig(config)
+    # queue 不是 dictConfig 的配置项，设置为 true 时日志经由后台线程输出
+    use_queue = config.pop('queue', False)
+    logging.config.dictConfig(config)
+    if use_queue:
+        enable_queue_logging()
 
 
 class LoggerGetter:
@@ -3,23 +3,22 @@ import re
 from datetime import datetime, timedelta, timezone
 from typing import List
 
-import requests
 import yaml
-from pypushdeer import PushDeer
 
 from dao.odm.trade_config import TradeConfigInfo
 from utils import global_var as gvar
+from utils.notifier import NotificationOutbox, PushDeerSender, ServerChanSender
 
-pushdeer = PushDeer(pushkey=gvar.PUSH_KEY)
+# 通知在后台线程中发送，不阻塞交易
+pushdeer_outbox = NotificationOutbox(PushDeerSender(gvar.PUSH_KEY))
+serverchan_outbox = NotificationOutbox(
+    ServerChanSender('SCT172591Tn14G9JYc890AUJyvsNUiuCcL'))
 tz_utc_8 = timezone(timedelta(hours=8))  # 创建时区UTC+8:00，即东八区对应的时区 
 logger = logging.getLogger(__name__)
 
 
 def sendPushDeerMsg(title: str, content: str):
-    try:
-        pushdeer.send_markdown(title, desp=content)
-    except Exception as e:
-        logger.exception(e)
+    pushdeer_outbox.put(title, content)
 
 
 def sendSystemStartupMsg(s_time: datetime, trade_config: TradeConfigInfo):
@@ -45,15 +44,13 @@ def send_msg(title: str, content: str) -> None:
     ''' 使用 Server Chan 发送相关消息。
     参考地址：https://sct.ftqq.com/after
     '''
-    logger = LoggerGetter()
-    send_key = 'SCT172591Tn14G9JYc890AUJyvsNUiuCcL'
-    url = f'https://sctapi.ftqq.com/{send_key}.send'
-    headers = {"content-type": "application/x-www-form-urlencoded"}
-    data = {'title': title, 'channel': 9, 'desp': content}
-    try:
-        requests.post(url, data=data, headers=headers, timeout=10)
-    except requests.RequestException as e:
-        logger.exception(e)  # type: ignore
+    serverchan_outbox.put(title, content)
+
+
+def close_outboxes():
+    '''发送剩余的通知，交易结束时调用'''
+    pushdeer_outbox.close()
+    serverchan_outbox.close()
 
 
 def get_custom_symbol(zl_symbol: str, l_or_s: bool, s_name: str) -> str:
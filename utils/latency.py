@@ -0,0 +1,287 @@
+"""交易循环延迟统计
+
+开盘时大量品种同时更新，原来无法知道一次 wait_update 之后的时间花在了哪里。
+盯盘人在 wait_update 返回时开始一次统计，之后按品种记录各阶段的耗时:
+    dispatch: 从 wait_update 返回到开始执行该品种交易人的等待时间
+    trade: 交易人执行交易的总耗时
+    indicators: 主连策略为K线填充指标
+    condition: 开仓条件判断
+    stop_loss / take_profit: 止损、止盈判断
+    insert_order: 下单
+    tick_to_order: 从 wait_update 返回到下单完成
+    tick: 一次 wait_update 之后全部处理的耗时(品种为 *)
+
+耗时记录在 HDR 风格的对数线性直方图中，记录开销固定且与样本数量无关。
+每隔 interval 秒输出一次统计日志并清空直方图，设置了 path 时同时追加写入 JSON 行文件。
+未启用时各统计方法只做一次判断。
+"""
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.common_tools import LoggerGetter
+
+# 全部品种的统计使用的品种名称
+ALL_PRODUCTS = "*"
+# 输出的百分位
+PERCENTILES = (50, 90, 99, 99.9)
+# 日志中列出的最慢品种数量
+SLOWEST_COUNT = 5
+
+
+class LatencyHistogram:
+    """HDR 风格的对数线性直方图(纳秒)
+
+    数值按最高有效位分组，每组再等分为 2^sub_bucket_bits 个桶，
+    默认 8 位时相对误差不超过 1/128(小于 1%)，桶的数量只随数值的数量级增长
+    """
+
+    __slots__ = ("_bits", "_counts", "count", "total", "min", "max")
+
+    def __init__(self, sub_bucket_bits: int = 8):
+        self._bits = sub_bucket_bits
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int):
+        value = max(int(value), 0)
+        shift = max(value.bit_length() - self._bits, 0)
+        index = (shift << self._bits) + (value >> shift)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        if other.count:
+            self.min = other.min if self.count == 0 \
+                else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, p: float) -> int:
+        """返回第 p 百分位所在桶的上限，不超过记录的最大值"""
+        if self.count == 0:
+            return 0
+        target = max(self.count * p / 100, 1)
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """统计摘要，耗时单位为微秒"""
+        result = {"count": self.count, "mean_us": _us(self.mean()),
+                  "max_us": _us(self.max)}
+        for p in PERCENTILES:
+            result[f"p{p:g}_us"] = _us(self.percentile(p))
+        return result
+
+    def _upper(self, index: int) -> int:
+        shift = index >> self._bits
+        sub = index - (shift << self._bits)
+        return ((sub + 1) << shift) - 1
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_recorder", "_product", "_phase", "_begin")
+
+    def __init__(self, recorder: "LatencyRecorder", product: str, phase: str):
+        self._recorder = recorder
+        self._product = product
+        self._phase = phase
+
+    def __enter__(self):
+        self._begin = self._recorder._clock()
+        return self
+
+    def __exit__(self, *exc):
+        recorder = self._recorder
+        recorder.record(self._product, self._phase,
+                        recorder._clock() - self._begin)
+        return False
+
+
+class _DispatchSpan(_Span):
+    """执行一个交易人的交易，期间的阶段统计都记录到该品种"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        self._recorder._product = self._product
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        super().__exit__(*exc)
+        self._recorder._product = None
+        return False
+
+
+class LatencyRecorder:
+    """交易循环延迟统计，盯盘人、交易人、交易策略和委托单管理员共享
+
+    Args:
+        clock: 纳秒计时函数
+        wall_clock: 判断输出间隔使用的计时函数(秒)
+    """
+
+    logger = LoggerGetter()
+
+    def __init__(
+        self,
+        clock: Callable[[], int] = time.perf_counter_ns,
+        wall_clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self.enabled = False
+        self._interval = 0.0
+        self._path: Optional[str] = None
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._tick_begin: Optional[int] = None
+        self._product: Optional[str] = None
+        self._last_dump = wall_clock()
+
+    def configure(self, interval: float, path: Optional[str] = None):
+        """interval 大于 0 时启用统计，每隔 interval 秒输出一次"""
+        self.enabled = interval > 0
+        self._interval = interval
+        self._path = path
+        self._histograms.clear()
+        self._last_dump = self._wall_clock()
+
+    def start_tick(self):
+        """wait_update 返回时调用"""
+        if self.enabled:
+            self._tick_begin = self._clock()
+
+    def end_tick(self):
+        """一次 wait_update 之后的处理全部完成时调用，到达输出间隔时输出统计"""
+        if not self.enabled or self._tick_begin is None:
+            return
+        self.record(ALL_PRODUCTS, "tick", self._clock() - self._tick_begin)
+        self._tick_begin = None
+        if self._wall_clock() - self._last_dump >= self._interval:
+            self.dump()
+
+    def dispatch(self, product: str):
+        """返回执行品种 product 交易人的计时上下文，同时记录从 wait_update 返回开始的等待时间"""
+        if not self.enabled:
+            return _NULL_SPAN
+        if self._tick_begin is not None:
+            self.record(product, "dispatch", self._clock() - self._tick_begin)
+        return _DispatchSpan(self, product, "trade")
+
+    def span(self, phase: str, product: Optional[str] = None):
+        """返回当前品种 phase 阶段的计时上下文，不在交易人执行期间时使用 product"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, self._product or product or ALL_PRODUCTS, phase)
+
+    def order_inserted(self, product: Optional[str] = None):
+        """下单后调用，记录从 wait_update 返回到下单完成的时间"""
+        if self.enabled and self._tick_begin is not None:
+            self.record(self._product or product or ALL_PRODUCTS,
+                        "tick_to_order", self._clock() - self._tick_begin)
+
+    def record(self, product: str, phase: str, nanos: int):
+        histogram = self._histograms.get((product, phase))
+        if histogram is None:
+            histogram = self._histograms[(product, phase)] = \
+                LatencyHistogram()
+        histogram.record(nanos)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """返回 {品种: {阶段: 统计摘要}}，包括全部品种合并后的统计"""
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (product, phase), histogram in self._phase_totals().items():
+            result.setdefault(product, {})[phase] = histogram.summary()
+        for (product, phase), histogram in sorted(self._histograms.items()):
+            result.setdefault(product, {})[phase] = histogram.summary()
+        return result
+
+    def dump(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """输出并清空当前统计"""
+        self._last_dump = self._wall_clock()
+        if not self._histograms:
+            return {}
+        snapshot = self.snapshot()
+        for line in self._format(snapshot):
+            self.logger.info(line)
+        if self._path:
+            self._append(snapshot)
+        self._histograms.clear()
+        return snapshot
+
+    def _phase_totals(self) -> Dict[Tuple[str, str], LatencyHistogram]:
+        """按阶段合并全部品种的直方图"""
+        totals: Dict[Tuple[str, str], LatencyHistogram] = {}
+        for (product, phase), histogram in self._histograms.items():
+            if product == ALL_PRODUCTS:
+                continue
+            total = totals.setdefault((ALL_PRODUCTS, phase),
+                                      LatencyHistogram())
+            total.merge(histogram)
+        return totals
+
+    def _format(self, snapshot) -> Iterable[str]:
+        lines: List[str] = ["延迟统计(微秒):"]
+        for phase, s in snapshot.get(ALL_PRODUCTS, {}).items():
+            lines.append(
+                f"{phase:<14} n={s['count']:<8} p50={s['p50_us']:<10} "
+                f"p99={s['p99_us']:<10} max={s['max_us']}"
+            )
+        slowest = sorted(
+            ((p, phases["trade"]) for p, phases in snapshot.items()
+             if p != ALL_PRODUCTS and "trade" in phases),
+            key=lambda item: item[1]["p99_us"], reverse=True,
+        )[:SLOWEST_COUNT]
+        if slowest:
+            lines.append("交易耗时最长的品种: " + ", ".join(
+                f"{p}(p99={s['p99_us']})" for p, s in slowest))
+        return lines
+
+    def _append(self, snapshot):
+        try:
+            os.makedirs(self._path, exist_ok=True)  # type: ignore
+            record = {"time": datetime.now().isoformat(timespec="seconds"),
+                      "latency": snapshot}
+            with open(os.path.join(self._path, "latency.jsonl"), "a",  # type: ignore
+                      encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.logger.warning(f"延迟统计写入失败:{e}")
+
+
+def _us(nanos: float) -> float:
+    return round(nanos / 1000, 1)
+
+
+latency_recorder = LatencyRecorder()
@@ -0,0 +1,119 @@
+"""日志工具
+
+延迟格式化:
+    策略每次检查条件都会准备日志内容(时间转换、字符串格式化)，但大部分只在 DEBUG 级别输出。
+    Lazy 包装的参数和 LazyFormat 包装的消息只在日志真正输出时才计算，
+    日志级别未开启时不产生任何格式化开销。
+
+队列输出:
+    日志配置文件中设置 queue: true 时，配置中的每个处理器由 QueueHandler 代替，
+    日志记录放入队列后由后台的 QueueListener 格式化并写入控制台和文件，交易线程不再等待 I/O。
+    Lazy 参数读取的行情时间等对象会被交易线程修改，放入队列前仍在交易线程中计算。
+"""
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class Lazy:
+    """延迟计算的日志参数，第一次格式化时调用 func(*args) 并缓存结果"""
+
+    __slots__ = ("_func", "_args", "_value", "_done")
+
+    def __init__(self, func: Callable[..., Any], *args):
+        self._func = func
+        self._args = args
+        self._done = False
+        self._value = None
+
+    def value(self) -> Any:
+        if not self._done:
+            self._value = self._func(*self._args)
+            self._done = True
+        return self._value
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.value(), format_spec)
+
+    def __str__(self) -> str:
+        return str(self.value())
+
+
+class LazyFormat:
+    """延迟格式化的日志消息，输出时才执行 fmt.format(*args)"""
+
+    __slots__ = ("_fmt", "_args")
+
+    def __init__(self, fmt: str, *args):
+        self._fmt = fmt
+        self._args = args
+
+    def resolve(self) -> "LazyFormat":
+        """在当前线程计算全部 Lazy 参数，之后格式化时使用缓存的结果"""
+        for arg in self._args:
+            if isinstance(arg, Lazy):
+                arg.value()
+        return self
+
+    def __str__(self) -> str:
+        return self._fmt.format(*self._args)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """将日志记录放入进程内队列，不带 % 参数的消息留到 QueueListener 中再格式化
+
+    带 % 参数的消息参数可能是之后会被修改的对象，仍在放入队列前格式化；
+    延迟格式化消息中的 Lazy 参数在放入队列前计算，字符串拼接留给监听线程
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            return super().prepare(record)
+        if isinstance(record.msg, LazyFormat):
+            record.msg.resolve()
+        elif isinstance(record.msg, Lazy):
+            record.msg.value()
+        return record
+
+
+def enable_queue_logging(
+    loggers: Optional[Iterable[logging.Logger]] = None,
+) -> List[QueueListener]:
+    """将 loggers (默认为全部 logger) 的日志处理器改为经由队列输出，返回启动的 QueueListener
+
+    每个处理器对应一个队列和监听线程，保持原有的处理器级别和 logger 对应关系
+    """
+    if loggers is None:
+        loggers = [logging.getLogger()] + [
+            logger
+            for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger)
+        ]
+    replaced: Dict[int, QueueHandler] = {}
+    listeners: List[QueueListener] = []
+    for logger in loggers:
+        for i, handler in enumerate(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                continue
+            queue_handler = replaced.get(id(handler))
+            if queue_handler is None:
+                log_queue: "queue.SimpleQueue[logging.LogRecord]" = (
+                    queue.SimpleQueue())
+                queue_handler = DeferredQueueHandler(log_queue)
+                queue_handler.setLevel(handler.level)
+                listener = QueueListener(
+                    log_queue, handler, respect_handler_level=True)
+                listener.start()
+                atexit.register(_stop_listener, listener)
+                replaced[id(handler)] = queue_handler
+                listeners.append(listener)
+            logger.handlers[i] = queue_handler
+    return listeners
+
+
+def _stop_listener(listener: QueueListener):
+    """程序退出时输出队列中剩余的日志，已经停止的监听线程不再处理"""
+    if listener._thread is not None:  # type: ignore
+        listener.stop()
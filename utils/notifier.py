@@ -0,0 +1,197 @@
+"""交易通知发件箱
+
+开平仓通知原来在交易循环中同步发送，推送服务响应缓慢时所有品种的交易都会被阻塞。
+发件箱只把消息放入队列，由后台线程发送:
+    - 在 batch_window 时间内到达的多条消息(如开盘时集中开仓)合并为一条发送，相同的消息只发送一次
+    - 发送失败时按 backoff 指数退避重试，超过 max_retries 次后放弃并记录日志
+    - 队列已满时丢弃新消息，交易线程永远不会等待
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+# 消息合并的等待时间(秒)
+DEFAULT_BATCH_WINDOW = 1.0
+DEFAULT_MAX_BATCH = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 2.0
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_TIMEOUT = 10
+
+Message = Tuple[str, str]
+Sender = Callable[[str, str], None]
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationError(Exception):
+    """推送服务返回失败"""
+
+
+class PushDeerSender:
+    """使用 PushDeer 发送 markdown 消息，失败时抛出异常"""
+
+    def __init__(
+        self,
+        pushkey: str,
+        server: str = "https://api2.pushdeer.com",
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self._pushkey = pushkey
+        self._url = f"{server}/message/push"
+        self._timeout = timeout
+
+    def __call__(self, title: str, content: str):
+        params = {"pushkey": self._pushkey, "text": title, "desp": content,
+                  "type": "markdown"}
+        response = requests.get(self._url, params=params,
+                                timeout=self._timeout)
+        response.raise_for_status()
+        if response.json().get("code") != 0:
+            raise NotificationError(response.text)
+
+
+class ServerChanSender:
+    """使用 Server Chan 发送消息，失败时抛出异常
+    参考地址：https://sct.ftqq.com/after
+    """
+
+    def __init__(
+        self,
+        send_key: str,
+        server: str = "https://sctapi.ftqq.com",
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self._url = f"{server}/{send_key}.send"
+        self._timeout = timeout
+
+    def __call__(self, title: str, content: str):
+        data = {"title": title, "channel": 9, "desp": content}
+        response = requests.post(self._url, data=data, timeout=self._timeout)
+        response.raise_for_status()
+        if response.json().get("code") != 0:
+            raise NotificationError(response.text)
+
+
+class NotificationOutbox:
+    """通知发件箱，put 只将消息放入队列，后台线程在第一次 put 时启动
+
+    Args:
+        sender: 发送一条消息的函数，失败时抛出异常
+        batch_window: 收到消息后等待合并后续消息的时间(秒)
+        max_batch: 一次最多合并的消息数量
+        max_retries: 发送失败后的最多重试次数
+        backoff: 第一次重试前的等待时间(秒)，之后每次加倍
+    """
+
+    def __init__(
+        self,
+        sender: Sender,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self._sender = sender
+        self._batch_window = batch_window
+        self._max_batch = max_batch
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._queue: "queue.Queue[Optional[Message]]" = queue.Queue(
+            queue_size)
+        self._closing = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.sent_count = 0
+        self.dropped_count = 0
+
+    def put(self, title: str, content: str):
+        """将消息放入队列，不等待发送"""
+        if self._closing.is_set():
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((title, content))
+        except queue.Full:
+            self.dropped_count += 1
+            logger.warning(f"通知队列已满，丢弃消息:{title}")
+
+    def close(self, timeout: float = DEFAULT_TIMEOUT):
+        """发送队列中剩余的消息后停止后台线程，最多等待 timeout 秒"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._closing.is_set():
+                return
+            self._closing.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("通知队列已满，停止时可能有消息未发送")
+        thread.join(timeout)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="notification-outbox", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._send(batch)
+            if stop:
+                return
+
+    def _collect(self) -> Tuple[List[Message], bool]:
+        """等待第一条消息，再收集 batch_window 内到达的消息，返回消息和是否停止"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self._batch_window
+        while len(batch) < self._max_batch:
+            # 停止时不再等待，只取出已经在队列中的消息
+            remaining = 0.0 if self._closing.is_set() \
+                else max(deadline - time.monotonic(), 0.0)
+            try:
+                message = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if message is None:
+                return batch, True
+            batch.append(message)
+        return batch, False
+
+    def _send(self, batch: List[Message]):
+        title, content = _coalesce(batch)
+        delay = self._backoff
+        for attempt in range(self._max_retries + 1):
+            try:
+                self._sender(title, content)
+                self.sent_count += 1
+                return
+            except Exception as e:
+                if attempt == self._max_retries or self._closing.is_set():
+                    self.dropped_count += len(batch)
+                    logger.error(f"通知发送失败，放弃{len(batch)}条消息:{e}")
+                    return
+                logger.warning(f"通知发送失败，{delay}秒后重试:{e}")
+                self._closing.wait(delay)
+                delay *= 2
+
+
+def _coalesce(batch: List[Message]) -> Message:
+    """合并多条消息，相同的消息只保留一条"""
+    messages = list(dict.fromkeys(batch))
+    if len(messages) == 1:
+        return messages[0]
+    title = f"{messages[0][0]} 等{len(messages)}条通知"
+    content = "\n\n".join(f"{t}\n\n{c}" for t, c in messages)
+    return title, content